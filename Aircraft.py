@@ -16,8 +16,10 @@ class aircraft:
     def __init__(self,
                  lat_init = 0.0,
                  lon_init = 0.0,
+                 config = config
                  ):
 
+        self.config = config
         self.lat_init = lat_init
         self.lon_init = lon_init
 
@@ -26,9 +28,11 @@ class aircraft:
                   simulation_start_epoch = 0.0,
                   simulation_end_epoch = 1000.0,
                   height = False,
-                  method = method_AC,
+                  method = False,
                   filename = False
                   ):
+        if not method:
+            method = self.config.method_AC
         if method == "opensky":
             flight = pandas.read_csv(filename)
             t0 = parser.parse(str((flight['timestamp'].to_numpy())[0]))
@@ -142,9 +146,9 @@ class aircraft:
 
             interval = simulation_end_epoch - simulation_start_epoch
             for i in range(1, len(time)):
-                latdot = vel_AC[0] /  R[i-1]
-                londot = vel_AC[1] / (R[i-1] * np.cos(lat[i-1]))
-                Rdot   = vel_AC[2]
+                latdot = self.config.vel_AC[0] /  R[i-1]
+                londot = self.config.vel_AC[1] / (R[i-1] * np.cos(lat[i-1]))
+                Rdot   = self.config.vel_AC[2]
 
                 dlat = latdot * stepsize
                 dlon = londot * stepsize
@@ -174,7 +178,7 @@ class aircraft:
                 elif lon[i] < -np.pi:
                     lon[i] += 2*np.pi
 
-            speed = np.ones(len(time)) * speed_AC
+            speed = np.ones(len(time)) * self.config.speed_AC
             print('AIRCRAFT PROPAGATION MODEL')
             print('------------------------------------------------')
             print('Aircraft positional data retrieved from simplified straight flight algorithm')
@@ -183,7 +187,7 @@ class aircraft:
             print('Final latitude and longitude  : (' + str(np.round(np.rad2deg(lat[-1]), 1)) + 'deg, ' +
                   str(np.round(np.rad2deg(lon[-1]), 1)) + 'deg)')
             print('Constant altitude             : ' + str(np.round(heights.mean() / 1e3, 2)) + ' km')
-            print('Constant flight speed         : ' + str(speed_AC)+' m/s')
+            print('Constant flight speed         : ' + str(self.config.speed_AC)+' m/s')
             print('------------------------------------------------')
             return pos, heights, lat, lon, speed, time
 
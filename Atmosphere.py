@@ -1,10 +1,14 @@
 from input import *
 from helper_functions import *
-from PDF import dist
+from PDF import distributions
 
 import numpy as np
 from scipy.stats import rice, rayleigh
 import cmath
+import copy
+import os
+import pickle
+from collections import OrderedDict
 
 from matplotlib import pyplot as plt
 
@@ -15,9 +19,12 @@ class turbulence:
                  zenith_angles,
                  h_AC,
                  h_SC,
-                 angle_div
+                 angle_div,
+                 config=config
                  ):
 
+        self.config = config
+        self.dist = distributions(config)
         # Range and height
         self.angle_div = angle_div
         self.ranges = ranges
@@ -26,12 +33,20 @@ class turbulence:
         self.h_sc = h_SC
 
         # Create a height profile for computation of r0, Cn and wind speed
-        self.height_profiles = np.linspace(self.h_cruise, self.h_sc, 10000, axis=1)
+        # With turbulence_integration='trapz', this is a uniform grid of 10,000 points from h_AC to h_SC (trapezoidal rule).
+        # With 'gauss', these are the nodes of a composite Gauss-Legendre rule over the turbulent layer only (h_AC to turbulence_height_max),
+        # see quadrature_profiles. Integrals over the profile are computed with 'integrate'.
+        # Some integrals are taken without heights (np.trapz(f) in units of the grid spacing), hence the grid spacing is also stored.
+        self.grid_step = (self.h_sc - self.h_cruise) / 9999
+        if self.config.turbulence_integration == 'gauss':
+            self.height_profiles, self.weights, self.weights_limit = self.quadrature_profiles()
+        else:
+            self.height_profiles = np.linspace(self.h_cruise, self.h_sc, 10000, axis=1)
         self.height_profiles_norm = self.height_profiles - self.h_cruise[:, None]
         self.height_profiles_frac =  (self.height_profiles - self.h_cruise[:, None]) / (self.h_sc[:, None] - self.h_cruise[:, None])
         self.height_profiles_masked = np.ma.array(self.height_profiles, mask=(self.height_profiles > self.h_limit))
 
-        self.range_profiles = np.linspace(0.0, self.ranges, 10000, axis=1)
+        self.range_profiles = self.height_profiles_frac * self.ranges[:, None]
         self.range_profiles_masked = np.ma.array(self.range_profiles, mask=(self.height_profiles > self.h_limit))
 
         self.zenith_angles = zenith_angles
@@ -39,9 +54,9 @@ class turbulence:
         # Beam parameters
         # REF: Andrews, Laser beam propagation through random media, EQ.12.9
         w_r = beam_spread(self.angle_div, self.ranges)  # beam radius at receiver (without turbulence) (in m)
-        self.Lambda0 = 2 * self.ranges / (k_number * w0 ** 2)
+        self.Lambda0 = 2 * self.ranges / (self.config.k_number * self.config.w0 ** 2)
         # REF: Andrews, Laser beam propagation through random media, EQ.12.9
-        self.Lambda = 2 * self.ranges / (k_number * w_r ** 2)
+        self.Lambda = 2 * self.ranges / (self.config.k_number * w_r ** 2)
         self.Theta0 = self.Lambda0 / self.Lambda**2 - self.Lambda0**2
         self.Theta = self.Theta0 / (self.Theta0**2 + self.Lambda0**2)
         self.Theta_bar = 1 - self.Theta
@@ -49,8 +64,36 @@ class turbulence:
         # Turbulence parameters
         self.L0 = 5 / (1 + (self.height_profiles - 7500) / 2500)
         self.kappa0 = 30.0
-        self.speckle_size = np.sqrt(np.max(self.range_profiles_masked, axis=1) / k_number)
-        self.speckle_size = np.sqrt(self.ranges / k_number)
+        self.speckle_size = np.sqrt(np.max(self.range_profiles_masked, axis=1) / self.config.k_number)
+        self.speckle_size = np.sqrt(self.ranges / self.config.k_number)
+
+    def quadrature_profiles(self):
+        # Composite Gauss-Legendre nodes and weights over the turbulent layer, for each macro-scale step.
+        # Above turbulence_height_max, Cn^2 is negligible (< 1e-26 of its integral). The layer is split at h_limit (20 km), such that
+        # the wind speed rms (integrated up to h_limit) uses the same nodes. The panels are geometrically refined towards h_AC,
+        # where the weights (h - h_AC)^(5/6) are not smooth. Each panel has turbulence_quadrature_nodes nodes.
+        h_top = np.minimum(self.h_sc, self.config.turbulence_height_max)
+        h_limit = np.clip(self.h_limit, self.h_cruise, h_top)
+        edges_lower = [0.0, 1/64, 1/16, 1/4, 1.0]
+        edges_upper = [0.0, 1/9, 1/3, 1.0]
+        nodes = self.config.turbulence_quadrature_nodes
+        x_lower, w_lower = gauss_legendre_grid(self.h_cruise, h_limit, edges_lower, nodes)
+        x_upper, w_upper = gauss_legendre_grid(h_limit, h_top, edges_upper, nodes)
+        heights = np.concatenate((x_lower, x_upper), axis=1)
+        weights = np.concatenate((w_lower, w_upper), axis=1)
+        weights_limit = np.concatenate((w_lower, np.zeros(w_upper.shape)), axis=1)
+        return heights, weights, weights_limit
+
+    def integrate(self, f, below_limit=False, grid_units=False):
+        # Integral of f (rows x profile) over height, for each macro-scale step.
+        # below_limit : only up to h_limit (the legacy grid is masked above h_limit, so it ends at the last point below h_limit)
+        # grid_units  : integral in units of the legacy grid spacing (np.trapz without heights)
+        if self.config.turbulence_integration == 'gauss':
+            integral = np.sum(f * (self.weights_limit if below_limit else self.weights), axis=1)
+            return integral / self.grid_step if grid_units else integral
+        if grid_units:
+            return np.trapz(f, axis=1)
+        return np.trapz(f, x=self.height_profiles_masked if below_limit else self.height_profiles)
 
     # ------------------------------------------------------------------------
     # --------------------------TURUBLENCE-ENVIRONMENT------------------------
@@ -62,10 +105,14 @@ class turbulence:
         #REF: Andrews, ch.12 page 481
         self.A = 1.7e-14                                                                                                
 
+        # With turbulence_moments='fused', Cn^2 is only computed once (Cn2_total is not needed) and all Cn^2-weighted integrals are
+        # computed in one sweep by moments_func
+        fused = self.config.turbulence_moments == 'fused'
         if A=='no':
             self.Cn2 = 5.94E-53 * (self.windspeed_rms[:,None] / 27) ** 2 * (self.height_profiles-shift) ** 10 * np.exp(-(self.height_profiles-shift) / 1000.0) + \
                        2.75E-16 * np.exp(-(self.height_profiles-shift) / 1500.0)
 
+        if A=='no' and not fused:
             self.Cn2_total = 5.94E-53 * (self.windspeed_rms_total[:, None] / 27) ** 2 * (
                             self.height_profiles - shift) ** 10 * np.exp(-(self.height_profiles - shift) / 1000.0) + \
                            2.75E-16 * np.exp(-(self.height_profiles - shift) / 1500.0)
@@ -76,27 +123,82 @@ class turbulence:
                        2.75E-16 * np.exp(-(self.height_profiles - shift) / 1500.0) + \
                        self.A * np.exp(-(self.height_profiles - shift) / 100.0)
 
+        if A=='yes' and not fused:
             self.Cn2_total = 5.94E-53 * (self.windspeed_rms_total[:, None] / 27) ** 2 * (
                     self.height_profiles - shift) ** 10 * np.exp(-(self.height_profiles - shift) / 1000.0) + \
                        2.75E-16 * np.exp(-(self.height_profiles - shift) / 1500.0) + \
                        self.A * np.exp(-(self.height_profiles - shift) / 100.0)
 
-        # REF: LASER BEAM PROPAGATION THROUGH RANDOM MEDIA, L.ANDREWS, EQ.12.28
-        ksi = 1 - (self.height_profiles - self.h_cruise[:, None]) / (self.h_sc[:, None] - self.h_cruise[:, None])
-        self.mu_0 = np.trapz(self.Cn2, x=self.height_profiles)
-        self.mu_1u = np.trapz(self.Cn2*(self.Theta[:, None] + self.Theta_bar[:, None]*self.height_profiles_frac)**(5/3),
-                             x=self.height_profiles)
-
-        self.mu_2u = np.trapz(self.Cn2 * (1 - self.height_profiles_frac) ** (5 / 3), x=self.height_profiles)
-
-        self.mu_1d = np.trapz(self.Cn2 * (self.Theta[:, None] - self.Theta_bar[:, None]*(1 - self.height_profiles_frac)) ** (5 / 3),
-                             x=self.height_profiles)
-
-        self.mu_2d = np.trapz((self.Cn2 * self.height_profiles_frac) ** (5 / 3), x=self.height_profiles)
-
-        self.mu_3u = np.real( np.trapz(self.Cn2 * (ksi**(5/6) * (self.Lambda[:, None]*ksi + (1 - self.Theta_bar[:, None]*ksi)*1j)**(5/6) - self.Lambda[:, None]**(5/6) * ksi**(5/3) ) ) )
+        # Cn^2 at the aircraft altitude (for print). The Gauss-Legendre profile does not contain h_AC itself
+        self.Cn2_h0 = 5.94E-53 * (self.windspeed_rms / 27) ** 2 * self.h_cruise ** 10 * np.exp(-self.h_cruise / 1000.0) + \
+                      2.75E-16 * np.exp(-self.h_cruise / 1500.0)
+        if A == 'yes':
+            self.Cn2_h0 = self.Cn2_h0 + self.A * np.exp(-self.h_cruise / 100.0)
 
+        if fused:
+            self.moments_func()
+            return
 
+        # REF: LASER BEAM PROPAGATION THROUGH RANDOM MEDIA, L.ANDREWS, EQ.12.28
+        ksi = 1 - (self.height_profiles - self.h_cruise[:, None]) / (self.h_sc[:, None] - self.h_cruise[:, None])
+        self.mu_0 = self.integrate(self.Cn2)
+        self.mu_1u = self.integrate(self.Cn2*(self.Theta[:, None] + self.Theta_bar[:, None]*self.height_profiles_frac)**(5/3))
+
+        self.mu_2u = self.integrate(self.Cn2 * (1 - self.height_profiles_frac) ** (5 / 3))
+
+        self.mu_1d = self.integrate(self.Cn2 * (self.Theta[:, None] - self.Theta_bar[:, None]*(1 - self.height_profiles_frac)) ** (5 / 3))
+
+        self.mu_2d = self.integrate((self.Cn2 * self.height_profiles_frac) ** (5 / 3))
+
+        self.mu_3u = np.real( self.integrate(self.Cn2 * (ksi**(5/6) * (self.Lambda[:, None]*ksi + (1 - self.Theta_bar[:, None]*ksi)*1j)**(5/6) - self.Lambda[:, None]**(5/6) * ksi**(5/3) ), grid_units=True) )
+
+
+
+    def moments_func(self, D_r=0.08):
+        # Fused computation of all Cn^2-weighted integrals over the height profile (turbulence_moments='fused').
+        # Cn^2 times the quadrature weights is computed once, then each moment is one weighted sum over the same nodes.
+        # Only the moments of the configured link direction are computed:
+        #   both : mu_0, r0, Rytov variance, Greenwood frequency
+        #   up   : mu_1u, mu_2u, mu_3u, var_Bu
+        #   down : mu_1d, mu_2d, var_scint_P (with D_r, as in var_scint_func)
+        # The real parts of the complex powers (mu_3u and var_scint_P) are computed with real arithmetic:
+        #   Re[(a + b*1j)**(5/6)] = (a**2 + b**2)**(5/12) * cos(5/6 * arctan2(b, a))
+        # The integrals are stored in self.moments and used by frequencies, r0_func, var_rytov_func and var_scint_func.
+        if self.config.turbulence_integration == 'gauss':
+            weights = self.weights
+        else:
+            # Trapezoidal weights of the uniform grid
+            weights = np.repeat(self.grid_step[:, None], self.height_profiles.shape[1], axis=1)
+            weights[:, [0, -1]] *= 0.5
+        Cn2_w = self.Cn2 * weights
+        frac = self.height_profiles_frac
+
+        def integral(weight, grid_units=False):
+            result = np.einsum('ij,ij->i', Cn2_w, weight)
+            return result / self.grid_step if grid_units else result
+
+        def real_power(a, b, p):
+            return (a**2 + b**2)**(p / 2) * np.cos(p * np.arctan2(b, a))
+
+        self.moments = {}
+        self.mu_0 = np.sum(Cn2_w, axis=1)
+        self.moments['r0'] = integral(((self.ranges[:, None] - self.height_profiles) / self.ranges[:, None])**(5/3))
+        self.moments['rytov'] = integral((self.height_profiles - self.h_cruise[:, None])**(5/6))
+        self.moments['greenwood'] = integral(self.windspeed_total**(5/3), grid_units=True)
+
+        if self.config.link == 'up':
+            ksi = 1 - frac
+            self.mu_1u = integral((self.Theta[:, None] + self.Theta_bar[:, None] * frac)**(5/3))
+            self.mu_2u = integral(ksi**(5/3))
+            self.mu_3u = integral(ksi**(5/6) * real_power(self.Lambda[:, None] * ksi, 1 - self.Theta_bar[:, None] * ksi, 5/6)
+                                  - self.Lambda[:, None]**(5/6) * ksi**(5/3), grid_units=True)
+            self.moments['Bu'] = integral(ksi**(5/6) * frac**(5/6))
+        elif self.config.link == 'down':
+            self.mu_1d = integral((self.Theta[:, None] - self.Theta_bar[:, None] * (1 - frac))**(5/3))
+            self.mu_2d = integral(self.Cn2**(2/3) * frac**(5/3))
+            c = (self.config.k_number * D_r**2 / (16 * self.ranges))[:, None]
+            self.moments['scint_P'] = integral(real_power(c, frac, 5/6) - c**(5/6))
+            self.moments_D_r = D_r
 
     def windspeed_func(self, slew, Vg, wind_model_type = "Bufton"):
         # This method computes the wind speed profile between AIRCRAFT and SATELLITES
@@ -110,13 +212,16 @@ class turbulence:
                              30 * np.exp(-((self.height_profiles - 9400.0) / 4800.0)**2)
 
             self.windspeed_rms_total = np.sqrt(1 / (self.h_limit - self.h_cruise) *
-                                         np.trapz(self.windspeed_total ** 2, x=self.height_profiles_masked))
+                                         self.integrate(self.windspeed_total ** 2, below_limit=True))
 
             self.windspeed_rms = np.sqrt(1 / (self.h_limit - self.h_cruise) *
-                                            np.trapz(self.windspeed ** 2, x=self.height_profiles_masked))
+                                            self.integrate(self.windspeed ** 2, below_limit=True))
 
     def frequencies(self):
-        self.freq_greenwood = 2.31 * wavelength**(-6/5) * np.trapz(self.Cn2 * self.windspeed_total**(5/3), axis=1)**(3/5)
+        if self.config.turbulence_moments == 'fused':
+            self.freq_greenwood = 2.31 * self.config.wavelength**(-6/5) * self.moments['greenwood']**(3/5)
+        else:
+            self.freq_greenwood = 2.31 * self.config.wavelength**(-6/5) * self.integrate(self.Cn2 * self.windspeed_total**(5/3), grid_units=True)**(3/5)
 
 
         self.V_trans = self.windspeed_rms_total
@@ -127,10 +232,11 @@ class turbulence:
         # This method computes the Fried parameter (coherence width)
         # REF: Parenti (Modeling the PDF for the irradiance...), Eq. 5
 
-        self.r0 = (0.423 * k_number ** 2 / abs(np.cos(self.zenith_angles)) *
-                   np.trapz(
-                       self.Cn2 * ((self.ranges[:, None] - self.height_profiles) / (self.ranges[:, None])) ** (5 / 3),
-                       x=self.height_profiles)) ** (-3 / 5)
+        if self.config.turbulence_moments == 'fused':
+            integral = self.moments['r0']
+        else:
+            integral = self.integrate(self.Cn2 * ((self.ranges[:, None] - self.height_profiles) / (self.ranges[:, None])) ** (5 / 3))
+        self.r0 = (0.423 * self.config.k_number ** 2 / abs(np.cos(self.zenith_angles)) * integral) ** (-3 / 5)
 
         return self.r0
 
@@ -150,10 +256,10 @@ class turbulence:
         w_r = beam_spread(self.angle_div, self.ranges)
 
         # REF: LASER BEAM PROPAGATION THROUGH RANDOM MEDIA, L.ANDREWS, 2005, EQ.12.48
-        if link == 'up':
+        if self.config.link == 'up':
             self.w_ST = w_r * np.sqrt(1 + 1.33 * self.var_rytov * self.Lambda ** (5 / 6) *
                                       (1 - 0.66 * (self.Lambda0 ** 2 / (1 + self.Lambda0 ** 2)) ** (1 / 6)))           
-        if link == 'down':
+        if self.config.link == 'down':
             self.w_ST = np.ones(self.zenith_angles.shape) * w_r
 
         # Compute loss
@@ -162,43 +268,56 @@ class turbulence:
 
     def WFE(self, tip_tilt="YES"):
         # This method computes the average loss due to phase fluctuations with the Strehl ratio
-        self.h_WFE = Strehl_ratio_func(D_t=D_t, r0=self.r0, tip_tilt=tip_tilt)
+        self.h_WFE = Strehl_ratio_func(D_t=self.config.D_t, r0=self.r0, tip_tilt=tip_tilt)
 
 
     # ------------------------------------------------------------------------
     # -------------------------------VARIANCES--------------------------------
     # ------------------------------------------------------------------------
     def var_rytov_func(self):
-        self.var_rytov = 2.25 * k_number ** (7 / 6) * (1 / np.cos(self.zenith_angles)) ** (11 / 6) * \
-                         np.trapz(self.Cn2 *
-                                  (self.height_profiles - self.h_cruise[:, None]) ** (5/6), x=self.height_profiles)
-
-        self.var_Bu = 2.25 * k_number ** (7/6) * (self.h_sc - self.h_cruise) ** (5/6) * \
+        # With turbulence_moments='fused', the integrals of moments_func are used (var_Bu is only computed for the uplink)
+        if self.config.turbulence_moments == 'fused':
+            self.var_rytov = 2.25 * self.config.k_number ** (7 / 6) * (1 / np.cos(self.zenith_angles)) ** (11 / 6) * self.moments['rytov']
+            self.std_rytov = np.sqrt(self.var_rytov)
+            if 'Bu' in self.moments:
+                self.var_Bu = 2.25 * self.config.k_number ** (7/6) * (self.h_sc - self.h_cruise) ** (5/6) * \
+                              (1 / np.cos(self.zenith_angles)) ** (11/6) * self.moments['Bu']
+                self.std_Bu = np.sqrt(self.var_Bu)
+            return
+
+        self.var_rytov = 2.25 * self.config.k_number ** (7 / 6) * (1 / np.cos(self.zenith_angles)) ** (11 / 6) * \
+                         self.integrate(self.Cn2 *
+                                        (self.height_profiles - self.h_cruise[:, None]) ** (5/6))
+
+        self.var_Bu = 2.25 * self.config.k_number ** (7/6) * (self.h_sc - self.h_cruise) ** (5/6) * \
                       (1 / np.cos(self.zenith_angles)) ** (11/6) * \
-                      np.trapz(self.Cn2 * (1 - self.height_profiles_frac)**(5/6) * self.height_profiles_frac**(5/6),
-                               x=self.height_profiles)
+                      self.integrate(self.Cn2 * (1 - self.height_profiles_frac)**(5/6) * self.height_profiles_frac**(5/6))
 
         self.std_rytov = np.sqrt(self.var_rytov)
         self.std_Bu    = np.sqrt(self.var_Bu)
 
     def var_scint_func(self, D_r=0.08):
-        if link == 'down':
+        if self.config.link == 'down':
             # Assuming tip-tilt correction (tracked beam)
             self.var_scint_I = np.exp(
                                     0.49 * self.var_rytov / (1 + 1.11 * self.std_rytov ** (12 / 5)) ** (7 / 6) +
                                     0.51 * self.var_rytov / (1 + 0.69 * self.std_rytov ** (12 / 5)) ** (5 / 6) ) - 1    # REF: Laser beam propagation through random media, L.ANDREWS, EQ.10-...
 
-            self.var_scint_P = 8.7 * k_number**(7/6) * (self.h_sc - self.h_cruise)**(5/6) * (1/np.cos(self.zenith_angles))**(11/6) * \
-                               np.real( np.trapz(self.Cn2 *
-                                    ( (k_number*D_r**2/(16*self.ranges[:,None]) + self.height_profiles_frac*1j)**(5/6)
-                                     -(k_number*D_r**2/(16*self.ranges[:,None]))**(5/6) ), x=self.height_profiles) )
+            if self.config.turbulence_moments == 'fused' and self.moments_D_r == D_r:
+                integral = self.moments['scint_P']
+            else:
+                integral = np.real( self.integrate(self.Cn2 *
+                                    ( (self.config.k_number*D_r**2/(16*self.ranges[:,None]) + self.height_profiles_frac*1j)**(5/6)
+                                     -(self.config.k_number*D_r**2/(16*self.ranges[:,None]))**(5/6) )) )
+            self.var_scint_P = 8.7 * self.config.k_number**(7/6) * (self.h_sc - self.h_cruise)**(5/6) * (1/np.cos(self.zenith_angles))**(11/6) * \
+                               integral
 
 
-        if link == 'up':
+        if self.config.link == 'up':
             # Assuming tip-tilt correction (tracked beam)
             self.var_scint_I = np.exp(0.49 * self.var_Bu / (1 + (1+self.Theta) * 0.56 * self.std_Bu**(12/5))**(7/6) +
                                       0.51 * self.var_Bu / (1 + 0.69 * self.std_Bu**(12/5))**(5/6)) - 1                 # REF: Laser beam propagation through random media, L.ANDREWS, EQ.10-...
-            d = np.sqrt(k_number * D_r**2 / (4 * self.ranges))
+            d = np.sqrt(self.config.k_number * D_r**2 / (4 * self.ranges))
             self.var_scint_P = np.exp(0.49 * self.var_Bu / (1 + 0.18*d**2 + 0.56 * self.std_Bu**(12/5))**(7/6) +
                                       0.51 * self.var_Bu * (1 + 0.69*self.var_Bu**(12/5))**(5/6) / (1 + 0.90*d**2 + 0.62 * d**2 * self.std_Bu**(12/5))) - 1
 
@@ -209,10 +328,10 @@ class turbulence:
     def var_bw_func(self):
         # This method computes the beam wander variance as an angular displacement at the receiver
         # Beam wander is typically 1-100 urad.
-        if link == 'up':
-            self.var_bw_r = 0.54 * (h_SC - h_AC)**2 * 1/np.cos(self.zenith_angles)**2 * (wavelength / (2*w0))**2 * (2*w0 / self.r0)**(5/3) * \
-                          (1 - ((self.kappa0**2 * w0**2) / (1 + self.kappa0**2 * w0**2))**(1/6))                        #REF: LASER BEAM PROPAGATION THROUGH RANDOM MEDIA, L.ANDREWS, EQ.12.50
-        elif link == 'down':
+        if self.config.link == 'up':
+            self.var_bw_r = 0.54 * (self.config.h_SC - self.config.h_AC)**2 * 1/np.cos(self.zenith_angles)**2 * (self.config.wavelength / (2*self.config.w0))**2 * (2*self.config.w0 / self.r0)**(5/3) * \
+                          (1 - ((self.kappa0**2 * self.config.w0**2) / (1 + self.kappa0**2 * self.config.w0**2))**(1/6))  #REF: LASER BEAM PROPAGATION THROUGH RANDOM MEDIA, L.ANDREWS, EQ.12.50
+        elif self.config.link == 'down':
             self.var_bw_r = np.zeros(self.zenith_angles.shape)
         self.std_bw_r = np.sqrt(self.var_bw_r)
 
@@ -224,11 +343,11 @@ class turbulence:
         # This method computes the Angle-of-arrival variance as an angular displacement at the receiver
         # Angle-of-arrival is typically 0.1-10 urad.
         # REF: LASER BEAM PROPAGATION THROUGH RANDOM MEDIA, L.ANDREWS, CH.12
-        if link == 'up':
+        if self.config.link == 'up':
             self.var_aoa = 2.91 * (self.mu_1u + 0.62 * self.mu_2u * self.Lambda**(11/6)) / \
-                           np.cos(self.zenith_angles) * (2 * D_r)**(1/3)                                                
-        elif link == 'down':
-            self.var_aoa = 2.91 * self.mu_0 / np.cos(self.zenith_angles) * (2 * D_r)**(1/3)                             
+                           np.cos(self.zenith_angles) * (2 * self.config.D_r)**(1/3)                                                
+        elif self.config.link == 'down':
+            self.var_aoa = 2.91 * self.mu_0 / np.cos(self.zenith_angles) * (2 * self.config.D_r)**(1/3)                             
 
         self.std_aoa  = np.sqrt(self.var_aoa)
         self.mean_aoa = np.zeros(np.shape(self.std_aoa))
@@ -240,7 +359,7 @@ class turbulence:
     def create_turb_distributions(self, data, steps=1000, effect = "scintillation"):
         # VERIFICATION REF: FREE SPACE OPTICAL COMMUNICATION, B. MUKHERJEE, 2017, FIG.5.1
         if effect == "scintillation":
-            if dist_scintillation == "lognormal":
+            if self.config.dist_scintillation == "lognormal":
                 # Create lognormal parameters
                 self.mean_scint_X = -0.5 * np.log(self.std_scint_I + 1)
                 # Giggenbach
@@ -248,77 +367,77 @@ class turbulence:
                 # Andrews, Random Media, Ch.5, eq.95
                 self.std_scint_X = np.sqrt(1 / 4 * np.log(self.var_scint_I + 1))  
 
-                self.x_scint, self.pdf_scint = dist.lognorm_pdf(mean=self.mean_scint_X[:, None], sigma=self.std_scint_X[:, None], steps=steps)
-                h_scint = dist.lognorm_rvs(data, mean=self.mean_scint_X[:, None], sigma=self.std_scint_X[:, None])
+                self.x_scint, self.pdf_scint = self.dist.lognorm_pdf(mean=self.mean_scint_X[:, None], sigma=self.std_scint_X[:, None], steps=steps)
+                h_scint = self.dist.lognorm_rvs(data, mean=self.mean_scint_X[:, None], sigma=self.std_scint_X[:, None])
                 return h_scint, self.std_scint_X, self.mean_scint_X
 
-            elif dist_scintillation == "gamma-gamma":
+            elif self.config.dist_scintillation == "gamma-gamma":
                 h_scint = np.zeros((len(self.ranges), steps))
                 x_scint = np.zeros((len(self.ranges), steps))
                 pdf_scint = np.zeros((len(self.ranges), steps))
                 cdf_scint = np.zeros((len(self.ranges), steps))
 
                 for i in range(len(self.ranges)):
-                    x_scint[i], pdf_scint[i] = dist.gg_pdf(alpha=self.alpha[i], beta=self.beta[i], steps=steps)
+                    x_scint[i], pdf_scint[i] = self.dist.gg_pdf(alpha=self.alpha[i], beta=self.beta[i], steps=steps)
                     cdf_scint[i, 0] = pdf_scint[i, 0]
                     for j in range(1, len(pdf_scint[i])):
                         cdf_scint[i, j] = np.trapz(pdf_scint[i, 1:j], x=x_scint[i, 1:j])
-                    h_scint[i] = dist.gg_rvs(pdf_scint[i], steps)
+                    h_scint[i] = self.dist.gg_rvs(pdf_scint[i], steps)
                 print("gamma-gamma distribution is not yet correctly implemented")
 
         elif effect == "beam wander":
-            if dist_beam_wander == "rayleigh":
+            if self.config.dist_beam_wander == "rayleigh":
                 # REF: Power vector generation tool for free-space optical links - PVGeT, Giggenbach, fig.3
                 self.std_bw_rayleigh = np.sqrt(2 / (4 - np.pi) * self.var_bw)
                 self.mean_bw_rayleigh = np.sqrt(np.pi / 2) * self.std_bw_rayleigh
 
-                self.pdf_bw, self.x_bw = dist.rayleigh_pdf(sigma=self.std_bw_rayleigh[:, None], steps=steps)
-                angle_bw_R = dist.rayleigh_rvs(data=data, sigma=self.std_bw_rayleigh[:, None])
+                self.pdf_bw, self.x_bw = self.dist.rayleigh_pdf(sigma=self.std_bw_rayleigh[:, None], steps=steps)
+                angle_bw_R = self.dist.rayleigh_rvs(data=data, sigma=self.std_bw_rayleigh[:, None])
                 return angle_bw_R, self.std_bw_rayleigh, self.mean_bw_rayleigh
 
 
-            elif dist_beam_wander == "rice":
+            elif self.config.dist_beam_wander == "rice":
                 self.std_bw_rice = np.sqrt(2 / (4 - np.pi) * self.var_bw)
                 self.mean_bw_rice = np.sqrt(self.mean_bw ** 2 + self.mean_bw ** 2)
 
-                self.x_bw, self.pdf_bw = dist.rice_pdf(effect=effect, sigma=self.std_bw_rice[:, None], steps=steps)
-                angle_bw_X = dist.norm_rvs(data=data[0], sigma=self.std_bw[:, None], mean=self.mean_bw[:, None])
-                angle_bw_Y = dist.norm_rvs(data=data[1], sigma=self.std_bw[:, None], mean=self.mean_bw[:, None])
+                self.x_bw, self.pdf_bw = self.dist.rice_pdf(effect=effect, sigma=self.std_bw_rice[:, None], steps=steps)
+                angle_bw_X = self.dist.norm_rvs(data=data[0], sigma=self.std_bw[:, None], mean=self.mean_bw[:, None])
+                angle_bw_Y = self.dist.norm_rvs(data=data[1], sigma=self.std_bw[:, None], mean=self.mean_bw[:, None])
                 angle_bw_R = np.sqrt(angle_bw_X ** 2 + angle_bw_Y ** 2)
                 return angle_bw_R, self.std_bw_rice, self.mean_bw_rice
 
         elif effect == "angle of arrival":
-            if dist_AoA == "rayleigh":
+            if self.config.dist_AoA == "rayleigh":
                 # REF: Power vector generation tool for free-space optical links - PVGeT, Giggenbach, fig.3
                 self.std_aoa_rayleigh = np.sqrt(2 / (4 - np.pi) * self.var_aoa)
                 self.mean_aoa_rayleigh = np.sqrt(np.pi / 2) * self.std_aoa_rayleigh
 
-                self.pdf_bw, self.x_aoa = dist.rayleigh_pdf(sigma=self.std_aoa_rayleigh[:, None], steps=steps)
-                angle_aoa_R = dist.rayleigh_rvs(data=data, sigma=self.std_aoa_rayleigh[:, None])
+                self.pdf_bw, self.x_aoa = self.dist.rayleigh_pdf(sigma=self.std_aoa_rayleigh[:, None], steps=steps)
+                angle_aoa_R = self.dist.rayleigh_rvs(data=data, sigma=self.std_aoa_rayleigh[:, None])
                 return angle_aoa_R, self.std_aoa_rayleigh, self.mean_aoa_rayleigh
 
-            if dist_AoA == "rice":
+            if self.config.dist_AoA == "rice":
                 self.std_aoa_rice = np.sqrt(2 / (4 - np.pi) * self.var_aoa)
                 self.mean_aoa_rice = np.sqrt(self.mean_aoa ** 2 + self.mean_aoa ** 2)
 
-                self.x_aoa, self.dist_AoA = dist.rice_pdf(effect=effect, sigma=self.std_aoa_rice[:, None], steps=steps)
-                angle_aoa_X = dist.norm_rvs(data=data[0], sigma=self.std_aoa[:, None], mean=self.mean_aoa[:, None])
-                angle_aoa_Y = dist.norm_rvs(data=data[0], sigma=self.std_aoa[:, None], mean=self.mean_aoa[:, None])
+                self.x_aoa, self.dist_AoA = self.dist.rice_pdf(effect=effect, sigma=self.std_aoa_rice[:, None], steps=steps)
+                angle_aoa_X = self.dist.norm_rvs(data=data[0], sigma=self.std_aoa[:, None], mean=self.mean_aoa[:, None])
+                angle_aoa_Y = self.dist.norm_rvs(data=data[0], sigma=self.std_aoa[:, None], mean=self.mean_aoa[:, None])
                 angle_aoa_R = np.sqrt(angle_aoa_X ** 2 + angle_aoa_Y ** 2)
                 return angle_aoa_R, self.std_aoa_rice, self.mean_aoa_rice
 
     def print(self, index, elevation, ranges, Vg, slew):
         print('TURBULENCE MODEL')
         print('------------------------------------------------')
-        print('Turbulence method used   : ', turbulence_model, 'for Cn^2,', wind_model_type, 'for wind speed')
-        print('Link (up or down)        : ', link)
+        print('Turbulence method used   : ', self.config.turbulence_model, 'for Cn^2,', self.config.wind_model_type, 'for wind speed')
+        print('Link (up or down)        : ', self.config.link)
         print('Range            [m]     : ', ranges[index])
         print('Elevation        [deg]   : ', np.round(elevation[index],2))
         print('Slew rate        [deg/s] : ', np.round(np.rad2deg(slew[index]), 2))
-        print('Aircraft altitude [km]   : ', self.height_profiles[index, 0] * 1.0E-3)
+        print('Aircraft altitude [km]   : ', self.h_cruise[index] * 1.0E-3)
         print('Aircraft speed   [m/s]   : ', np.round(Vg, 3))
         print('Windspeed rms    [m/s]   : ', np.round(self.windspeed_rms[index],2))
-        print('Cn^2 at h(0)     [m^2/3] : ', self.Cn2[index, 0])
+        print('Cn^2 at h(0)     [m^2/3] : ', self.Cn2_h0[index])
         print('r0               [cm]    : ', np.round(self.r0[index]*100,2))
         print('_____________________________')
         print('Var Rytov        [-]     : ', np.round(self.var_rytov[index], 2))
@@ -334,19 +453,121 @@ class turbulence:
         print('Diff limited spread [m]  : ', np.round(self.w_r[index], 2))
         print('------------------------------------------------')
 
+    def parameters(self):
+        # Names of all macro-scale turbulence parameters (1D vectors with one value for each macro-scale step), except the geometry
+        geometry = ['ranges', 'h_cruise', 'h_sc', 'zenith_angles']
+        return [key for key, value in vars(self).items()
+                if isinstance(value, np.ndarray) and value.ndim == 1 and len(value) == len(self.ranges) and key not in geometry]
+
+    @classmethod
+    def from_parameters(cls, ranges, zenith_angles, h_AC, h_SC, angle_div, parameters, config=config):
+        # Creates a turbulence object from precomputed macro-scale parameters (see turbulence_cache), without the height profiles.
+        # The object can be used as the output of all methods up to var_aoa_func (the 2D profiles, e.g. Cn2, are not available).
+        turb = cls.__new__(cls)
+        turb.config = config
+        turb.dist = distributions(config)
+        turb.angle_div = angle_div
+        turb.ranges = ranges
+        turb.h_cruise = h_AC
+        turb.h_limit = 20.0E3
+        turb.h_sc = h_SC
+        turb.zenith_angles = zenith_angles
+        turb.kappa0 = 30.0
+        turb.A = 1.7e-14
+        for key, value in parameters.items():
+            setattr(turb, key, value)
+        return turb
+
+    def select(self, rows):
+        # Returns a copy of this turbulence object with all macro-scale vectors sliced to 'rows'.
+        # This is used by the micro-scale model, to simulate the channel for a chunk of macro-scale time steps.
+        # With a slice for 'rows', all arrays are views of the original arrays (no copies of the height profiles).
+        turb = copy.copy(self)
+        for key, value in vars(self).items():
+            if isinstance(value, np.ndarray) and value.ndim > 0 and len(value) == len(self.ranges):
+                setattr(turb, key, value[rows])
+        return turb
+
+
+
+
+class turbulence_cache:
+    # Least-recently-used cache of the macro-scale turbulence parameters (r0, var_rytov, var_scint_I/P, var_aoa, var_bw, freq, ...)
+    # The key of each macro-scale step is its geometry (h_AC, h_SC, zenith, range, slew rate, speed AC), quantised with 'resolution'.
+    # The parameters of a key are computed at the quantised geometry, so the cached values do not depend on the order of the lookups.
+    # With a file, the cache persists across runs. It is only loaded if it was made with the same model parameters (signature).
+    def __init__(self, resolution, maxsize=100000, signature=None):
+        self.resolution = np.array(resolution, dtype=np.float64)
+        self.maxsize = maxsize
+        self.signature = signature
+        self.entries = OrderedDict()
+        self.names = None
+        self.hits = 0
+        self.misses = 0
+
+    def quantise(self, geometry):
+        # Returns the keys (tuples of integers) and the quantised geometry of all rows of 'geometry' (rows x 6)
+        steps = np.round(geometry / self.resolution).astype(np.int64)
+        return [tuple(row) for row in steps.tolist()], steps * self.resolution
+
+    def get(self, key):
+        # Returns the cached parameters of 'key' (or None) and marks the key as most recently used
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def save(self, filename):
+        with open(filename, 'wb') as file:
+            pickle.dump({'resolution': self.resolution, 'signature': self.signature, 'names': self.names,
+                         'entries': self.entries}, file)
+
+    @classmethod
+    def load(cls, filename, resolution, maxsize=100000, signature=None):
+        # Loads the cache from 'filename'. A new (empty) cache is returned if the file does not exist or if it was
+        # made with another resolution or signature.
+        cache = cls(resolution, maxsize, signature)
+        if filename is None or not os.path.exists(filename):
+            return cache
+        with open(filename, 'rb') as file:
+            data = pickle.load(file)
+        if np.array_equal(data['resolution'], cache.resolution) and data['signature'] == signature:
+            cache.names = data['names']
+            for key, value in data['entries'].items():
+                cache.put(key, value)
+        return cache
 
+    def print(self):
+        print('TURBULENCE CACHE')
+        print('------------------------------------------------')
+        print('Cached geometries        : ' + str(len(self.entries)) + ' (max. ' + str(self.maxsize) + ')')
+        print('Hits                     : ' + str(self.hits))
+        print('Misses                   : ' + str(self.misses))
+        print('------------------------------------------------')
 
+# In-memory turbulence caches, for each (signature, resolution)
+turbulence_caches = {}
 
 class attenuation:
     def __init__(self,
                  att_coeff = 0.0025,         # Clear atmosphere: 0.0025 (1550nm, 690 nm), 0.1 (850nm), 0.13 (550nm)
                  H_scale = 6600,
-                 refraction = np.array((1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.01, 1.03, 1.05, 1.3))
+                 refraction = np.array((1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.01, 1.03, 1.05, 1.3)),
+                 seed=None,
+                 config=config
                  ):
 
+        self.config = config
+        self.dist = distributions(config, seed)
         # Range and height
-        self.h0 = h_AC
-        self.h1 = h_SC
+        self.h0 = self.config.h_AC
+        self.h1 = self.config.h_SC
         self.h_limit = 100.0E3 #m
         self.H_scale = H_scale
 
@@ -363,14 +584,14 @@ class attenuation:
         if method == 'static':
             self.h_clouds = 0.8
         elif method == 'distribution':
-            sampling_frequency = 1 / step_size_link
+            sampling_frequency = 1 / self.config.step_size_link
             ext_frequency = 1 / 600  # 10 minute frequency of the transmission due to clouds
 
             # For h_clouds, first generate random values for cloud transmission loss. Then, use a lowpass filter to implement a cut-off frequency of 10 min.
             # Then convert to lognormal distribution (IVANOV ET AL. 2022, EQ.18). Then use the mask from routing model to filter.
             # For h_ext, use a model that computes molecule/aerosol transmission loss.
             samples_link_level = len(time)
-            h_clouds = norm.rvs(scale=1, loc=0, size=samples_link_level)
+            h_clouds = self.dist.standard_normal(effect='clouds', out=np.empty(samples_link_level))
             order = 2
             h_clouds = filtering(effect='extinction', order=order, data=h_clouds, f_cutoff_low=ext_frequency,
                                  filter_type='lowpass', f_sampling=sampling_frequency, plot='no')
@@ -380,7 +601,7 @@ class attenuation:
             mean = 1.44 #dB
             var = 2.31
             sigma = np.sqrt(var)
-            self.h_clouds = dB2W(-dist.lognorm_rvs(data=h_clouds, sigma=sigma, mean=mean))
+            self.h_clouds = dB2W(-self.dist.lognorm_rvs(data=h_clouds, sigma=sigma, mean=mean))
 
     def plot(self):
 
@@ -394,8 +615,8 @@ class attenuation:
     def print(self):
         print('ATMOSPHERE MODEL')
         print('------------------------------------------------')
-        print('Attenuation method used : ' + method_att)
-        print('Cloud method used       : ' + method_clouds)
+        print('Attenuation method used : ' + self.config.method_att)
+        print('Cloud method used       : ' + self.config.method_clouds)
         print('Scale heigh             : ' + str(self.H_scale)+' m')
         print('Surface att. coefficient: ' + str(self.b_v))
         print('------------------------------------------------')
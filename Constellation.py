@@ -25,30 +25,31 @@ from helper_functions import *
 spice.load_standard_kernels()
 
 class constellation:
-    def __init__(self):
+    def __init__(self, config=config):
+        self.config = config
         # settings = propagation_setup.propagator.PropagationPrintSettings
         # settings.disable_all_printing(self=tudatpy.kernel.numerical_simulation.propagation_setup.propagator.PropagationPrintSettings)
         # ------------------------------------------------------------------------
         # --------------------------CHOOSE-SATELLITE-SETUP------------------------
         # ------------------------------------------------------------------------
         # Define set up of all satellites in the constellation
-        if constellation_type == "LEO_cons":
-            self.RAAN_init = np.linspace(0.0, 360.0*(1-1/number_of_planes), number_of_planes)
-            self.TA_init = np.linspace(0.0, 360.0*(1-1/number_sats_per_plane), number_sats_per_plane)
+        if self.config.constellation_type == "LEO_cons":
+            self.RAAN_init = np.linspace(0.0, 360.0*(1-1/self.config.number_of_planes), self.config.number_of_planes)
+            self.TA_init = np.linspace(0.0, 360.0*(1-1/self.config.number_sats_per_plane), self.config.number_sats_per_plane)
 
-        elif constellation_type == "LEO_1":
+        elif self.config.constellation_type == "LEO_1":
             self.RAAN_init = 240.0  # * ureg.degree
             self.TA_init = 0.0  # * ureg.degree
-        elif constellation_type == "GEO":
+        elif self.config.constellation_type == "GEO":
             height_init = 35800.0  # * ureg.kilometer
             inc_init = 0.0  # * ureg.degree
             self.RAAN_init = 1.0  # * ureg.degree
             self.TA_init = 1.0  # * ureg.degree
 
-        self.number_of_planes = number_of_planes
-        self.number_sats_per_plane = number_sats_per_plane
-        self.height_init = h_SC
-        self.inc_init = inc_SC
+        self.number_of_planes = self.config.number_of_planes
+        self.number_sats_per_plane = self.config.number_sats_per_plane
+        self.height_init = self.config.h_SC
+        self.inc_init = self.config.inc_SC
         self.ECC_init = 0.0  # * ureg.degree
         self.omega_init = 237.5  # * ureg.degree
 
@@ -128,7 +129,7 @@ class constellation:
             # ------------------------------------------------------------------------
 
             # Propagate trajectories for each satellite
-            f = open(TLE_filename_load, "r")
+            f = open(self.config.TLE_filename_load, "r")
             data = json.loads(f.read())
             sat_index = 0
             for i in data:
@@ -188,9 +189,9 @@ class constellation:
 
                 # Define type of propagator (Default is Runge Kutta 4)
                 # And create numerical integrator settings
-                if integrator == "Runge Kutta 4":
+                if self.config.integrator == "Runge Kutta 4":
                     coefficient_set = propagation_setup.integrator.rkf_45
-                elif integrator == "Runge Kutta 78":
+                elif self.config.integrator == "Runge Kutta 78":
                     coefficient_set = propagation_setup.integrator.rkf_78
 
                 self.integrator_settings = propagation_setup.integrator.runge_kutta_variable_step_size(
@@ -238,12 +239,12 @@ class constellation:
             print('SATELLITE PROPAGATION MODEL')
             print('------------------------------------------------')
             print('Satellite positional data propagated with TLE data')
-            print('Integrator               : ' + str(integrator))
-            print('Step size                : ' + str(step_size_SC) + 'sec')
-            print('Initial altitude         : ' + str(h_SC*1.0E-3) + 'km')
-            print('Initial inclination      : ' + str(inc_SC) + 'degrees')
-            print('Number of planes         : ' + str(number_of_planes))
-            print('Number of sats per plane : ' + str(number_sats_per_plane))
+            print('Integrator               : ' + str(self.config.integrator))
+            print('Step size                : ' + str(self.config.step_size_SC) + 'sec')
+            print('Initial altitude         : ' + str(self.config.h_SC*1.0E-3) + 'km')
+            print('Initial inclination      : ' + str(self.config.inc_SC) + 'degrees')
+            print('Number of planes         : ' + str(self.config.number_of_planes))
+            print('Number of sats per plane : ' + str(self.config.number_sats_per_plane))
             print('------------------------------------------------')
 
 
@@ -284,10 +285,10 @@ class constellation:
                 for sat in range(self.number_sats_per_plane):
                     sat_index = plane * self.number_sats_per_plane + sat
 
-                    if constellation_type == "LEO_cons":
+                    if self.config.constellation_type == "LEO_cons":
                         RAAN_init = self.RAAN_init[plane]
                         TA_init = self.TA_init[sat]
-                    elif constellation_type == "LEO_1" or self.sat_setup == "GEO":
+                    elif self.config.constellation_type == "LEO_1" or self.sat_setup == "GEO":
                         RAAN_init = self.RAAN_init
                         TA_init = self.TA_init
                     # Set initial conditions for the satellite that will be
@@ -330,9 +331,9 @@ class constellation:
 
                     # Define type of propagator (Default is Runge Kutta 4)
                     # And create numerical integrator settings
-                    if integrator == "Runge Kutta 4":
+                    if self.config.integrator == "Runge Kutta 4":
                         coefficient_set = propagation_setup.integrator.rkf_45
-                    elif integrator == "Runge Kutta 78":
+                    elif self.config.integrator == "Runge Kutta 78":
                         coefficient_set = propagation_setup.integrator.rkf_78
 
                     self.integrator_settings = propagation_setup.integrator.runge_kutta_variable_step_size(
@@ -381,16 +382,16 @@ class constellation:
             print('SATELLITE PROPAGATION MODEL')
             print('------------------------------------------------')
             print('Satellite positional data propagated with Tudat')
-            print('Integrator               : ' + str(integrator))
-            print('Step size                : ' + str(step_size_SC) + 'sec')
-            print('Initial altitude         : ' + str(h_SC * 1.0E-3) + 'km')
-            print('Initial inclination      : ' + str(inc_SC) + 'degrees')
-            print('Number of planes         : ' + str(number_of_planes))
-            print('Number of sats per plane : ' + str(number_sats_per_plane))
+            print('Integrator               : ' + str(self.config.integrator))
+            print('Step size                : ' + str(self.config.step_size_SC) + 'sec')
+            print('Initial altitude         : ' + str(self.config.h_SC * 1.0E-3) + 'km')
+            print('Initial inclination      : ' + str(self.config.inc_SC) + 'degrees')
+            print('Number of planes         : ' + str(self.config.number_of_planes))
+            print('Number of sats per plane : ' + str(self.config.number_sats_per_plane))
             print('------------------------------------------------')
 
 
-        if constellation_data == 'SAVE':
+        if self.config.constellation_data == 'SAVE':
             print('Saving states and dependent variables of all satellites to json file')
             # Converting arrays to lists
             for i in range(len(self.geometric_data_sats['satellite name'])):
@@ -398,14 +399,14 @@ class constellation:
                 self.geometric_data_sats['dependent variables'][i] = self.geometric_data_sats['dependent variables'][i].tolist()
                 # print(self.geometric_data_sats['states'][i])
             # Save to json file
-            with open(SC_filename_save, 'w') as fp:
+            with open(self.config.SC_filename_save, 'w') as fp:
                 json.dump(self.geometric_data_sats, fp)
             exit()
         else:
             return self.geometric_data_sats, self.time
 
     def propagate_load(self, time):
-        with open(SC_filename_load, 'r') as fp:
+        with open(self.config.SC_filename_load, 'r') as fp:
             self.geometric_data_sats = json.load(fp)
 
         for i in range(len(self.geometric_data_sats['satellite name'])):
@@ -419,14 +420,14 @@ class constellation:
 
         print('SPACECRAFT PROPAGATION MODEL')
         print('------------------------------------------------')
-        if method_SC == 'tudat':
+        if self.config.method_SC == 'tudat':
             print('Spacecraft positional data retrieved from own algorithm with TUDAT library ')
-        elif method_SC == 'TLE':
+        elif self.config.method_SC == 'TLE':
             print('Spacecraft positional data retrieved from TLE and propagated with TUDAT library')
-        print('Sat constellation file : ' + SC_filename_load)
+        print('Sat constellation file : ' + self.config.SC_filename_load)
         print('Number of satellites   : ' + str(len(self.geometric_data_sats['satellite name'])))
-        print('Inclination            : ' + str(inc_SC) + ' deg')
-        print('Altitude               : ' + str(h_SC/1e3)   + ' km')
+        print('Inclination            : ' + str(self.config.inc_SC) + ' deg')
+        print('Altitude               : ' + str(self.config.h_SC/1e3)   + ' km')
         print('------------------------------------------------')
 
 
@@ -510,8 +511,8 @@ class constellation:
                 delta_r = np.sqrt(delta_x ** 2 + delta_y ** 2 + delta_z ** 2)
                 delta_h = abs(h_bench - h)
                 time_hrs = [t / 3600 for t in time]
-                T_fs = (wavelength / (4 * np.pi * h)) ** 2
-                T_fs_bench = (wavelength / (4 * np.pi * h_bench)) ** 2
+                T_fs = (self.config.wavelength / (4 * np.pi * h)) ** 2
+                T_fs_bench = (self.config.wavelength / (4 * np.pi * h_bench)) ** 2
                 delta_T_fs = abs(W2dB(T_fs) - W2dB(T_fs_bench))
 
                 print('plotting')
@@ -620,8 +621,8 @@ class constellation:
                     delta_r = np.sqrt(delta_x**2 + delta_y**2 + delta_z**2)
                     delta_h = abs(h_bench - h)
                     time_hrs = [t / 3600 for t in time]
-                    T_fs = (wavelength / (4 * np.pi * h)) ** 2
-                    T_fs_bench = (wavelength / (4 * np.pi * h_bench)) ** 2
+                    T_fs = (self.config.wavelength / (4 * np.pi * h)) ** 2
+                    T_fs_bench = (self.config.wavelength / (4 * np.pi * h_bench)) ** 2
                     delta_T_fs = abs(W2dB(T_fs) - W2dB(T_fs_bench))
 
                     print('plotting')
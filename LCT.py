@@ -1,11 +1,19 @@
 # Load other modules
 from helper_functions import *
-from PDF import dist
+from PDF import distributions
 
 # Load packages
 import numpy as np
+# Optional: numexpr evaluates the SNR and Q expressions of the fused bit-level kernel in one pass (multithreaded).
+# Without numexpr, the kernel falls back to in-place NumPy operations.
+try:
+    import numexpr
+except ImportError:
+    numexpr = None
 
 
+# Tables of Pr against log(BER), for each (config, M_PPM, modulation, detection, steps). See terminal_properties.BER_to_P_r_interp
+sensitivity_tables = {}
 
 class terminal_properties:
     # The terminal properties class models all processes within terminal TX and RX.
@@ -20,17 +28,19 @@ class terminal_properties:
     #   (6) coding                       : Models the RS coding scheme, computes a coded variant of the BER from (4)
     #   (7) create_pointing_distributions: Models the platform pointing jitter and creates a Rayleigh distribution
 
-    def __init__(self):
+    def __init__(self, config=config):
+        self.config = config
+        self.dist = distributions(config)
         self.m = 1
-        self.modulation = modulation
-        self.detection = detection
-        self.data_rate = data_rate
-        self.Sn_out = h * v / 2                                                                                         # REF: Gallion, Eq. 3-75
-        if M > 1:
-            k = (noise_factor * M - 1 ) / (M - 1)                                                                       # REF: Gallion, Eq. 3-76
+        self.modulation = self.config.modulation
+        self.detection = self.config.detection
+        self.data_rate = self.config.data_rate
+        self.Sn_out = h * self.config.v / 2                                                                             # REF: Gallion, Eq. 3-75
+        if self.config.M > 1:
+            k = (self.config.noise_factor * self.config.M - 1 ) / (self.config.M - 1)                                   # REF: Gallion, Eq. 3-76
         else:
             k = 0
-        self.Sn = (k + 1) * (M - 1) * (h * v / 2) + (h * v / 2)                                                         # REF: Gallion, Eq. 3-75
+        self.Sn = (k + 1) * (self.config.M - 1) * (h * self.config.v / 2) + (h * self.config.v / 2)                     # REF: Gallion, Eq. 3-75
 
     # ------------------------------------------------------------------------
     # ----------------------------------NOISE---------------------------------
@@ -46,20 +56,20 @@ class terminal_properties:
         # For a low number of incoming photons (<20 BPP) , the shot noise distribution is POISON.
         # For a high number of incoming photons (>20 BPP), the shot noise distributino is approximated as GAUSSIAN.
         # REF: BASICS OF INCOHERENT AND COHERENT OPTICAL COMMUNICATIONS, P.GALLION, EQ.3.55
-        noise_sh = 4 * self.Sn * R ** 2 * P_r * Be / eff_quantum                                                        
+        noise_sh = 4 * self.Sn * self.config.R ** 2 * P_r * self.config.Be / self.config.eff_quantum                                                        
 
         # Thermal/circuit noise is a system characteristic and thus signal-independent
         # REF: BASICS OF INCOHERENT AND COHERENT OPTICAL COMMUNICATIONS, P.GALLION, EQ.3.100
-        noise_th = (4 * k * T_s * Be / R_L)                                                                             
+        noise_th = (4 * k * self.config.T_s * self.config.Be / self.config.R_L)                                                                             
 
         # Background noise is caused by sun and atmosphere
         # Solar irradiance are defined in input.py, atmospheric irradiance is neglected.
         # REF: DEEP SPACE OPTICAL COMMUNICATIONS, H.HEMMATI
-        noise_bg = background_noise(Sn=self.Sn,R=R,I=I_sun,D=D_r,delta_wavelength=delta_wavelength, FOV=FOV_r, Be=Be)   
+        noise_bg = background_noise(Sn=self.Sn,R=self.config.R,I=I_sun,D=self.config.D_r,delta_wavelength=self.config.delta_wavelength, FOV=self.config.FOV_r, Be=self.config.Be)   
 
         # Noise-against-noise beating is defined by the squared response of the optical detector.
         # REF: BASICS OF INCOHERENT AND COHERENT OPTICAL COMMUNICATIONS, P.GALLION, EQ.3.98
-        noise_beat = 2 * self.m * R**2 * self.Sn**2 * (BW - Be/2) * Be                                                  
+        noise_beat = 2 * self.m * self.config.R**2 * self.Sn**2 * (self.config.BW - self.config.Be/2) * self.config.Be                                                  
 
         if micro_scale == 'yes':
             print('NOISE MODEL')
@@ -82,8 +92,14 @@ class terminal_properties:
                   modulation = "OOK-NRZ",
                   detection = "APD",
                   threshold = False,
-                  coding = False):
+                  coding = False,
+                  engine = None):
         BER = np.array(BER)
+        # For coding, engine is 'table' (interpolation in a cached BER --> Pr table) or 'exact' (sensitivity equations for each element)
+        if engine is None:
+            engine = self.config.sensitivity_engine
+        if coding == True and engine == 'table':
+            return self.BER_to_P_r_interp(BER=BER, M_PPM=M_PPM, modulation=modulation, detection=detection)
 
         # Firstly, compute SNR threshold. This depends on the modulation type (BER --> SNR)
         if modulation == "OOK-NRZ":
@@ -105,20 +121,20 @@ class terminal_properties:
         # Secondly, compute Pr threshold. This depends on the detection type and noise (SNR --> Pr)
         if detection == "PIN":
             # REF: BASICS OF INCOHERENT AND COHERENT DIGITAL OPTICAL COMMUNICATIONS, P.GALLION, EQ.3.123
-            P_r = Q * 2 * np.sqrt(4 * k * T_s * Be / R_L) / R                                                           
+            P_r = Q * 2 * np.sqrt(4 * k * self.config.T_s * self.config.Be / self.config.R_L) / self.config.R                                                           
         elif detection == "APD" or detection == "Preamp":
             # REF: BASICS OF INCOHERENT AND COHERENT DIGITAL OPTICAL COMMUNICATIONS, P.GALLION, EQ.3.130
-            P_r = 2 * Q * self.Sn * 2 * Be / M * \
-                  (Q + np.sqrt(self.m/2 * (2*BW/(2*Be) - 1/2) + 2 * k * T_s / (R_L * 4 * Be * R**2 * self.Sn**2)))      
+            P_r = 2 * Q * self.Sn * 2 * self.config.Be / self.config.M * \
+                  (Q + np.sqrt(self.m/2 * (2*self.config.BW/(2*self.config.Be) - 1/2) + 2 * k * self.config.T_s / (self.config.R_L * 4 * self.config.Be * self.config.R**2 * self.Sn**2)))      
         elif detection == "quantum limit":
             # REF: BASICS OF INCOHERENT AND COHERENT DIGITAL OPTICAL COMMUNICATIONS, P.GALLION
-            P_r = Q**2 * h * v * 2 * Be / eff_quantum
+            P_r = Q**2 * h * self.config.v * 2 * self.config.Be / self.config.eff_quantum
 
-        PPB = PPB_func(P_r, data_rate)
+        PPB = PPB_func(P_r, self.config.data_rate, self.config)
 
         # Create attributes for the sensitivity if 'threshold == True'
         if threshold == True:
-            P_r = P_r * dB2W(margin_buffer*np.ones(P_r.shape))
+            P_r = P_r * dB2W(self.config.margin_buffer*np.ones(P_r.shape))
 
             self.BER_thres = BER
             self.P_r_thres = P_r
@@ -128,6 +144,38 @@ class terminal_properties:
         elif coding == True:
             return P_r
 
+    def BER_to_P_r_interp(self,
+                          BER,
+                          M_PPM = 32,
+                          modulation = "OOK-NRZ",
+                          detection = "APD",
+                          steps = 100000):
+        # This method computes the Pr threshold from a table of Pr against log(BER), which is built once for each
+        # modulation, detection and terminal configuration (see 'sensitivity_tables')
+        # Elements outside of the table (BER < 1e-300, BER > 0.5 or BER = 0) are computed with the sensitivity equations
+        key = (self.config, M_PPM, modulation, detection, steps)
+        if key not in sensitivity_tables:
+            log_BER = np.linspace(-300.0, np.log10(0.5), steps)
+            sensitivity_tables[key] = (log_BER, self.BER_to_P_r(BER=10**log_BER, M_PPM=M_PPM, modulation=modulation,
+                                                                detection=detection, coding=True, engine='exact'))
+        log_BER, P_r_table = sensitivity_tables[key]
+
+        # The grid is uniform, so the table index follows directly from log(BER) (no search as in np.interp)
+        BER = np.asarray(BER, dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x = np.log10(BER)
+            u = (x - log_BER[0]) * ((steps - 1) / (log_BER[-1] - log_BER[0]))
+            outside = ~((u >= 0.0) & (u <= steps - 1))
+            u[outside] = 0.0
+        i = u.astype(np.intp)
+        np.minimum(i, steps - 2, out=i)
+        u -= i
+        P_r = P_r_table[i] + u * (P_r_table[i + 1] - P_r_table[i])
+        if outside.any():
+            P_r[outside] = self.BER_to_P_r(BER=BER[outside], M_PPM=M_PPM, modulation=modulation, detection=detection,
+                                           coding=True, engine='exact')
+        return P_r
+
     # ------------------------------------------------------------------------
     # --------------------------------SNR-&-BER-------------------------------
     # ------------------------------------------------------------------------
@@ -141,30 +189,35 @@ class terminal_properties:
                  detection = "APD",):
 
         if detection == "PIN":
-            Sn = h * v / 2
-            noise_sh = shot_noise(Sn, R=R, Be=Be, eff_quantum=eff_quantum, P=P_r)
+            Sn = h * self.config.v / 2
+            noise_sh = shot_noise(Sn, R=self.config.R, Be=self.config.Be, eff_quantum=self.config.eff_quantum, P=P_r)
             noise = noise_th + noise_sh
-            signal = (P_r * R)**2
+            signal = (P_r * self.config.R)**2
             SNR = signal / noise
             Q = np.sqrt(signal) / (2 * np.sqrt(noise))
 
         elif detection == "APD" or detection == "Preamp":
-            SNR = (M * P_r * R)**2 / (noise_sh + noise_bg + noise_beat + noise_th)
-            Q = M * P_r * R / (np.sqrt(noise_sh) + 2*np.sqrt(noise_bg) + 2*np.sqrt(noise_beat) + 2*np.sqrt(noise_th))
+            SNR = (self.config.M * P_r * self.config.R)**2 / (noise_sh + noise_bg + noise_beat + noise_th)
+            Q = self.config.M * P_r * self.config.R / (np.sqrt(noise_sh) + 2*np.sqrt(noise_bg) + 2*np.sqrt(noise_beat) + 2*np.sqrt(noise_th))
 
         elif detection == "quantum limit":
             # REF: Gallion Eq. 3-112
-            SNR = P_r * eff_quantum / (2 * h * v * Be)  
+            SNR = P_r * self.config.eff_quantum / (2 * h * self.config.v * self.config.Be)  
             # REF: Gallion Eq. 3-113                                                                
-            Q = P_r * R / np.sqrt(2*q*P_r * R*Be)                                                                       
+            Q = P_r * self.config.R / np.sqrt(2*q*P_r * self.config.R*self.config.Be)                                                                       
         return SNR, Q
 
     def BER_func(self,
                  Q: np.array,
                  M_PPM = 32,
                  modulation = "OOK-NRZ",
-                 micro_scale = 'no'):
-        if modulation == "OOK-NRZ":
+                 micro_scale = 'no',
+                 log = False):
+        # With log=True, log10(BER) is returned. It is computed with log-erfc, log(erfc(x)) = log(2) + log_ndtr(-sqrt(2) * x),
+        # hence it does not underflow for large Q (the linear BER is 0.0 below about 1e-308).
+        if log:
+            BER = log_BER_func(Q, M_PPM, modulation)
+        elif modulation == "OOK-NRZ":
             # REF: FREE-SPACE LASER COMMUNICATIONS, PRINCIPLES AND ADVANCES, A.MAJUMDAR, 2008, CH.3 EQ.8
             BER = 1/2 * erfc( Q / np.sqrt(2) )
 
@@ -190,38 +243,184 @@ class terminal_properties:
         if micro_scale == 'yes':
             print('DETECTION & MODULATION SCHEME')
             print('------------------------------------------------')
-            print('Detection scheme        :' , detection)
-            print('Pre-amp gain RX         : ', M)
-            print('Pre-ampnoise-factor RX  : ', noise_factor)
-            print('Optical  bandwidth RX   : ', BW*1.0E-9,'GHz')
-            print('Electrical bandwidth RX : ', Be*1.0E-9,'GHz')
+            print('Detection scheme        :' , self.config.detection)
+            print('Pre-amp gain RX         : ', self.config.M)
+            print('Pre-ampnoise-factor RX  : ', self.config.noise_factor)
+            print('Optical  bandwidth RX   : ', self.config.BW*1.0E-9,'GHz')
+            print('Electrical bandwidth RX : ', self.config.Be*1.0E-9,'GHz')
             print('Modulation scheme       :', modulation)
-            print('Coding                  :', coding)
-            if coding == 'yes':
-                print('Symbol length            :', symbol_length)
-                print('N, K                     :', N, K)
-                print('Interleaving latency     :', latency_interleaving)
+            print('Coding                  :', self.config.coding)
+            if self.config.coding == 'yes':
+                print('Symbol length            :', self.config.symbol_length)
+                print('N, K                     :', self.config.N, self.config.K)
+                print('Interleaving latency     :', self.config.latency_interleaving)
+                print('Interleaver              :', self.config.interleaver)
+                print('Coding engine            :', self.config.coding_engine)
             print('------------------------------------------------')
 
         return BER
 
 
-    def interleaving(self, BER):
-        # This method takes the original (uncoded) BER array and redistributes the values of all elements over X neighbouring elements
-        # Where X is equal to 'spread'
-        spread = int(np.round(latency_interleaving / step_size_channel_level,0) + 1)
-        BER_per_sample = BER / spread
-        BER_interleaved = np.zeros(np.shape(BER))
+    def BER_kernel(self,
+                   P_r,
+                   I_sun = 0.02,
+                   M_PPM = 32,
+                   modulation = "OOK-NRZ",
+                   detection = "APD",
+                   SNR = False,
+                   log_BER = False,
+                   block_size = 2**18):
+        # This method fuses 'noise', 'SNR_func' and 'BER_func': Q, BER (and optionally SNR) are computed directly from P_r,
+        # block by block (about 'block_size' elements) into preallocated output arrays.
+        # Only shot noise depends on P_r, the other noise contributions are constants. For each detection scheme, Q and SNR are
+        # written as  Q = P_r * c_Q / (sqrt(c_sh * P_r) + c_n)  and  SNR = (c_S * P_r)**2 / (c_sh * P_r + c_d).
+        # The BER is limited to a minimum of 1e-50 (as in bit_level).
+        # With log_BER=True, the BER is computed in log space (log-erfc, see log_BER_func) and log10(BER) is returned as fourth output,
+        # without the 1e-50 limit. The linear BER then follows from the same pass (BER = exp(log BER)).
+        P_r_data = np.asarray(np.ma.getdata(P_r), dtype=np.float64)
+        Q_out = np.empty_like(P_r_data)
+        BER_out = np.empty_like(P_r_data)
+        SNR_out = np.empty_like(P_r_data) if SNR else None
+        log_BER_out = np.empty_like(P_r_data) if log_BER else None
 
-        for i in range(0, spread):
-            BER_interleaved += np.roll(BER_per_sample, i, axis=1)
+        if detection == "PIN":
+            noise_th = 4 * k * self.config.T_s * self.config.Be / self.config.R_L
+            c_sh = 4 * (h * self.config.v / 2) * self.config.R ** 2 * self.config.Be / self.config.eff_quantum
+            # Q = P_r * R / (2 * sqrt(noise_th + c_sh * P_r))
+            Q_expr   = 'P * c_Q / (2 * sqrt(c_sh * P + c_d))'
+            SNR_expr = '(c_S * P)**2 / (c_sh * P + c_d)'
+            constants = {'c_Q': self.config.R, 'c_S': self.config.R, 'c_sh': c_sh, 'c_d': noise_th}
+        elif detection == "APD" or detection == "Preamp":
+            noise_sh, noise_th, noise_bg, noise_beat = self.noise(P_r=1.0, I_sun=I_sun)
+            Q_expr   = 'P * c_Q / (sqrt(c_sh * P) + c_n)'
+            SNR_expr = '(c_S * P)**2 / (c_sh * P + c_d)'
+            constants = {'c_Q': self.config.M * self.config.R, 'c_S': self.config.M * self.config.R, 'c_sh': noise_sh,
+                         'c_n': 2 * np.sqrt(noise_bg) + 2 * np.sqrt(noise_beat) + 2 * np.sqrt(noise_th),
+                         'c_d': noise_bg + noise_beat + noise_th}
+        elif detection == "quantum limit":
+            # REF: Gallion Eq. 3-112 & 3-113
+            Q_expr   = 'P * c_Q / sqrt(c_sh * P)'
+            SNR_expr = 'P * c_S'
+            constants = {'c_Q': self.config.R, 'c_sh': 2 * q * self.config.R * self.config.Be,
+                         'c_S': self.config.eff_quantum / (2 * h * self.config.v * self.config.Be)}
+
+        # BER = c_B * f(c_E * Q**n), with f either erfc or exp
+        if modulation == "OOK-NRZ" or modulation == "DPSK":
+            c_B, c_E, n, f = 1/2, 1 / np.sqrt(2), 1, erfc
+        elif modulation == "2-PPM" or modulation == "2PolSK":
+            c_B, c_E, n, f = 1/2, -1/2, 2, np.exp
+        elif modulation == "M-PPM":
+            c_B, c_E, n, f = M_PPM/4, 1/2 * np.sqrt(M_PPM*np.log2(M_PPM)), 2, erfc
+        elif modulation == "BPSK":
+            c_B, c_E, n, f = 1/2, 1.0, 1, erfc
+        elif modulation == "QPSK":
+            c_B, c_E, n, f = 1.0, 1.0, 1, erfc
+
+        P_flat, Q_flat, BER_flat = P_r_data.reshape(-1), Q_out.reshape(-1), BER_out.reshape(-1)
+        SNR_flat = SNR_out.reshape(-1) if SNR else None
+        log_BER_flat = log_BER_out.reshape(-1) if log_BER else None
+        buffer = np.empty(min(block_size, P_flat.size))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for start in range(0, P_flat.size, block_size):
+                block = slice(start, min(start + block_size, P_flat.size))
+                P, Q, BER, tmp = P_flat[block], Q_flat[block], BER_flat[block], buffer[:block.stop - block.start]
+
+                if numexpr is not None:
+                    numexpr.evaluate(Q_expr, local_dict=dict(constants, P=P), out=Q)
+                    if SNR:
+                        numexpr.evaluate(SNR_expr, local_dict=dict(constants, P=P), out=SNR_flat[block])
+                else:
+                    np.multiply(P, constants['c_sh'], out=tmp)
+                    if SNR:
+                        if detection == "quantum limit":
+                            np.multiply(P, constants['c_S'], out=SNR_flat[block])
+                        else:
+                            np.add(tmp, constants['c_d'], out=SNR_flat[block])
+                            np.multiply(P, constants['c_S'], out=Q)
+                            np.square(Q, out=Q)
+                            np.divide(Q, SNR_flat[block], out=SNR_flat[block])
+                    if detection == "PIN":
+                        np.add(tmp, constants['c_d'], out=tmp)
+                        np.sqrt(tmp, out=tmp)
+                        np.multiply(tmp, 2, out=tmp)
+                    else:
+                        np.sqrt(tmp, out=tmp)
+                        if detection != "quantum limit":
+                            np.add(tmp, constants['c_n'], out=tmp)
+                    np.multiply(P, constants['c_Q'], out=Q)
+                    np.divide(Q, tmp, out=Q)
+
+                if n == 2:
+                    np.square(Q, out=tmp)
+                    np.multiply(tmp, c_E, out=tmp)
+                else:
+                    np.multiply(Q, c_E, out=tmp)
+                if log_BER:
+                    # Natural log of the BER: log(c_B) + log(erfc(x)) or log(c_B) + x
+                    log_B = log_BER_flat[block]
+                    if f is erfc:
+                        np.multiply(tmp, -np.sqrt(2), out=log_B)
+                        log_ndtr(log_B, out=log_B)
+                        np.add(log_B, np.log(2 * c_B), out=log_B)
+                    else:
+                        np.add(tmp, np.log(c_B), out=log_B)
+                    np.exp(log_B, out=BER)
+                    np.multiply(log_B, 1 / np.log(10), out=log_B)
+                else:
+                    f(tmp, out=BER)
+                    np.multiply(BER, c_B, out=BER)
+                np.maximum(BER, 1e-50, out=BER)
+
+        if isinstance(P_r, np.ma.MaskedArray):
+            mask = np.ma.getmask(P_r)
+            Q_out, BER_out = np.ma.array(Q_out, mask=mask), np.ma.array(BER_out, mask=mask)
+            SNR_out = np.ma.array(SNR_out, mask=mask) if SNR else None
+            log_BER_out = np.ma.array(log_BER_out, mask=mask) if log_BER else None
+        if log_BER:
+            return SNR_out, Q_out, BER_out, log_BER_out
+        return SNR_out, Q_out, BER_out
+
+    def interleaving(self, BER, latency=None, interleaver=None):
+        # This method takes the original (uncoded) BER array and redistributes the values of all elements over X neighbouring elements
+        # Where X is equal to 'spread' (the interleaver depth in samples)
+        # The latency can be one value or one value for each row (macro step) of BER
+        # Interleaver is either 'circular' (each element is spread over the next X elements, wrapping around at the end)
+        # or 'block' (the elements of each block of X consecutive elements are spread over that block)
+        if latency is None:
+            latency = self.config.latency_interleaving
+        if interleaver is None:
+            interleaver = self.config.interleaver
+
+        spread = np.round(np.asarray(latency) / self.config.step_size_channel_level, 0).astype(int) + 1
+        if spread.ndim == 0:
+            return interleave(BER, int(spread), interleaver)
+
+        # Rows with the same interleaver depth are interleaved together
+        BER_interleaved = np.empty(np.shape(BER))
+        for depth in np.unique(spread):
+            rows = spread == depth
+            BER_interleaved[rows] = interleave(BER[rows], int(depth), interleaver)
         return BER_interleaved
 
-    def coding(self, K, N, BER):
+    def coding(self, K, N, BER=None, engine=None, log_BER=None, log=False):
         # This method simulates the coding scheme by computing the coded BER from the uncoded BER
         # REF: CCSDS Historical Document, 2006, CH.5.5, EQ.3-4
+        # Engine is 'table' (log-log interpolation table of the coded BER, built once per code) or 'binomial' (binomial sum for each element)
+        # The uncoded BER is given as BER or as log_BER (log10). With log=True, log10 of the coded BER is returned.
+        if engine is None:
+            engine = self.config.coding_engine
         self.parity_bits = int((N - K) / 2)
-        SER = 1 - (1 - BER) ** symbol_length
+        if engine == 'table':
+            if log_BER is None:
+                with np.errstate(divide='ignore'):
+                    log_BER = np.log10(BER)
+            log_BER_coded = RS_coding_interp_log(log_BER, N, K, self.config.symbol_length)
+            self.BER_coded = 10**log_BER_coded
+            return log_BER_coded if log else self.BER_coded
+        if BER is None:
+            BER = 10**log_BER
+
+        SER = 1 - (1 - BER) ** self.config.symbol_length
         SER_coded = np.zeros_like(SER)
         k_values = np.arange(self.parity_bits, N - 1)
 
@@ -234,9 +433,44 @@ class terminal_properties:
             SER_coded = SER * (binom_values * np.power.outer(SER, k_values) * np.power.outer(1 - SER, N - k_values - 1)).sum(axis=1)
 
 
-        self.BER_coded = 2 ** (symbol_length - 1) / N * SER_coded
+        self.BER_coded = 2 ** (self.config.symbol_length - 1) / N * SER_coded
+        if log:
+            with np.errstate(divide='ignore'):
+                return np.log10(self.BER_coded)
         return self.BER_coded
 
+    def coding_accuracy(self, K, N, samples=10000, micro_scale='no'):
+        # This method compares the coded BER of the interpolation table with the exact binomial sum (computed in the log domain)
+        # The BER samples are placed halfway between the table points, where the interpolation error is largest
+        log_BER, log_BER_coded = RS_coding_table(N, K, self.config.symbol_length)
+        log_BER_test = (log_BER[1:] + log_BER[:-1]) / 2
+        log_BER_test = log_BER_test[np.linspace(0, len(log_BER_test) - 1, samples).astype(int)]
+        BER_test = 10**log_BER_test
+
+        BER_coded_table = RS_coding_interp(BER_test, N, K, self.config.symbol_length)
+        BER_coded_exact = np.exp(RS_coded_BER_log(BER_test, N, K, self.config.symbol_length))
+        valid = BER_coded_exact > 0.0
+        error = np.abs(BER_coded_table[valid] - BER_coded_exact[valid]) / BER_coded_exact[valid]
+        error_max = error.max()
+        BER_error_max = BER_test[valid][np.argmax(error)]
+
+        # Scalar input (below the table and BER=0) must give the same coded BER as array input
+        BER_scalar = [10**log_BER[0] * 1.0E-10, 0.0]
+        scalar_check = all(RS_coding_interp(BER, N, K, self.config.symbol_length) ==
+                           RS_coding_interp(np.array([BER]), N, K, self.config.symbol_length)[0] for BER in BER_scalar)
+        scalar_check = scalar_check and RS_coding_interp(0.0, N, K, self.config.symbol_length) == 0.0
+
+        if micro_scale == 'yes':
+            print('CODING TABLE ACCURACY')
+            print('------------------------------------------------')
+            print('Code (N, K), symbol length  : ('+str(N)+', '+str(K)+'), '+str(self.config.symbol_length))
+            print('Table points                : ' + str(len(log_BER)) + ', BER from ' + str(10**log_BER[0]) + ' to ' + str(np.round(10**log_BER[-1], 3)))
+            print('Max. relative error         : ' + str(error_max) + ' at BER=' + str(BER_error_max))
+            print('Mean relative error         : ' + str(error.mean()))
+            print('Scalar and BER=0 input      : ' + ('ok' if scalar_check else 'mismatch with array input'))
+            print('------------------------------------------------')
+        return error_max, error.mean()
+
     # ------------------------------------------------------------------------
     # --------------------------------POINTING--------------------------------
     # ------------------------------------------------------------------------
@@ -249,39 +483,39 @@ class terminal_properties:
 
         if effect == 'TX jitter':
 
-            if dist_pointing == "rayleigh":
+            if self.config.dist_pointing == "rayleigh":
                 # REF: Power vector generation tool for free-space optical links - PVGeT, Giggenbach, fig.3
-                self.std_pj_t_rayleigh  = np.sqrt(2 / (4 - np.pi) * std_pj_t ** 2)
+                self.std_pj_t_rayleigh  = np.sqrt(2 / (4 - np.pi) * self.config.std_pj_t ** 2)
                 self.mean_pj_t_rayleigh = np.sqrt(np.pi / 2) * self.std_pj_t_rayleigh
-                self.angle_pe_t_R = dist.rayleigh_rvs(data=data, sigma=self.std_pj_t_rayleigh)
+                self.angle_pe_t_R = self.dist.rayleigh_rvs(data=data, sigma=self.std_pj_t_rayleigh)
                 return self.angle_pe_t_R, self.std_pj_t_rayleigh, self.mean_pj_t_rayleigh
 
-            elif dist_pointing == "rice":
-                self.std_pj_t_rice = np.sqrt(2 / (4 - np.pi) * std_pj_t ** 2)
-                self.mean_pj_t_rice = np.sqrt( angle_pe_t**2 + angle_pe_t **2)
+            elif self.config.dist_pointing == "rice":
+                self.std_pj_t_rice = np.sqrt(2 / (4 - np.pi) * self.config.std_pj_t ** 2)
+                self.mean_pj_t_rice = np.sqrt( self.config.angle_pe_t**2 + self.config.angle_pe_t **2)
 
                 # REF: OPTIMUM DIVERGENCE ANGLE OF A GAUSSIAN BEAM WAVE ..., M.TOYOSHIMA, 2002, EQ.4 & 6
-                self.x_pe_t, self.pdf_pe_t = dist.rice_pdf(sigma=self.std_pj_t_rice, mean=self.mean_pj_t_rice, steps=steps)
-                self.angle_pe_t_X = dist.norm_rvs(data=data[0], sigma=std_pj_t, mean=angle_pe_t)
-                self.angle_pe_t_Y = dist.norm_rvs(data=data[1], sigma=std_pj_t, mean=angle_pe_t)
+                self.x_pe_t, self.pdf_pe_t = self.dist.rice_pdf(sigma=self.std_pj_t_rice, mean=self.mean_pj_t_rice, steps=steps)
+                self.angle_pe_t_X = self.dist.norm_rvs(data=data[0], sigma=self.config.std_pj_t, mean=self.config.angle_pe_t)
+                self.angle_pe_t_Y = self.dist.norm_rvs(data=data[1], sigma=self.config.std_pj_t, mean=self.config.angle_pe_t)
                 self.angle_pe_t_R = np.sqrt(self.angle_pe_t_X ** 2 + self.angle_pe_t_Y ** 2)
                 return self.angle_pe_t_R, self.std_pj_t_rice, self.mean_pj_t_rice
 
         elif effect == 'RX jitter':
 
-            if dist_pointing == "rayleigh":
+            if self.config.dist_pointing == "rayleigh":
                 # REF: Power vector generation tool for free-space optical links - PVGeT, Giggenbach, fig.3
-                self.std_pj_r_rayleigh = np.sqrt(2 / (4 - np.pi) * std_pj_r**2)
+                self.std_pj_r_rayleigh = np.sqrt(2 / (4 - np.pi) * self.config.std_pj_r**2)
                 self.mean_pj_r_rayleigh = np.sqrt(np.pi / 2) * self.std_pj_r_rayleigh
-                self.angle_pe_r_R = dist.rayleigh_rvs(data=data, sigma=self.std_pj_r_rayleigh)
+                self.angle_pe_r_R = self.dist.rayleigh_rvs(data=data, sigma=self.std_pj_r_rayleigh)
                 return self.angle_pe_t_R, self.std_pj_t_rayleigh, self.mean_pj_r_rayleigh
 
-            elif dist_pointing == "rice":
-                self.std_pj_r_rice = np.sqrt(2 / (4 - np.pi) * std_pj_r**2)
-                self.mean_pj_r_rice = np.sqrt( angle_pe_r**2 + angle_pe_r **2)
+            elif self.config.dist_pointing == "rice":
+                self.std_pj_r_rice = np.sqrt(2 / (4 - np.pi) * self.config.std_pj_r**2)
+                self.mean_pj_r_rice = np.sqrt( self.config.angle_pe_r**2 + self.config.angle_pe_r **2)
                 # REF: OPTIMUM DIVERGENCE ANGLE OF A GAUSSIAN BEAM WAVE ..., M.TOYOSHIMA, 2002, EQ.4 & 6
-                self.x_pe_r, self.pdf_pe_r = dist.rice_pdf(sigma=self.std_pj_r_rice, mean=self.mean_pj_r_rice, steps=steps)
-                self.angle_pe_r_X = dist.norm_rvs(data=data[0], sigma=std_pj_r, mean=angle_pe_r)
-                self.angle_pe_r_Y = dist.norm_rvs(data=data[1], sigma=std_pj_r, mean=angle_pe_r)
+                self.x_pe_r, self.pdf_pe_r = self.dist.rice_pdf(sigma=self.std_pj_r_rice, mean=self.mean_pj_r_rice, steps=steps)
+                self.angle_pe_r_X = self.dist.norm_rvs(data=data[0], sigma=self.config.std_pj_r, mean=self.config.angle_pe_r)
+                self.angle_pe_r_Y = self.dist.norm_rvs(data=data[1], sigma=self.config.std_pj_r, mean=self.config.angle_pe_r)
                 self.angle_pe_r_R = np.sqrt(self.angle_pe_r_X ** 2 + self.angle_pe_r_Y ** 2)
                 return self.angle_pe_r_R, self.std_pj_r_rice, self.mean_pj_r_rice
\ No newline at end of file
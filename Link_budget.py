@@ -18,15 +18,17 @@ class link_budget:
                  h_WFE: float,
                  w_ST: np.array,
                  h_beamspread: np.array,
-                 h_ext: float):
+                 h_ext: float,
+                 config: MissionConfig = config):
 
+        self.config = config
         # Range
         # ----------------------------------------------------------------------------
         self.ranges = np.array(ranges)
 
         # Laser profile (Gaussian Beam)
         # ----------------------------------------------------------------------------
-        self.P_t = P_t
+        self.P_t = self.config.P_t
         self.I_t_0 = 2 * self.P_t / (np.pi * w0**2)
         self.w_r = np.array(w_ST)
 
@@ -34,30 +36,30 @@ class link_budget:
         #----------------------------------------------------------------------------
         # REF: AE4880 LASER SATELLITE COMMUNICATIONS I, R.SAATHOF, 2021, SLIDE 34
         self.G_t = 8 / angle_div**2
-        self.G_r = (np.pi*D_r / wavelength)**2
+        self.G_r = (np.pi*self.config.D_r / self.config.wavelength)**2
  
         # Losses
         # ----------------------------------------------------------------------------
         self.h_ext = h_ext
         self.h_WFE = np.array(h_WFE)
         self.h_beamspread = np.array(h_beamspread)
-        self.T_clipping = np.exp(-2 * clipping_ratio ** 2 * obscuration_ratio ** 2) - np.exp(-2 * clipping_ratio_ac ** 2)
-        self.T_defocus = 1 / M2_defocus**2
-        self.T_transmission_TX = eff_transmission_t
-        self.T_transmission_RX = eff_transmission_r
+        self.T_clipping = np.exp(-2 * self.config.clipping_ratio ** 2 * self.config.obscuration_ratio ** 2) - np.exp(-2 * self.config.clipping_ratio ** 2)
+        self.T_defocus = 1 / self.config.M2_defocus**2
+        self.T_transmission_TX = self.config.eff_transmission_t
+        self.T_transmission_RX = self.config.eff_transmission_r
 
-        self.T_WFE_static_t = np.exp(-(2 * np.pi * WFE_static_t/wavelength)**2)
-        self.T_WFE_static_r = np.exp(-(2 * np.pi * WFE_static_r/wavelength)**2)
+        self.T_WFE_static_t = np.exp(-(2 * np.pi * self.config.WFE_static_t/self.config.wavelength)**2)
+        self.T_WFE_static_r = np.exp(-(2 * np.pi * self.config.WFE_static_r/self.config.wavelength)**2)
         self.G_t_comm = self.G_t * self.T_clipping * self.T_defocus
         # REF: AE4880 LASER SATELLITE COMMUNICATIONS I, R.SAATHOF, 2021, SLIDE 34
-        self.h_fs = (wavelength / (4 * np.pi * self.ranges)) ** 2
-        self.h_l = self.G_t_comm * self.G_r * eff_transmission_t * eff_transmission_r * h_splitting * self.T_WFE_static_t * self.T_WFE_static_r *\
+        self.h_fs = (self.config.wavelength / (4 * np.pi * self.ranges)) ** 2
+        self.h_l = self.G_t_comm * self.G_r * self.config.eff_transmission_t * self.config.eff_transmission_r * self.config.h_splitting * self.T_WFE_static_t * self.T_WFE_static_r *\
                    self.h_ext * self.h_fs
         # The diffraction limited divergence angle is increased due to the clipping effect and the defocusing of the beam
         self.angle_div_diff = angle_div
-        self.angle_div = angle_div / np.sqrt(self.T_clipping) * M2_defocus
-        self.T_pointing_static_TX = h_p_gaussian(angle_pe_t, self.angle_div)
-        self.T_pointing_static_RX = h_p_airy(angle=angle_pe_r, D_r=D_r, focal_length=focal_length)
+        self.angle_div = angle_div / np.sqrt(self.T_clipping) * self.config.M2_defocus
+        self.T_pointing_static_TX = h_p_gaussian(self.config.angle_pe_t, self.angle_div)
+        self.T_pointing_static_RX = h_p_airy(angle=self.config.angle_pe_r, D_r=self.config.D_r, focal_length=self.config.focal_length, config=self.config)
 
         # Acquisition-specific losses
         # ----------------------------------------------------------------------------
@@ -65,13 +67,13 @@ class link_budget:
         self.angle_pe_r_acq = 0.0
         self.std_pj_t_acq   = 0.0
         self.std_pj_r_acq   = 0.0
-        self.T_defocus_acq = 1 / M2_defocus_acq ** 2
+        self.T_defocus_acq = 1 / self.config.M2_defocus_acq ** 2
         self.G_t_acq = self.G_t * self.T_clipping * self.T_defocus_acq
-        self.h_l_acq = self.G_t_acq * self.G_r * eff_transmission_t * eff_transmission_r * h_splitting * self.T_WFE_static_t * self.T_WFE_static_r * \
+        self.h_l_acq = self.G_t_acq * self.G_r * self.config.eff_transmission_t * self.config.eff_transmission_r * self.config.h_splitting * self.T_WFE_static_t * self.T_WFE_static_r * \
                        self.h_ext * self.h_fs
-        self.angle_div_acq = angle_div / np.sqrt(self.T_clipping) * M2_defocus_acq
+        self.angle_div_acq = angle_div / np.sqrt(self.T_clipping) * self.config.M2_defocus_acq
         self.T_pointing_static_TX_acq = h_p_gaussian(angles=self.angle_pe_t_acq, angle_div=self.angle_div)
-        self.T_pointing_static_RX_acq = h_p_airy(angle=self.angle_pe_r_acq, D_r=D_r, focal_length=focal_length)
+        self.T_pointing_static_RX_acq = h_p_airy(angle=self.angle_pe_r_acq, D_r=self.config.D_r, focal_length=self.config.focal_length, config=self.config)
         self.w_r_acq = beam_spread(self.angle_div_acq, self.ranges)
 
 
@@ -110,8 +112,8 @@ class link_budget:
         self.BER = BER
 
     def tracking(self):
-        self.P_r_tracking     = (1 - h_splitting) * self.P_r / h_splitting
-        self.P_r_tracking_acq = (1 - h_splitting) * self.P_r_0_acq / h_splitting
+        self.P_r_tracking     = (1 - self.config.h_splitting) * self.P_r / self.config.h_splitting
+        self.P_r_tracking_acq = (1 - self.config.h_splitting) * self.P_r_0_acq / self.config.h_splitting
 
     def coding(self, G_coding, BER_coded):
         self.G_coding = G_coding
@@ -129,14 +131,14 @@ class link_budget:
 
     # This function computes the link margin
     def link_margin(self):
-        self.LM_acquisition = self.P_r_0_acq / sensitivity_acquisition
+        self.LM_acquisition = self.P_r_0_acq / self.config.sensitivity_acquisition
 
         self.LM_comm_BER9 = self.P_r / self.P_r_thres_BER9
         self.LM_comm_BER6 = self.P_r / self.P_r_thres_BER6
         self.LM_comm_BER3 = self.P_r / self.P_r_thres_BER3
 
-        self.LM_tracking    = self.P_r_tracking / sensitivity_acquisition
-        self.LM_tracking_acq = self.P_r_tracking_acq / sensitivity_acquisition
+        self.LM_tracking    = self.P_r_tracking / self.config.sensitivity_acquisition
+        self.LM_tracking_acq = self.P_r_tracking_acq / self.config.sensitivity_acquisition
 
         return self.LM_comm_BER9, self.LM_comm_BER6, self.LM_comm_BER3
 
@@ -150,8 +152,8 @@ class link_budget:
 
             # Plot gaussian beam
             P_r = P_r.mean(axis=1)
-            r_t = np.linspace(-w0 * 5, w0 * 5, 1000)
-            I_t = self.I_t_0 * np.exp(-2*r_t**2 / w0**2)
+            r_t = np.linspace(-self.config.w0 * 5, self.config.w0 * 5, 1000)
+            I_t = self.I_t_0 * np.exp(-2*r_t**2 / self.config.w0**2)
             I_r_0 = 2 * P_r / (np.pi * self.w_r ** 2)
             r_TX = displacements.mean(axis=1)
 
@@ -161,14 +163,14 @@ class link_budget:
             ax2.set_title('Gaussian beam RX')
             ax1.set_xlabel('Radial pos from $I_0$ (m)', fontsize=12)
             ax2.set_xlabel('Radial pos from $I_0$ (m)', fontsize=12)
-            ax1.plot(np.ones(2) * -D_t, np.array((0, self.I_t_0)), color='black', label='$D_{TX}$')
-            ax1.plot(np.ones(2) *  D_t, np.array((0, self.I_t_0)), color='black', )
-            ax1.plot(np.ones(2) * -w0, np.array((0, self.I_t_0)), color='green', label='$w0$ (1/$e^2$)')
-            ax1.plot(np.ones(2) * w0, np.array((0, self.I_t_0)), color='green', )
-            ax1.plot(r_t, I_t, linestyle='-', label="Pt: " + str(np.round(W2dBm(P_t),1)) + "dBm")
+            ax1.plot(np.ones(2) * -self.config.D_t, np.array((0, self.I_t_0)), color='black', label='$D_{TX}$')
+            ax1.plot(np.ones(2) *  self.config.D_t, np.array((0, self.I_t_0)), color='black', )
+            ax1.plot(np.ones(2) * -self.config.w0, np.array((0, self.I_t_0)), color='green', label='$w0$ (1/$e^2$)')
+            ax1.plot(np.ones(2) * self.config.w0, np.array((0, self.I_t_0)), color='green', )
+            ax1.plot(r_t, I_t, linestyle='-', label="Pt: " + str(np.round(W2dBm(self.config.P_t),1)) + "dBm")
 
-            ax2.plot(np.ones(2) * -D_r, np.array((0, 1)), color='black', label='$D_{RX}}$')
-            ax2.plot(np.ones(2) * D_r, np.array((0, 1)), color='black', )
+            ax2.plot(np.ones(2) * -self.config.D_r, np.array((0, 1)), color='black', label='$D_{RX}}$')
+            ax2.plot(np.ones(2) * self.config.D_r, np.array((0, 1)), color='black', )
 
             for i in indices:
                 r_r = np.linspace(-self.w_r[-1] * 4, self.w_r[-1] * 4, 1000)
@@ -178,9 +180,9 @@ class link_budget:
 
             # Plot airy disk
             angle = np.linspace(1.0E-6, 100.0E-6, 1000)
-            P_norm_airy = h_p_airy(angle, D_r, focal_length)
+            P_norm_airy = h_p_airy(angle, self.config.D_r, self.config.focal_length, self.config)
 
-            ax3.set_title('Airy disk, focal length=' + str(focal_length) + 'm, Dr=' + str(np.round(D_r, 3)) + 'm')
+            ax3.set_title('Airy disk, focal length=' + str(self.config.focal_length) + 'm, Dr=' + str(np.round(self.config.D_r, 3)) + 'm')
             ax3.plot(angle * 1.0E6, P_norm_airy)
             ax3.set_xlabel('Radial pos from $I_0$ ($\mu$rad)', fontsize=12)
             ax3.set_ylabel('Normalized power ($P(r)$/$P_0$)', fontsize=12)
@@ -214,7 +216,7 @@ class link_budget:
                           'Attenuation loss', 'Beam spread loss (ST)', 'WFE loss (Strehl ratio)', ' ',
 
                           'ATMOSPHERIC (DYNAMIC)',
-                          'TX loss (mech. jitter and BW)', 'RX loss (mech. jitter and AoA)', 'Scintillation loss', 'Penalty for '+str(desired_frac_fade_time)+' frac. fade time', ' ',
+                          'TX loss (mech. jitter and BW)', 'RX loss (mech. jitter and AoA)', 'Scintillation loss', 'Penalty for '+str(self.config.desired_frac_fade_time)+' frac. fade time', ' ',
 
                           'RECEIVER',
                           'Coding gain', 'Static power RX', 'Dynamic power RX', 'Tracking signal RX', 'Beam radius at RX', ' ',
@@ -251,11 +253,11 @@ class link_budget:
 
             for index in indices:
                 values_comm = [' ',
-                          W2dBm(P_t),
+                          W2dBm(self.config.P_t),
                           '', ' ',
-                          wavelength*1.0E9, data_rate*1.0E-9, self.angle_div_diff*1.E6, self.angle_div*1.E6, angle_pe_t*1.0E6, std_pj_t*1.0E6, W2dB(self.G_t), W2dB(self.T_transmission_TX), W2dB(self.T_WFE_static_t), W2dB(self.T_pointing_static_TX),
+                          self.config.wavelength*1.0E9, self.config.data_rate*1.0E-9, self.angle_div_diff*1.E6, self.angle_div*1.E6, self.config.angle_pe_t*1.0E6, self.config.std_pj_t*1.0E6, W2dB(self.G_t), W2dB(self.T_transmission_TX), W2dB(self.T_WFE_static_t), W2dB(self.T_pointing_static_TX),
                           ' ', ' ',
-                          D_r*1.0E3, angle_pe_r*1.0E6, std_pj_r*1.0E6, W2dB(self.G_r), W2dB(self.T_transmission_RX), W2dB(self.T_WFE_static_r), W2dB(h_splitting), W2dB(self.T_pointing_static_RX),
+                          self.config.D_r*1.0E3, self.config.angle_pe_r*1.0E6, self.config.std_pj_r*1.0E6, W2dB(self.G_r), W2dB(self.T_transmission_RX), W2dB(self.T_WFE_static_r), W2dB(self.config.h_splitting), W2dB(self.T_pointing_static_RX),
                           ' ', ' ',
                           self.ranges[index]*1.0E-3, np.rad2deg(elevation[index]), W2dB(self.h_fs[index]),
                           ' ', ' ',
@@ -265,17 +267,17 @@ class link_budget:
                           ' ', ' ',
                           W2dB(self.G_coding[index]), W2dBm(self.P_r_0[index]), W2dBm(self.P_r[index]),  W2dBm(self.P_r_tracking[index]),  self.w_r[index],
                           ' ', ' ',
-                          BER_thres[1], self.PPB_thres_BER6, W2dBm(self.P_r_thres_BER6), W2dBm(sensitivity_acquisition),
+                          self.config.BER_thres[1], self.PPB_thres_BER6, W2dBm(self.P_r_thres_BER6), W2dBm(self.config.sensitivity_acquisition),
                           W2dB(self.LM_comm_BER6[index]), W2dB(self.LM_tracking[index])
                           ]
                 values_acq = [' ',
-                               W2dBm(P_t),
+                               W2dBm(self.config.P_t),
                                '', ' ',
-                               wavelength * 1.0E9, 0.0, self.angle_div_diff * 1.E6, self.angle_div_acq * 1.E6,
+                               self.config.wavelength * 1.0E9, 0.0, self.angle_div_diff * 1.E6, self.angle_div_acq * 1.E6,
                                self.angle_pe_t_acq*1.0E6, self.std_pj_t_acq*1.0E6, W2dB(self.G_t_acq), W2dB(self.T_transmission_TX),
                                W2dB(self.T_WFE_static_t), W2dB(self.T_pointing_static_TX_acq),
                                ' ', ' ',
-                               D_r * 1.0E3, self.angle_pe_r_acq * 1.0E6, self.std_pj_r_acq * 1.0E6, W2dB(self.G_r),
+                               self.config.D_r * 1.0E3, self.angle_pe_r_acq * 1.0E6, self.std_pj_r_acq * 1.0E6, W2dB(self.G_r),
                                W2dB(self.T_transmission_RX), W2dB(self.T_WFE_static_r), W2dB(self.T_clipping),
                                W2dB(self.T_pointing_static_RX_acq),
                                ' ', ' ',
@@ -287,7 +289,7 @@ class link_budget:
                                ' ', ' ',
                                0.0, W2dBm(self.P_r_0_acq[index]), W2dBm(self.P_r_acq[index]), W2dBm(self.P_r_tracking_acq[index]), self.w_r_acq[index],
                                ' ', ' ',
-                               ' ', ' ', ' ', W2dBm(sensitivity_acquisition),
+                               ' ', ' ', ' ', W2dBm(self.config.sensitivity_acquisition),
                                ' ', W2dB(self.LM_tracking_acq[index])
                                ]
 
@@ -302,10 +304,10 @@ class link_budget:
 
                 df = pd.DataFrame(data, columns=columns)
                 filename = r'C:\Users\wiege\Documents\TUDelft_Spaceflight\Thesis\Link_budgets\link_budget_'+\
-                           str(link)+'_'+\
+                           str(self.config.link)+'_'+\
                            str(np.round(np.rad2deg(elevation[index]),2))+'_'+\
-                           str(ac_LCT)+'_'+\
-                           str(aircraft_filename_load[84:-4])+'.csv'
+                           str(self.config.ac_LCT)+'_'+\
+                           str(self.config.aircraft_filename_load[84:-4])+'.csv'
                 print(filename)
                 df.to_csv(filename)
 
@@ -319,29 +321,29 @@ class link_budget:
                 print('LINK BUDGET MODEL (communication phase)')
                 print('________________________')
                 print('TX POWER')
-                print('Power transmitter                      (dBm): ', W2dBm(P_t))
+                print('Power transmitter                      (dBm): ', W2dBm(self.config.P_t))
                 print('________________________')
                 print('TX antenna')
-                print('Wavelength                            (rad) : ', wavelength)
-                print('Data rate                          (Gbit/s) : ', data_rate / 1e9)
-                print('TX telescope diameter                   (m) : ', D_t)
+                print('Wavelength                            (rad) : ', self.config.wavelength)
+                print('Data rate                          (Gbit/s) : ', self.config.data_rate / 1e9)
+                print('TX telescope diameter                   (m) : ', self.config.D_t)
                 print('Divergence angle                      (rad) : ', self.angle_div_diff)
                 print('Divergence angle (inc. clipping & M2) (rad) : ', self.angle_div)
-                print('Pointing error TX (std)               (rad) : ', angle_pe_t)
-                print('Jitter std TX (std)                   (rad) : ', std_pj_t)
+                print('Pointing error TX (std)               (rad) : ', self.config.angle_pe_t)
+                print('Jitter std TX (std)                   (rad) : ', self.config.std_pj_t)
                 print('Transmitter gain                       (dB) : ', W2dB(self.G_t))
-                print('TX transmission  loss                  (dB) : ', W2dB(eff_transmission_t))
+                print('TX transmission  loss                  (dB) : ', W2dB(self.config.eff_transmission_t))
                 print('TX static WFE loss                     (dB) : ', W2dB(self.T_WFE_static_t))
                 print('TX static pointing error loss          (dB) : ', W2dB(self.T_pointing_static_TX))
                 print('________________________')
                 print('RX antenna')
-                print('RX telescope diameter                   (m) : ', D_r)
-                print('Static pointing error RX std          (rad) : ', angle_pe_r)
-                print('Dynamic pointing error RX std         (rad) : ', std_pj_r)
+                print('RX telescope diameter                   (m) : ', self.config.D_r)
+                print('Static pointing error RX std          (rad) : ', self.config.angle_pe_r)
+                print('Dynamic pointing error RX std         (rad) : ', self.config.std_pj_r)
                 print('Receiver gain                          (dB) : ', W2dB(self.G_r))
-                print('RX transmission  loss                  (dB) : ', W2dB(eff_transmission_r))
+                print('RX transmission  loss                  (dB) : ', W2dB(self.config.eff_transmission_r))
                 print('RX static WFE loss                     (dB) : ', W2dB(self.T_WFE_static_r))
-                print('RX splitting loss                      (dB) : ', W2dB(h_splitting))
+                print('RX splitting loss                      (dB) : ', W2dB(self.config.h_splitting))
                 print('RX static pointing error loss          (dB) : ', W2dB(self.T_pointing_static_RX))
                 print('________________________')
                 print('FREE SPACE')
@@ -363,28 +365,28 @@ class link_budget:
                 print('LINK BUDGET MODEL (communication phase)')
                 print('________________________')
                 print('TX POWER')
-                print('Power transmitter                      (dBm): ', W2dBm(P_t))
+                print('Power transmitter                      (dBm): ', W2dBm(self.config.P_t))
                 print('________________________')
                 print('TX antenna')
-                print('Wavelength                            (rad) : ', wavelength)
-                print('Data rate                          (Gbit/s) : ', data_rate / 1e9)
-                print('Divergence angle                      (rad) : ', angle_div)
+                print('Wavelength                            (rad) : ', self.config.wavelength)
+                print('Data rate                          (Gbit/s) : ', self.config.data_rate / 1e9)
+                print('Divergence angle                      (rad) : ', self.config.angle_div)
                 print('Divergence angle (inc. clipping & M2) (rad) : ', self.angle_div)
-                print('Pointing error TX                     (rad) : ', angle_pe_t)
-                print('Jitter std TX                         (rad) : ', std_pj_t)
+                print('Pointing error TX                     (rad) : ', self.config.angle_pe_t)
+                print('Jitter std TX                         (rad) : ', self.config.std_pj_t)
                 print('Transmitter gain                       (dB) : ', W2dB(self.G_t))
-                print('TX transmission  loss                  (dB) : ', W2dB(eff_transmission_t))
+                print('TX transmission  loss                  (dB) : ', W2dB(self.config.eff_transmission_t))
                 print('TX static WFE loss                     (dB) : ', W2dB(self.T_WFE_static_t))
                 print('TX static pointing error loss          (dB) : ', W2dB(self.T_pointing_static_TX))
                 print('________________________')
                 print('RX antenna')
-                print('RX telescope diameter                   (m) : ', D_r)
-                print('Static pointing error RX std          (rad) : ', angle_pe_r)
-                print('Dynamic pointing error RX std         (rad) : ', std_pj_r)
+                print('RX telescope diameter                   (m) : ', self.config.D_r)
+                print('Static pointing error RX std          (rad) : ', self.config.angle_pe_r)
+                print('Dynamic pointing error RX std         (rad) : ', self.config.std_pj_r)
                 print('Receiver gain                          (dB) : ', W2dB(self.G_r))
-                print('RX transmission  loss                  (dB) : ', W2dB(eff_transmission_r))
+                print('RX transmission  loss                  (dB) : ', W2dB(self.config.eff_transmission_r))
                 print('RX static WFE loss                     (dB) : ', W2dB(self.T_WFE_static_r))
-                print('RX splitting loss                      (dB) : ', W2dB(h_splitting))
+                print('RX splitting loss                      (dB) : ', W2dB(self.config.h_splitting))
                 print('RX static pointing error loss          (dB) : ', W2dB(self.T_pointing_static_RX))
                 print('________________________')
                 print('FREE SPACE')
@@ -401,7 +403,7 @@ class link_budget:
                 print('TX pointing loss (mech. jit and BW)    (dB) : ', W2dB(self.T_TX[index]))
                 print('RX pointing loss (mech. jit and AoA)   (dB) : ', W2dB(self.T_RX[index]))
                 print('Scintillation loss                     (dB) : ', W2dB(self.T_scint[index]))
-                print('Penalty for ' +str(desired_frac_fade_time)+' frac. fade time        (dB) : ', W2dB(self.h_penalty[index]))
+                print('Penalty for ' +str(self.config.desired_frac_fade_time)+' frac. fade time        (dB) : ', W2dB(self.h_penalty[index]))
                 print('________________________')
                 print('RECEIVER')
                 print('Coding gain                            (dB) : ', W2dB(self.G_coding[index]))
@@ -412,10 +414,10 @@ class link_budget:
                 print('Beam radius at RX                      (m)  : ', self.w_r[index])
                 print('________________________')
                 print('LINK MARGIN')
-                print('Threshold comms  (1.0E-6)              (BER): ', BER_thres[1])
+                print('Threshold comms  (1.0E-6)              (BER): ', self.config.BER_thres[1])
                 print('Threshold comms  (1.0E-6)              (PPB): ', self.PPB_thres_BER6)
                 print('Threshold comms  (1.0E-6)              (dB) : ', W2dBm(self.P_r_thres_BER6))
-                print('Threshold acquisition                  (dBm): ', W2dBm(sensitivity_acquisition))
+                print('Threshold acquisition                  (dBm): ', W2dBm(self.config.sensitivity_acquisition))
                 print( '')
                 print('Link margin comms (1.0E-6)             (dB) : ', W2dB(self.LM_comm_BER6[index]))
                 print('Link margin tracking                   (dB) : ', W2dB(self.LM_tracking[index]))
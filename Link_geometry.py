@@ -9,8 +9,70 @@ from matplotlib import pyplot as plt
 from tudatpy.kernel import constants as cons_tudat
 
 
+def project(v, d):
+    # Projection of each vector of v (time x 3) on the vector of d at the same time step
+    return (np.einsum('ij,ij->i', v, d) / np.einsum('ij,ij->i', d, d))[:, None] * d
+
+
+def dilate(mask, steps):
+    # Extends each True sample of a (satellite x time) mask with 'steps' samples on both sides (along time)
+    if steps <= 0:
+        return mask
+    counts = np.cumsum(np.pad(mask, ((0, 0), (steps + 1, steps))), axis=1, dtype=np.int64)
+    return (counts[:, 2 * steps + 1:] - counts[:, :-2 * steps - 1]) > 0
+
+
+def intervals(mask):
+    # Start and stop indices [start, stop) of the True intervals of each row of a (satellite x time) mask
+    edges = np.diff(np.pad(mask.astype(np.int8), ((0, 0), (1, 1))), axis=1)
+    return [np.column_stack((np.nonzero(row == 1)[0], np.nonzero(row == -1)[0])) for row in edges]
+
+
+def unwrap(azimuth):
+    # np.unwrap along time, skipping the NaN samples outside the visibility intervals
+    valid = ~np.isnan(azimuth)
+    if valid.all():
+        return np.unwrap(azimuth, axis=1)
+    last = np.maximum.accumulate(np.where(valid, np.arange(azimuth.shape[1]), 0), axis=1)
+    filled = np.nan_to_num(np.take_along_axis(azimuth, last, axis=1))
+    return np.where(valid, np.unwrap(filled, axis=1), np.nan)
+
+
+class geometry_dataset(dict):
+    # Container of the batched geometrical output (xarray-like)
+    # Each satellite variable is one array with dimensions (satellite, time) or (satellite, time, xyz), such that
+    # output['elevation'][i] is the time series of satellite i (as with the per-satellite dicts of the loop engine)
+    def __init__(self, satellites, time):
+        super().__init__()
+        self.satellites = list(satellites)
+        self.time = time
+        self.dims = {}
+        # Pass intervals of each satellite (with the visibility filter), see link_geometry.visibility
+        self.intervals = None
+
+    def assign(self, name, data, dims):
+        self[name] = data
+        self.dims[name] = dims
+
+    def sel(self, satellite):
+        # All satellite variables of one satellite (by index)
+        return {name: self[name][satellite] for name, dims in self.dims.items() if dims[0] == 'satellite'}
+
+    def print(self):
+        print('GEOMETRY DATASET')
+        print('------------------------------------------------')
+        print('Satellites x time steps  : ' + str(len(self.satellites)) + ' x ' + str(len(self.time)))
+        for name, dims in self.dims.items():
+            print(name.ljust(25) + ': ' + str(dims) + ', ' + str(self[name].shape))
+        if self.intervals is not None:
+            visible = self['visible']
+            print('Visible samples          : ' + str(np.round(visible.sum() / visible.size * 100, 2)) + ' %')
+            print('Pass intervals           : ' + str(sum(len(x) for x in self.intervals)))
+
+
 class link_geometry:
-    # def __init__(self):
+    def __init__(self, config=config):
+        self.config = config
 
     # ------------------------------------------------------------------------
     # -----------------------------FUNCTIONS----------------------------------
@@ -30,31 +92,32 @@ class link_geometry:
         # ------------------------------------------------------------------------
 
         # Initiate aircraft class
-        self.AC = AC.aircraft(lat_init=lat_init_AC,
-                              lon_init=lon_init_AC,
+        self.AC = AC.aircraft(lat_init=self.config.lat_init_AC,
+                              lon_init=self.config.lon_init_AC,
+                              config=self.config
 
                               )
-        self.pos_AC, self.heights_AC, self.lat_AC, self.lon_AC, self.speed_AC, self.time = self.AC.propagate(simulation_start_epoch=start_time,
-                                                                                                             simulation_end_epoch=end_time,
+        self.pos_AC, self.heights_AC, self.lat_AC, self.lon_AC, self.speed_AC, self.time = self.AC.propagate(simulation_start_epoch=self.config.start_time,
+                                                                                                             simulation_end_epoch=self.config.end_time,
                                                                                                              stepsize=step_size_AC,
-                                                                                                             height=h_AC,
-                                                                                                             method=method_AC,
+                                                                                                             height=self.config.h_AC,
+                                                                                                             method=self.config.method_AC,
                                                                                                              filename=aircraft_filename)
 
         # ------------------------------------------------------------------------
         # --------------------INITIATE-SPACECRAFT-CLASS-&-PROPAGATE---------------
         # ------------------------------------------------------------------------
         # Initiate spacecraft class
-        self.SC = SC.constellation()
+        self.SC = SC.constellation(config=self.config)
 
         # Propagate spacecraft and extract time
-        if constellation_data == 'LOAD':
+        if self.config.constellation_data == 'LOAD':
             self.geometric_data_sats, self.time_SC = self.SC.propagate_load(time=time)
 
         else:
             self.geometric_data_sats, self.time_SC = self.SC.propagate(AC_time=self.time,
                                                                        step_size=step_size_SC,
-                                                                       method=method_SC,
+                                                                       method=self.config.method_SC,
                                                                        step_size_analysis=step_size_analysis)
             if verification_cons == True:
                 self.SC.verification()
@@ -62,6 +125,8 @@ class link_geometry:
 
     # Loop through all satellites and create geometrical outputs
     def geometrical_outputs(self):
+        if self.config.geometry_engine == 'batched':
+            return self.batched_outputs()
 
         # variables_to_save = ['pos SC', 'heights SC', 'vel SC', 'ranges', 'slew rates', 'zenith',
         #                      'elevation', 'azimuth', 'radial']
@@ -117,11 +182,7 @@ class link_geometry:
                  2 * (heights_SC_per_sat - self.heights_AC) * R_earth -
                  ranges_per_sat ** 2) / (2 * ranges_per_sat * R_earth)
 
-            for x in range(len(a)):
-                if a[x] < -1.0:
-                    a[x] = -1.0
-                elif a[x] > 1.0:
-                    a[x] = 1.0
+            a = np.clip(a, -1.0, 1.0)
 
             zenith_per_sat = np.arccos(a)
             elevation_per_sat = np.pi / 2 - zenith_per_sat
@@ -152,9 +213,7 @@ class link_geometry:
             # Compute slew rate with the relative orthogonal velocity vector of SATELLITE w.r.t. AIRCRAFT
             delta_pos = pos_SC_per_sat - self.pos_AC
 
-            v1 = np.zeros(vel_SC_per_sat.shape)
-            for j in range(len(delta_pos)):
-                v1[j] = np.dot(vel_SC_per_sat[j], delta_pos[j]) / np.dot(delta_pos[j], delta_pos[j]) * delta_pos[j]
+            v1 = project(vel_SC_per_sat, delta_pos)
             vel_orthogonal_per_sat = vel_SC_per_sat - v1
 
             slew_rates_per_sat = np.sqrt(vel_orthogonal_per_sat[:,0]**2 +
@@ -165,7 +224,7 @@ class link_geometry:
             # -----------------------------DOPPLER-SHIFT------------------------------
             # ------------------------------------------------------------------------
 
-            delta_v_per_sat = v * (R_earth + heights_SC_per_sat) * (R_earth + self.heights_AC) * slew_rates_per_sat * np.sin(slew_rates_per_sat * self.time) / \
+            delta_v_per_sat = self.config.v * (R_earth + heights_SC_per_sat) * (R_earth + self.heights_AC) * slew_rates_per_sat * np.sin(slew_rates_per_sat * self.time) / \
                               (speed_of_light * np.sqrt((R_earth + heights_SC_per_sat) ** 2 + (R_earth + self.heights_AC) ** 2 -
                                                         2 * (R_earth + heights_SC_per_sat) * (R_earth + self.heights_AC) * np.cos(slew_rates_per_sat * self.time)))
 
@@ -214,6 +273,145 @@ class link_geometry:
 
         return self.geometrical_output
 
+    # Stack all satellites and compute the geometrical outputs in broadcast passes over blocks of satellites
+    # All variables have dimensions (satellite, time) and (satellite, time, xyz), see geometry_dataset
+    # The block size (geometry_block_size) bounds the temporary arrays, such that each pass stays in the CPU cache
+    def batched_outputs(self):
+        states_list = self.geometric_data_sats['states']
+        dep_variables_list = self.geometric_data_sats['dependent variables']
+        n_sats = len(self.geometric_data_sats['satellite name'])
+        n_time = len(self.time)
+        block_size = n_sats if self.config.geometry_block_size == 'all' else int(self.config.geometry_block_size)
+
+        self.geometrical_output = geometry_dataset(self.geometric_data_sats['satellite name'], self.time)
+        self.geometrical_output.assign('pos AC', self.pos_AC, ('time', 'xyz'))
+        self.geometrical_output.assign('lat AC', self.lat_AC, ('time',))
+        self.geometrical_output.assign('lon AC', self.lon_AC, ('time',))
+        self.geometrical_output.assign('heights AC', self.heights_AC, ('time',))
+        self.geometrical_output.assign('speeds AC', self.speed_AC, ('time',))
+        for name in ['pos SC', 'vel SC', 'vel SC orthogonal']:
+            self.geometrical_output.assign(name, np.empty((n_sats, n_time, 3)), ('satellite', 'time', 'xyz'))
+        for name in ['lon SC', 'lat SC', 'heights SC', 'ranges', 'slew rates', 'elevation rates', 'azimuth rates',
+                     'zenith', 'elevation', 'azimuth', 'radial', 'doppler shift']:
+            self.geometrical_output.assign(name, np.empty((n_sats, n_time)), ('satellite', 'time'))
+        self.geometrical_output.assign('visible', np.empty((n_sats, n_time), dtype=bool), ('satellite', 'time'))
+
+        for i in range(0, n_sats, max(block_size, 1)):
+            block = slice(i, min(i + block_size, n_sats))
+            states = np.stack([np.asarray(x, dtype=float) for x in states_list[block]])
+            dep_variables = np.stack([np.asarray(x, dtype=float) for x in dep_variables_list[block]])
+            for name, data in self.batched_block(states, dep_variables).items():
+                self.geometrical_output[name][block] = data
+
+        # Sparse visibility index: the pass intervals [start, stop) of each satellite
+        if self.config.visibility_filter == 'yes':
+            self.geometrical_output.intervals = intervals(self.geometrical_output['visible'])
+        return self.geometrical_output
+
+    def batched_block(self, states, dep_variables):
+        pos_SC = states[:, :, 1:4]
+        vel_SC = states[:, :, -3:]
+        heights_SC = dep_variables[:, :, 1]
+        lat_SC = dep_variables[:, :, 2]
+        lon_SC = dep_variables[:, :, 3]
+
+        # ------------------------------------------------------------------------
+        # -----------------------RANGES-BETWEEN-AIRCRAFT-&-SPACECRAFT-------------
+        # ------------------------------------------------------------------------
+        delta_pos = pos_SC - self.pos_AC[None]
+        ranges_2 = np.einsum('stj,stj->st', delta_pos, delta_pos)
+        ranges = np.sqrt(ranges_2)
+
+        # ------------------------------------------------------------------------
+        # ---------------------------VISIBILITY-FILTER----------------------------
+        # ------------------------------------------------------------------------
+        # The remaining geometry is only computed for the visible samples (see visibility), all other samples are NaN
+        if self.config.visibility_filter == 'yes':
+            visible = self.visibility(delta_pos, ranges)
+            t = np.nonzero(visible)[1]
+
+            def pick(values, AC=False):
+                # Visible samples of a satellite variable (satellite x time) or of an aircraft variable (time)
+                return values[t] if AC else values[visible]
+
+            def scatter(values):
+                # Returns the values of the visible samples in a (satellite, time) array, with NaN for all other samples
+                output = np.full(visible.shape + values.shape[1:], np.nan)
+                output[visible] = values
+                return output
+        else:
+            visible = np.ones(ranges.shape, dtype=bool)
+            pick = lambda values, AC=False: values
+            scatter = lambda values: values
+
+        ranges_v = pick(ranges)
+        ranges_2_v = pick(ranges_2)
+        heights_SC_v = pick(heights_SC)
+        lat_SC_v = pick(lat_SC)
+        delta_pos_v = pick(delta_pos)
+        vel_SC_v = pick(vel_SC)
+
+        # ------------------------------------------------------------------------
+        # ---------------------------GEOMETRIC-ANGLES-----------------------------
+        # ------------------------------------------------------------------------
+        delta_h = heights_SC_v - pick(self.heights_AC, AC=True)
+        a = (delta_h ** 2 + 2 * delta_h * R_earth - ranges_2_v) / (2 * ranges_v * R_earth)
+        zenith = np.arccos(np.clip(a, -1.0, 1.0))
+        elevation = np.pi / 2 - zenith
+        # The trigonometric terms of the aircraft (time only) and of each satellite are evaluated once
+        delta_lon = pick(lon_SC) - pick(self.lon_AC, AC=True)
+        cos_lat_SC = np.cos(lat_SC_v)
+        y = np.sin(delta_lon) * cos_lat_SC
+        x = pick(np.cos(self.lat_AC), AC=True) * np.sin(lat_SC_v) - pick(np.sin(self.lat_AC), AC=True) * cos_lat_SC * np.cos(delta_lon)
+        azimuth = np.arctan2(y, x)
+        radial = np.sqrt(elevation**2 + azimuth**2)
+
+        zenith, elevation, azimuth, radial = scatter(zenith), scatter(elevation), scatter(azimuth), scatter(radial)
+        # Phase unwrap azimuth along the time axis
+        azimuth = unwrap(azimuth)
+
+        # Elevation rate and azimuth rate (the first time step has dt=0)
+        dt = np.insert(np.diff(self.time), 0, 0.0)
+        elevation_rates = np.insert(np.diff(elevation, axis=1), 0, 0.0, axis=1) / dt
+        azimuth_rates = np.insert(np.diff(azimuth, axis=1), 0, 0.0, axis=1) / dt
+
+        # ------------------------------------------------------------------------
+        # --------------------------------SLEW-RATE-------------------------------
+        # ------------------------------------------------------------------------
+        v1 = (np.einsum('...j,...j->...', vel_SC_v, delta_pos_v) / ranges_2_v)[..., None] * delta_pos_v
+        vel_SC_orthogonal = vel_SC_v - v1
+        slew_rates = np.sqrt(np.einsum('...j,...j->...', vel_SC_orthogonal, vel_SC_orthogonal)) / ranges_v
+
+        # ------------------------------------------------------------------------
+        # -----------------------------DOPPLER-SHIFT------------------------------
+        # ------------------------------------------------------------------------
+        R_SC = R_earth + heights_SC_v
+        R_AC = R_earth + pick(self.heights_AC, AC=True)
+        phase = slew_rates * pick(self.time, AC=True)
+        R_SC_R_AC = R_SC * R_AC
+        delta_v = self.config.v * R_SC_R_AC * slew_rates * np.sin(phase) / \
+                  (speed_of_light * np.sqrt(R_SC ** 2 + R_AC ** 2 - 2 * R_SC_R_AC * np.cos(phase)))
+
+        return {'pos SC': pos_SC, 'vel SC': vel_SC, 'vel SC orthogonal': scatter(vel_SC_orthogonal),
+                'lon SC': lon_SC, 'lat SC': lat_SC, 'heights SC': heights_SC, 'ranges': ranges,
+                'slew rates': scatter(slew_rates), 'elevation rates': elevation_rates, 'azimuth rates': azimuth_rates,
+                'zenith': zenith, 'elevation': elevation, 'azimuth': azimuth, 'radial': radial,
+                'doppler shift': scatter(delta_v), 'visible': visible}
+
+    # Cheap visibility pass: the sine of the elevation follows from the dot product of the local vertical of the aircraft
+    # with the relative vector to the satellite. A satellite is visible above (elevation_min - visibility_margin).
+    # The visible samples are dilated with the acquisition steps and visibility_dilation steps on both sides, such that
+    # routing always finds the geometry of the samples around the start and the end of a link
+    def visibility(self, delta_pos, ranges):
+        up = self.pos_AC / np.linalg.norm(self.pos_AC, axis=1)[:, None]
+        sin_elevation = np.einsum('stj,tj->st', delta_pos, up) / ranges
+        visible = sin_elevation > np.sin(self.config.elevation_min - self.config.visibility_margin)
+        steps = int(self.config.acquisition_time / self.config.step_size_link) + self.config.visibility_dilation
+        visible = dilate(visible, steps)
+        # At the first time step, routing compares the elevation with that of the last time step (index - 1 = -1)
+        visible[:, -1] |= visible[:, 0]
+        return visible
+
     #-------------------------------------------------------
     #----------------------------PLOTS----------------------
     #-------------------------------------------------------
@@ -312,7 +510,7 @@ class link_geometry:
             #   (3) Slew rate
 
             time_hrs = self.time / 60
-            samples = number_sats_per_plane * number_of_planes * len(self.geometrical_output['elevation'][0])
+            samples = self.config.number_sats_per_plane * self.config.number_of_planes * len(self.geometrical_output['elevation'][0])
             samples_selected = len(flatten(routing_output['elevation']))
             fig_elev, axs = plt.subplots(3, 1, figsize=(6, 6), dpi=125)
             for i in range(len(self.geometric_data_sats['satellite name'])):
@@ -329,8 +527,8 @@ class link_geometry:
             #                  f'All links: '+str(samples)+' steps', fontsize=10)
             # axs[1].set_title(f'Selected links: ' + str(samples_selected)+' steps', fontsize=10)
 
-            axs[1].plot(time_hrs, np.ones(len(self.time)) * np.rad2deg(elevation_min),
-                          label='Minimum elevation constraint=' + str(np.round(np.rad2deg(elevation_min), 2)) + 'deg')
+            axs[1].plot(time_hrs, np.ones(len(self.time)) * np.rad2deg(self.config.elevation_min),
+                          label='Minimum elevation constraint=' + str(np.round(np.rad2deg(self.config.elevation_min), 2)) + 'deg')
             # axs[1].plot(time_hrs, np.ones(len(self.time)) * np.rad2deg(elevation_min),
             #             label='Minimum elevation constraint=' + str(np.round(np.rad2deg(elevation_min), 2)) + 'deg')
             # axs[2].plot(time_hrs, np.ones(len(self.time)) * np.rad2deg(elevation_min),
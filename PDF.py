@@ -7,16 +7,46 @@ from matplotlib import pyplot as plt
 from helper_functions import *
 from input import *
 
+# Index of each random effect in the seed of its Monte Carlo stream
+effects = ['scintillation', 'beam wander X', 'beam wander Y', 'angle of arrival X', 'angle of arrival Y',
+           'TX jitter X', 'TX jitter Y', 'RX jitter X', 'RX jitter Y', 'clouds']
+
 class distributions:
-    def __init__(self):
-        self.seed = int(abs(norm.rvs() * 10))
+    def __init__(self, config=config, seed=None):
+        self.config = config
+        # Entropy of this run. With seed=None, a new entropy is drawn from the OS
+        self.seed = np.random.SeedSequence(seed).entropy
+
+    # Random number streams
+    # Each random vector is drawn from its own generator, with one seed per (run, effect) or (run, effect, macro-scale step).
+    # Hence, each vector can be reproduced independently of all other draws (e.g. in chunks or in another process).
+    def generator(self, effect, macro_step=None):
+        spawn_key = (effects.index(effect),) if macro_step is None else (effects.index(effect), int(macro_step))
+        return np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=spawn_key))
+
+    def standard_normal(self, effect, out, macro_steps=None):
+        # Fills 'out' with standard normal values (std=1, mean=0). For a 2D array, each row has the stream of its macro-scale step
+        # The values are drawn in the precision of 'out' (float64 or float32). With noise_precision='float64', float32 values
+        # are drawn in float64 and rounded, such that they follow the same random stream as in double precision
+        def fill(generator, row):
+            if row.dtype == np.float32 and self.config.noise_precision == 'float64':
+                row[...] = generator.standard_normal(row.shape)
+            else:
+                generator.standard_normal(out=row, dtype=row.dtype)
+        if macro_steps is None:
+            fill(self.generator(effect), out)
+        else:
+            for i, macro_step in enumerate(macro_steps):
+                fill(self.generator(effect, macro_step), out[i])
+        return out
     # Normal distribution
     def norm_pdf(self, sigma, mean=0.0, steps=0.0):
-        x = np.linspace(-angle_div, angle_div, steps)
+        x = np.linspace(-self.config.angle_div, self.config.angle_div, steps)
         pdf = 1/np.sqrt(2 * np.pi * sigma**2) * np.exp(-1/2 * ((x - mean) / sigma)**2)
         return x, pdf
+    # The rvs methods return the precision of data (the parameters are converted to the same precision)
     def norm_rvs(self, data, sigma, mean):
-        return sigma * data + mean
+        return as_dtype(sigma, data) * data + as_dtype(mean, data)
 
     # Log-normal distribution
     def lognorm_pdf(self, sigma, mean, steps):
@@ -25,27 +55,27 @@ class distributions:
         return x, pdf
 
     def lognorm_rvs(self, data, sigma, mean):
-        return np.exp(mean + sigma * data)
+        return np.exp(as_dtype(mean, data) + as_dtype(sigma, data) * data)
 
     # Rayleigh distribution
     def rayleigh_pdf(self, sigma, steps):
-        x = np.linspace(0.0, angle_div, steps)
+        x = np.linspace(0.0, self.config.angle_div, steps)
         pdf = x / sigma**2 * np.exp(-x**2 / (2 * sigma**2))
         return x, pdf
 
     def rayleigh_rvs(self, data, sigma):
         # REF: Power vector generation tool for free-space optical links - PVGeT, Giggenbach, FIG.3
-        return sigma * np.sqrt(data[0]**2 + data[1]**2)
+        return as_dtype(sigma, data[0]) * np.sqrt(data[0]**2 + data[1]**2)
 
     # Rician (Rice) distribution
     def rice_pdf(self, sigma, mean, steps):
-        x = np.linspace(0.0, angle_div/1.5, steps)
+        x = np.linspace(0.0, self.config.angle_div/1.5, steps)
         pdf = x / sigma ** 2 * np.exp(-(x**2 + mean**2) / (2 * sigma**2)) * i0(x * mean / sigma ** 2)
         return x, pdf
 
     def beta_pdf(self, sigma, steps):
         x = np.linspace(0, 1, steps)
-        beta = w0 ** 2 / (4 * sigma ** 2)
+        beta = self.config.w0 ** 2 / (4 * sigma ** 2)
         pdf = beta * x ** (beta - 1)
         return x, pdf
 
@@ -134,6 +164,3 @@ class distributions:
         else:
             ax.set_xlabel('Angular displacement [urad]', fontsize=12)
         plt.show()
-
-
-dist = distributions()
\ No newline at end of file
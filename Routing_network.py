@@ -6,8 +6,98 @@ import random
 from itertools import chain
 import numpy as np
 
+# Routing policies, each gives a score for the passes of the rising satellites (the pass with the highest score is chosen)
+# 'max elevation': highest elevation in the coming lookahead_steps time steps (as routing_loop)
+# 'longest pass'  : longest total pass duration
+# 'min handovers' : longest remaining time in the pass
+# 'least slew'    : lowest maximum slew rate of the pass
+routing_policies = ['max elevation', 'longest pass', 'min handovers', 'least slew']
+# One overpass is defined to fall within 200 indices (200*5 = 1000 seconds, or 16.67 min)
+lookahead_steps = 200
+
+def pass_table(geometrical_output, time, config=config):
+    # Table of all passes (elevation above elevation_min) of all satellites, sorted by AOS
+    # Each column is an array with one value per pass, LOS is the first time step after the pass (exclusive)
+    elevation = geometrical_output['elevation']
+    slew_rates = geometrical_output['slew rates']
+    if isinstance(elevation, dict):
+        elevation = np.array([elevation[i] for i in range(len(elevation))])
+        slew_rates = np.array([slew_rates[i] for i in range(len(slew_rates))])
+    elevation = np.asarray(elevation)
+    above = elevation > config.elevation_min
+
+    edges = np.diff(np.pad(above.astype(np.int8), ((0, 0), (1, 1))), axis=1)
+    sats, AOS = np.nonzero(edges == 1)
+    LOS = np.nonzero(edges == -1)[1]
+
+    # Peak elevation and maximum slew rate of each pass, with the samples of all passes in one compressed array
+    starts = np.insert(np.cumsum(LOS - AOS), 0, 0)[:-1]
+    elevation_above = elevation[above]
+    segment = np.repeat(np.arange(len(AOS)), LOS - AOS)
+    first = np.lexsort((-elevation_above, segment))[starts] if len(AOS) > 0 else np.zeros(0, dtype=int)
+    peak_index = AOS + first - starts
+    slew_rate_max = np.fmax.reduceat(np.asarray(slew_rates)[above], starts) if len(AOS) > 0 else np.zeros(0)
+
+    order = np.argsort(AOS, kind='stable')
+    passes = {'satellite': sats[order],
+              'AOS': AOS[order],
+              'LOS': LOS[order],
+              'peak elevation': elevation_above[first][order],
+              'peak index': peak_index[order],
+              'duration': (LOS - AOS)[order] * (time[1] - time[0]),
+              'max slew rate': slew_rate_max[order]}
+
+    # Lookup of the passes of each satellite (rows of the table, sorted by AOS)
+    passes['rows'] = {sat: np.flatnonzero(passes['satellite'] == sat) for sat in np.unique(passes['satellite'])}
+    return passes
+
+def find_pass(passes, sat, index):
+    # Row of the pass of satellite 'sat' at time step 'index' (binary search), -1 if the satellite is not in a pass
+    rows = passes['rows'].get(sat)
+    if rows is None:
+        return -1
+    k = np.searchsorted(passes['AOS'][rows], index, side='right') - 1
+    if k < 0 or index >= passes['LOS'][rows[k]]:
+        return -1
+    return rows[k]
+
+def policy_score(passes, rows, index, policy, elevation_angles, sats):
+    if policy == 'max elevation':
+        return np.nanmax(elevation_angles[sats, index:index + lookahead_steps], axis=1)
+    elif policy == 'longest pass':
+        return passes['duration'][rows]
+    elif policy == 'min handovers':
+        return passes['LOS'][rows] - index
+    elif policy == 'least slew':
+        return -passes['max slew rate'][rows]
+    raise ValueError('Unknown routing policy: ' + str(policy))
+
+def compare_routing_policies(geometrical_output, time, step_size=1.0, policies=routing_policies, config=config):
+    # Routes with each policy, with one pass table for all policies (the geometry is not recomputed)
+    passes = pass_table(geometrical_output, time, config)
+    results = {}
+    for policy in policies:
+        routing = routing_network(time, config.replace(routing_policy=policy, routing_engine='events'))
+        routing.routing(geometrical_output, time, step_size, passes=passes)
+        results[policy] = {'number of links': routing.number_of_links,
+                           'average link time': routing.comm_time / routing.number_of_links,
+                           'fraction of link time': routing.frac_comm_time,
+                           'total acquisition time': routing.total_acquisition_time}
+
+    print('ROUTING POLICIES')
+    print('------------------------------------------------')
+    print('Number of passes            : ' + str(len(passes['AOS'])))
+    for policy, result in results.items():
+        print(policy.ljust(28) + ': ' + str(result['number of links']) + ' links, '
+              'average link time ' + str(np.round(result['average link time'] / 60, 3)) + ' min, '
+              'fraction of link time ' + str(np.round(result['fraction of link time'], 4)))
+    print('------------------------------------------------')
+    return results
+
+
 class routing_network():
-    def __init__(self, time):
+    def __init__(self, time, config=config):
+        self.config = config
         self.links = np.zeros(len(time))
         self.number_of_links = 0
         self.total_handover_time = 0 # seconds
@@ -19,47 +109,18 @@ class routing_network():
     # ------------------------------------------------------------------------
     
 
-    def routing(self, geometrical_output, time, step_size=1.0):
-        # This method computes the routing sequence of the links between AIRCRAFT and SATELLITES in constellation.
-        # This model uses only geometric data dictionary as INPUT with 10 KEYS (pos_SC, vel_SC, h_SC, range, slew_rate, elevation, zenith, azimuth, radial, doppler shift)
-        # Each KEY has a value with shape (NUMBER_OF_PLANES, NUMBER_SATS_PER_PLANE, LEN(TIME)) (for example: 10x10x3600 for 10 planes, 10 sats and 1 hour with 1s time steps)
-
-        # OUTPUT of the model must be same geometric data dictionary as INPUT, with KEYs of shape LEN(TIME). Meaning that there is only one vector for all KEYS.
-
-        # This option is the DEFAULT routing model. Here, link is available above a minimum elevation angle.
-        # When the current link goes beyond this minimum, the next link is searched. This will be the link with the lowest (and rising) elevation angle.
-
-        # Initial array where all orbital trajectories are stored
-        self.routing_output = {
-            'link number': [],
-            'time': [],
-            'pos AC': [],
-            'lon AC': [],
-            'lat AC': [],
-            'heights AC': [],
-            'speeds AC': [],
-            'pos SC': [],
-            'lon SC': [],
-            'lat SC': [],
-            'vel SC': [],
-            'heights SC': [],
-            'ranges': [],
-            'elevation': [],
-            'azimuth': [],
-            'zenith': [],
-            'radial': [],
-            'slew rates': [],
-            'elevation rates': [],
-            'azimuth rates': [],
-            'doppler shift': []
-        }
-
-        self.routing_total_output = {}
-
+    def routing_loop(self, geometrical_output, time, step_size=1.0):
+        # Legacy routing: at each time step, all satellites are evaluated until a rising satellite is found
+        windows = []
         index = 0
         elevation_angles = geometrical_output['elevation']
+        # With the pass intervals of the visibility filter (see Link_geometry), only the satellites in a pass are evaluated
+        pass_intervals = getattr(geometrical_output, 'intervals', None)
+        if pass_intervals is not None:
+            pass_sats = np.concatenate([np.full(len(x), i) for i, x in enumerate(pass_intervals)])
+            pass_start, pass_stop = np.concatenate(pass_intervals).T
 
-        while index < len(time) - acquisition_time:
+        while index < len(time) - self.config.acquisition_time:
             # The handover time is initiated with t=0, then the handover procedure starts
             t_handover = 0
             start_elev = []
@@ -71,7 +132,11 @@ class routing_network():
             # (1) There is no link currently active (active_link == 'no)
             # (2) The current time step has not yet exceeded the maximum simulation time (index < len(time))
             while active_link == 'no' and index < len(time):
-                for i in range(len(geometrical_output['pos SC'])):
+                if pass_intervals is not None:
+                    candidates = np.unique(pass_sats[(pass_start <= index) & (index < pass_stop)])
+                else:
+                    candidates = range(len(geometrical_output['pos SC']))
+                for i in candidates:
                     elev_last = elevation_angles[i][index - 1]
                     elev      = elevation_angles[i][index]
 
@@ -79,7 +144,7 @@ class routing_network():
                     # Find satellites for an active link, using 3 conditions:
                     # (1) The current satellite elevation is higher that the defined minimum (elev > elevation_min)
                     # (2) The current satellite elevation is increasing (elev > elev_last)
-                    if elev > elevation_min and elev > elev_last:
+                    if elev > self.config.elevation_min and elev > elev_last:
                         start_elev.append(elev)
                         sats_in_LOS.append(i)
 
@@ -92,8 +157,8 @@ class routing_network():
                     # One overpass here is defined to fall within 200 indices (200*5 = 1000 seconds, or 16.67 min)
                     elevation_max_list = []
                     for s in sats_in_LOS:
-                        if (index - len(time)) > 200:
-                            elevation_max_list.append(max(elevation_angles[s][index:index+200]))
+                        if (len(time) - index) > lookahead_steps:
+                            elevation_max_list.append(max(elevation_angles[s][index:index+lookahead_steps]))
                         else:
                             elevation_max_list.append(max(elevation_angles[s][index:]))
 
@@ -104,44 +169,132 @@ class routing_network():
 
                     # ------------------------------ACQUISITION-------------------------------
                     # Perform acquisition and add the acquisition time for computation of total latency
-                    self.total_acquisition_time, index = acquisition(index, self.total_acquisition_time, step_size)
+                    self.total_acquisition_time, index = acquisition(index, self.total_acquisition_time, step_size, self.config)
                     # ------------------------------------------------------------------------
 
                     # During an active link, loop through the indices and evaluate for each indice if the elevation angle satisfies condition:
                     # Current elevation angle is higher than minimum elevation angle (defined in input.py)
                     index_start_window = index
-                    while current_elevation > elevation_min and index < len(time):
+                    while current_elevation > self.config.elevation_min and index < len(time):
                         current_elevation = elevation_angles[current_sat][index]
                         index += 1
 
-
-                    self.links[index_start_window:index] = self.number_of_links
-                    mask = self.links > 0
-
-                    self.routing_output['link number'].append(self.number_of_links)
-                    self.routing_output['time'].append(np.array(time[index_start_window:index]))
-                    self.routing_output['pos AC'].append(geometrical_output['pos AC'][index_start_window:index])
-                    self.routing_output['lon AC'].append(geometrical_output['lon AC'][index_start_window:index])
-                    self.routing_output['lat AC'].append(geometrical_output['lat AC'][index_start_window:index])
-                    self.routing_output['heights AC'].append(geometrical_output['heights AC'][index_start_window:index])
-                    self.routing_output['speeds AC'].append(geometrical_output['speeds AC'][index_start_window:index])
-
-                    self.routing_output['pos SC'].append(geometrical_output['pos SC'][current_sat][index_start_window:index])
-                    self.routing_output['lon SC'].append(geometrical_output['lon SC'][current_sat][index_start_window:index])
-                    self.routing_output['lat SC'].append(geometrical_output['lat SC'][current_sat][index_start_window:index])
-                    self.routing_output['vel SC'].append(geometrical_output['vel SC'][current_sat][index_start_window:index])
-                    self.routing_output['heights SC'].append(geometrical_output['heights SC'][current_sat][index_start_window:index])
-                    self.routing_output['ranges'].append(geometrical_output['ranges'][current_sat][index_start_window:index])
-                    self.routing_output['elevation'].append(geometrical_output['elevation'][current_sat][index_start_window:index])
-                    self.routing_output['azimuth'].append(geometrical_output['azimuth'][current_sat][index_start_window:index])
-                    self.routing_output['zenith'].append(geometrical_output['zenith'][current_sat][index_start_window:index])
-                    self.routing_output['radial'].append(geometrical_output['radial'][current_sat][index_start_window:index])
-                    self.routing_output['slew rates'].append(geometrical_output['slew rates'][current_sat][index_start_window:index])
-                    self.routing_output['elevation rates'].append(geometrical_output['elevation rates'][current_sat][index_start_window:index])
-                    self.routing_output['azimuth rates'].append(geometrical_output['azimuth rates'][current_sat][index_start_window:index])
-                    self.routing_output['doppler shift'].append(geometrical_output['doppler shift'][current_sat][index_start_window:index])
+                    windows.append((current_sat, index_start_window, index))
 
                 index += 1
+        return windows
+
+    def routing_events(self, elevation_angles, time, step_size=1.0, passes=None):
+        # Event-driven routing: all rising events (elevation above elevation_min and increasing) are precomputed with array
+        # operations and the passes are looked up in the pass table, such that the Python loop only walks over the links
+        if isinstance(elevation_angles, dict):
+            elevation_angles = np.array([elevation_angles[i] for i in range(len(elevation_angles))])
+        elevation_angles = np.asarray(elevation_angles)
+        above = elevation_angles > self.config.elevation_min
+        # At the first time step, the elevation is compared with that of the last time step (index - 1 = -1)
+        rising = above & (elevation_angles > np.roll(elevation_angles, 1, axis=1))
+        rising_indices = np.flatnonzero(rising.any(axis=0))
+
+        windows = []
+        index = 0
+        while index < len(time) - self.config.acquisition_time:
+            event = np.searchsorted(rising_indices, index)
+            if event == len(rising_indices):
+                break
+            index = rising_indices[event]
+
+            # Choose the pass of the rising satellites with the highest score of the routing policy
+            sats_in_LOS = np.flatnonzero(rising[:, index])
+            rows = np.array([find_pass(passes, sat, index) for sat in sats_in_LOS])
+            current_sat = sats_in_LOS[np.argmax(policy_score(passes, rows, index, self.config.routing_policy,
+                                                                elevation_angles, sats_in_LOS))]
+            self.number_of_links += 1
+
+            # ------------------------------ACQUISITION-------------------------------
+            self.total_acquisition_time, index = acquisition(index, self.total_acquisition_time, step_size, self.config)
+            # ------------------------------------------------------------------------
+
+            # The link ends after the first time step at which the elevation is not above elevation_min (LOS of the pass)
+            index_start_window = index
+            if index < len(time):
+                row = find_pass(passes, current_sat, index)
+                index = min(passes['LOS'][row], len(time) - 1) + 1 if row >= 0 else index + 1
+            windows.append((current_sat, index_start_window, index))
+            index += 1
+        return windows
+
+    def routing(self, geometrical_output, time, step_size=1.0, passes=None):
+        # This method computes the routing sequence of the links between AIRCRAFT and SATELLITES in constellation.
+        # This model uses only geometric data dictionary as INPUT with 10 KEYS (pos_SC, vel_SC, h_SC, range, slew_rate, elevation, zenith, azimuth, radial, doppler shift)
+        # Each KEY has a value with shape (NUMBER_OF_PLANES, NUMBER_SATS_PER_PLANE, LEN(TIME)) (for example: 10x10x3600 for 10 planes, 10 sats and 1 hour with 1s time steps)
+
+        # OUTPUT of the model must be same geometric data dictionary as INPUT, with KEYs of shape LEN(TIME). Meaning that there is only one vector for all KEYS.
+
+        # This option is the DEFAULT routing model. Here, link is available above a minimum elevation angle.
+        # When the current link goes beyond this minimum, the next link is searched. This will be the link with the lowest (and rising) elevation angle.
+
+        # Initial array where all orbital trajectories are stored
+        self.routing_output = {
+            'link number': [],
+            'time': [],
+            'pos AC': [],
+            'lon AC': [],
+            'lat AC': [],
+            'heights AC': [],
+            'speeds AC': [],
+            'pos SC': [],
+            'lon SC': [],
+            'lat SC': [],
+            'vel SC': [],
+            'heights SC': [],
+            'ranges': [],
+            'elevation': [],
+            'azimuth': [],
+            'zenith': [],
+            'radial': [],
+            'slew rates': [],
+            'elevation rates': [],
+            'azimuth rates': [],
+            'doppler shift': []
+        }
+
+        self.routing_total_output = {}
+
+        # The link windows (satellite, first index, last index + 1) are found with the event-driven engine or the legacy loop
+        if self.config.routing_engine == 'events':
+            if passes is None:
+                passes = pass_table(geometrical_output, time, self.config)
+            self.passes = passes
+            windows = self.routing_events(geometrical_output['elevation'], time, step_size, passes)
+        else:
+            windows = self.routing_loop(geometrical_output, time, step_size)
+
+        for link_number, (current_sat, index_start_window, index) in enumerate(windows, start=1):
+            self.links[index_start_window:index] = link_number
+
+            self.routing_output['link number'].append(link_number)
+            self.routing_output['time'].append(np.array(time[index_start_window:index]))
+            self.routing_output['pos AC'].append(geometrical_output['pos AC'][index_start_window:index])
+            self.routing_output['lon AC'].append(geometrical_output['lon AC'][index_start_window:index])
+            self.routing_output['lat AC'].append(geometrical_output['lat AC'][index_start_window:index])
+            self.routing_output['heights AC'].append(geometrical_output['heights AC'][index_start_window:index])
+            self.routing_output['speeds AC'].append(geometrical_output['speeds AC'][index_start_window:index])
+
+            self.routing_output['pos SC'].append(geometrical_output['pos SC'][current_sat][index_start_window:index])
+            self.routing_output['lon SC'].append(geometrical_output['lon SC'][current_sat][index_start_window:index])
+            self.routing_output['lat SC'].append(geometrical_output['lat SC'][current_sat][index_start_window:index])
+            self.routing_output['vel SC'].append(geometrical_output['vel SC'][current_sat][index_start_window:index])
+            self.routing_output['heights SC'].append(geometrical_output['heights SC'][current_sat][index_start_window:index])
+            self.routing_output['ranges'].append(geometrical_output['ranges'][current_sat][index_start_window:index])
+            self.routing_output['elevation'].append(geometrical_output['elevation'][current_sat][index_start_window:index])
+            self.routing_output['azimuth'].append(geometrical_output['azimuth'][current_sat][index_start_window:index])
+            self.routing_output['zenith'].append(geometrical_output['zenith'][current_sat][index_start_window:index])
+            self.routing_output['radial'].append(geometrical_output['radial'][current_sat][index_start_window:index])
+            self.routing_output['slew rates'].append(geometrical_output['slew rates'][current_sat][index_start_window:index])
+            self.routing_output['elevation rates'].append(geometrical_output['elevation rates'][current_sat][index_start_window:index])
+            self.routing_output['azimuth rates'].append(geometrical_output['azimuth rates'][current_sat][index_start_window:index])
+            self.routing_output['doppler shift'].append(geometrical_output['doppler shift'][current_sat][index_start_window:index])
+        mask = self.links > 0
 
         if self.number_of_links == 0:
             print('No links available, choose another combination of aircraft and constellation, or choose another link selection')
@@ -174,7 +327,10 @@ class routing_network():
         self.frac_comm_time = self.comm_time / time[-1]
         print('ROUTING MODEL')
         print('------------------------------------------------')
-        print('Optimization of max. link time and max. elevation')
+        if self.config.routing_engine == 'events':
+            print('Routing policy              : ' + self.config.routing_policy)
+        else:
+            print('Optimization of max. link time and max. elevation')
         print('Number of links             : ' + str(self.number_of_links))
         print('Average link time           : ' + str(np.round(self.comm_time/self.number_of_links/60, 3))+' min')
         print('Total acquisition time      : ' + str(self.total_acquisition_time/60)+' min')
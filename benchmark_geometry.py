@@ -0,0 +1,107 @@
+import time
+import numpy as np
+
+# Import input parameters and helper functions
+from input import *
+from helper_functions import *
+
+# Import stages from the mission level and the velocity projection kernel
+import mission_level
+from Link_geometry import project
+
+# Micro-benchmark of the vectorised geometry kernels against the element-wise loops they replaced:
+#   (1) Cosine clip of the zenith angle argument (np.clip)
+#   (2) Projection of the satellite velocity on the relative position vector (einsum)
+#   (3) Long-term beam spread (np.select)
+# The kernels are timed on a propagated constellation of 100 satellites (10 planes, 10 satellites per plane) over 6 hours.
+# The geometry is computed with the batched geometry engine (geometry_dataset), without the visibility filter.
+
+#------------------------------------------------------------------------
+#-----------------------------LEGACY-LOOPS-------------------------------
+#------------------------------------------------------------------------
+def clip_loop(a):
+    a = a.copy()
+    for x in range(len(a)):
+        if a[x] < -1.0:
+            a[x] = -1.0
+        elif a[x] > 1.0:
+            a[x] = 1.0
+    return a
+
+def project_loop(vel, delta_pos):
+    v1 = np.zeros(vel.shape)
+    for j in range(len(delta_pos)):
+        v1[j] = np.dot(vel[j], delta_pos[j]) / np.dot(delta_pos[j], delta_pos[j]) * delta_pos[j]
+    return v1
+
+def beam_spread_loop(r0, w_r, config):
+    w_LT = np.zeros(len(r0))
+    D_0 = config.D_t
+    for i in range(len(r0)):
+        if D_0 / r0[i] < 1.0:
+            w_LT[i] = w_r[i] * (1 + (D_0 / r0[i])**(5/3))**(1/2)
+        elif D_0 / r0[i] > 1.0:
+            w_LT[i] = w_r[i] * (1 + (D_0 / r0[i])**(5/3))**(3/5)
+    return w_LT
+
+#------------------------------------------------------------------------
+#-------------------------------SCENARIO---------------------------------
+#------------------------------------------------------------------------
+def scenario_inputs(config):
+    # Inputs of the kernels for all satellite-time samples of the constellation (geometry_dataset, flattened)
+    t_macro, t_micro = mission_level.time_vectors_stage(config)
+    geometry = mission_level.geometry_stage(config, t_macro)
+    output = geometry.geometrical_output
+    shape = output['ranges'].shape
+
+    pos_AC = np.broadcast_to(output['pos AC'], output['pos SC'].shape).reshape(-1, 3)
+    delta_pos = output['pos SC'].reshape(-1, 3) - pos_AC
+    vel_SC = output['vel SC'].reshape(-1, 3)
+    ranges = output['ranges'].ravel()
+    heights_SC = output['heights SC'].ravel()
+    heights_AC = np.broadcast_to(output['heights AC'], shape).ravel()
+    a = ((heights_SC - heights_AC) ** 2 + 2 * (heights_SC - heights_AC) * R_earth - ranges ** 2) / (2 * ranges * R_earth)
+
+    # Beam spread is only evaluated for the samples above the horizon, with r0 of the turbulence model
+    visible = output['elevation'].ravel() > 0.0
+    links = {'ranges': ranges[visible],
+             'heights AC': heights_AC[visible],
+             'heights SC': heights_SC[visible],
+             'zenith': output['zenith'].ravel()[visible],
+             'slew rates': output['slew rates'].ravel()[visible],
+             'speeds AC': np.broadcast_to(output['speeds AC'], shape).ravel()[visible]}
+    turb = mission_level.turbulence_stage(config, links)
+    w_r = beam_spread(config.angle_div, links['ranges'])
+    return output, a, vel_SC, delta_pos, turb.r0, w_r
+
+#------------------------------------------------------------------------
+#-------------------------------BENCHMARK--------------------------------
+#------------------------------------------------------------------------
+def kernel_benchmark(config):
+    output, a, vel_SC, delta_pos, r0, w_r = scenario_inputs(config)
+    kernels = {'Cosine clip          ': (lambda: clip_loop(a), lambda: np.clip(a, -1.0, 1.0)),
+               'Velocity projection  ': (lambda: project_loop(vel_SC, delta_pos), lambda: project(vel_SC, delta_pos)),
+               'Long-term beam spread': (lambda: beam_spread_loop(r0, w_r, config),
+                                         lambda: beam_spread_turbulence_LT(r0, w_r, config))}
+
+    print('GEOMETRY KERNEL BENCHMARK')
+    print('------------------------------------------------')
+    print('Satellites x time steps  : ' + str(len(output.satellites)) + ' x ' + str(len(output.time)) +
+          ' (' + str(np.round((output.time[-1] - output.time[0]) / 3600, 2)) + ' hrs)')
+    results = {}
+    for name, (loop, vectorised) in kernels.items():
+        t0 = time.perf_counter()
+        reference = loop()
+        t1 = time.perf_counter()
+        result = vectorised()
+        t2 = time.perf_counter()
+        results[name.strip()] = (t1 - t0, t2 - t1, np.max(np.abs(result - reference)))
+        print(name + '    : loop ' + str(np.round(t1 - t0, 3)) + ' s, vectorised ' + str(np.round(t2 - t1, 4)) + ' s, '
+              'speed-up ' + str(np.round((t1 - t0) / (t2 - t1), 0)) + 'x, max. difference ' + str(results[name.strip()][2]))
+    print('------------------------------------------------')
+    return results
+
+
+if __name__ == '__main__':
+    kernel_benchmark(config.replace(number_of_planes=10, number_sats_per_plane=10, start_time=0.0, end_time=6 * 3600.0,
+                                    geometry_engine='batched', visibility_filter='no', turbulence_cache='no'))
@@ -6,10 +6,14 @@ def bit_level(LCT,
               t,
               plot_indices: list,
               samples: float,
-              P_r_0, P_r, elevation_angles, h_tot):
-    print('')
-    print('-------------------------------------BIT-LEVEL-------------------------------------------')
-    print('')
+              P_r_0, P_r, elevation_angles, h_tot,
+              micro_scale='yes',
+              latency_interleaving=None,
+              config=config):
+    if micro_scale == 'yes':
+        print('')
+        print('-------------------------------------BIT-LEVEL-------------------------------------------')
+        print('')
     plot_index = plot_indices[0]
     #------------------------------------------------------------------------
     #--------------------------COMPUTING-SNR-&-BER---------------------------
@@ -17,13 +21,33 @@ def bit_level(LCT,
     # All relevant noise types are computed with analytical equations.
     # These equations are approximations, based on the assumption of a gaussian distribution for each noise type.
 
-    noise_sh, noise_th, noise_bg, noise_beat = LCT.noise(P_r=P_r, I_sun=I_sun, micro_scale='yes')
-
-    # The received SNR and BER are computed with analytical equations.
-    SNR, Q = LCT.SNR_func(P_r=P_r, detection=detection,
-                          noise_sh=noise_sh, noise_th=noise_th, noise_bg=noise_bg, noise_beat=noise_beat)
-    BER = LCT.BER_func(Q=Q, modulation=modulation, micro_scale='yes')
-    BER[BER < 1e-50] = 1e-50
+    # With BER_domain='log', log10(BER) is also computed (with log-erfc), in the same pass as the BER.
+    # It is not limited at 1e-50 and it is used for the BER distributions and the coded BER, instead of np.log10(BER).
+    log_BER = None
+    if config.bit_engine == 'fused':
+        # Noise, SNR, Q and BER in one pass over P_r
+        if config.BER_domain == 'log':
+            SNR, Q, BER, log_BER = LCT.BER_kernel(P_r=P_r, I_sun=config.I_sun, modulation=config.modulation,
+                                                  detection=config.detection, SNR=True, log_BER=True)
+        else:
+            SNR, Q, BER = LCT.BER_kernel(P_r=P_r, I_sun=config.I_sun, modulation=config.modulation,
+                                         detection=config.detection, SNR=True)
+        if micro_scale == 'yes':
+            # Only for the printed noise model and detection & modulation scheme
+            LCT.noise(P_r=P_r[:1], I_sun=config.I_sun, micro_scale=micro_scale)
+            LCT.BER_func(Q=Q[:1], modulation=config.modulation, micro_scale=micro_scale)
+    else:
+        noise_sh, noise_th, noise_bg, noise_beat = LCT.noise(P_r=P_r, I_sun=config.I_sun, micro_scale=micro_scale)
+
+        # The received SNR and BER are computed with analytical equations.
+        SNR, Q = LCT.SNR_func(P_r=P_r, detection=config.detection,
+                              noise_sh=noise_sh, noise_th=noise_th, noise_bg=noise_bg, noise_beat=noise_beat)
+        if config.BER_domain == 'log':
+            log_BER = LCT.BER_func(Q=Q, modulation=config.modulation, micro_scale=micro_scale, log=True)
+            BER = 10**log_BER
+        else:
+            BER = LCT.BER_func(Q=Q, modulation=config.modulation, micro_scale=micro_scale)
+        BER[BER < 1e-50] = 1e-50
 
 
     pdf_h_tot, cdf_h_tot, x_h_tot, std_h_tot, mean_h_tot = distribution_function(h_tot, len(P_r_0), min=0.0, max=2.0, steps=1000)
@@ -37,28 +61,50 @@ def bit_level(LCT,
     #------------------------------------------------------------------------
     # Coding implementation is based on an analytical Reed-Solomon approximation, taken from (CCSDS Historical Document, 2006, CH.5.5, EQ.3-4)
     # Input parameters for the coding scheme are total symbols per codeword (N), number of information symbols per code word (K) and symbol length
-    if coding == 'yes':
-        BER_coded = LCT.coding(K=K,
-                               N=N,
-                               BER=BER)
-        BER_interleaved = LCT.interleaving(BER)
-        BER_coded_interleaved = LCT.coding(K=K,
-                                           N=N,
-                                           BER=BER_interleaved)
-
-        P_r_coded             = LCT.BER_to_P_r(BER=BER_coded,
+    if config.coding == 'yes':
+        BER_coded = LCT.coding(K=config.K,
+                               N=config.N,
+                               BER=BER,
+                               log_BER=log_BER)
+        # The interleaver depth is config.latency_interleaving, or latency_interleaving (one value or one value for each macro step)
+        BER_interleaved = LCT.interleaving(BER, latency=latency_interleaving)
+        if config.BER_domain == 'log':
+            log_BER_coded_interleaved = LCT.coding(K=config.K,
+                                                   N=config.N,
+                                                   BER=BER_interleaved,
+                                                   log=True)
+            BER_coded_interleaved = 10**log_BER_coded_interleaved
+        else:
+            BER_coded_interleaved = LCT.coding(K=config.K,
+                                               N=config.N,
+                                               BER=BER_interleaved)
+        if config.coding_engine == 'table' and micro_scale == 'yes':
+            LCT.coding_accuracy(K=config.K, N=config.N, micro_scale=micro_scale)
+
+        # With coding_gain='mean', the coded Pr is only looked up for the mean coded BER of each macro step
+        if config.coding_gain == 'mean':
+            P_r_coded         = LCT.BER_to_P_r(BER=BER_coded.mean(axis=1),
+                                               modulation="OOK-NRZ",
+                                               detection="APD",
+                                               coding=True)
+        else:
+            P_r_coded         = LCT.BER_to_P_r(BER=BER_coded,
                                                modulation="OOK-NRZ",
                                                detection="APD",
                                                coding=True)
 
-        P_r_coded_interleaved = LCT.BER_to_P_r(BER=BER_coded_interleaved,
+        # The interleaved coding gain is only plotted, hence it is only computed for the plot index
+        P_r_coded_interleaved = LCT.BER_to_P_r(BER=BER_coded_interleaved[plot_index],
                                                modulation="OOK-NRZ",
                                                detection="APD",
                                                coding=True)
         BER_coded_interleaved[BER_coded_interleaved < 1e-50] = 1e-50
         # Compute the coding gain
-        G_coding  = P_r_coded / P_r
-        G_coding1 = P_r_coded_interleaved / P_r
+        if config.coding_gain == 'mean':
+            G_coding  = P_r_coded / P_r.mean(axis=1)
+        else:
+            G_coding  = P_r_coded / P_r
+        G_coding1 = P_r_coded_interleaved / P_r[plot_index]
     else:
         G_coding = np.zeros(P_r.shape)
 
@@ -70,18 +116,26 @@ def bit_level(LCT,
 
     # Total errors for each macro step is computed and stored in a 1D vector
     # Then, the throughput is computed and stored in a 1D vector
-    max_throughput = LCT.data_rate * interval_channel_level
-    errors_acc = np.cumsum(max_throughput / samples * BER, axis=1)
-    total_errors = errors_acc[:, -1] * (step_size_link / interval_channel_level)
+    # Only the total of each row is needed, so the errors are summed per row (no accumulated error matrix)
+    max_throughput = LCT.data_rate * config.interval_channel_level
+    total_errors = max_throughput / samples * BER.sum(axis=1) * (config.step_size_link / config.interval_channel_level)
+
+    throughput = ((max_throughput - total_errors) / config.step_size_link)
 
-    throughput = ((max_throughput - total_errors) / step_size_link)
 
+    if config.coding == 'yes':
+        total_errors_coded = max_throughput / samples * BER_coded_interleaved.sum(axis=1) * (config.step_size_link / config.interval_channel_level)
 
-    if coding == 'yes':
-        errors_coded_acc = np.cumsum(max_throughput / samples * BER_coded_interleaved, axis=1)
-        total_errors_coded = errors_coded_acc[:, -1] * (step_size_link / interval_channel_level)
+        throughput_coded = ((config.data_rate * config.step_size_link - total_errors_coded) / config.step_size_link)
 
-        throughput_coded = ((data_rate * step_size_link - total_errors_coded) / step_size_link)
+    # Optional: number of error bits in each frame of 'error_frame_length' seconds (macro steps x frames), for burst statistics
+    # The last frame is shorter if the micro-scale interval is not a multiple of the frame length
+    if config.error_frame_length is not None:
+        frame_samples = max(int(np.round(config.error_frame_length / config.step_size_channel_level)), 1)
+        frame_starts = np.arange(0, samples, frame_samples)
+        errors_frames = max_throughput / samples * np.add.reduceat(BER, frame_starts, axis=1)
+        if config.coding == 'yes':
+            errors_coded_frames = max_throughput / samples * np.add.reduceat(BER_coded_interleaved, frame_starts, axis=1)
 
 
     #------------------------------------------------------------------------
@@ -90,18 +144,18 @@ def bit_level(LCT,
 
 
     def waterfall_plot():
-        parity_bits = int((N - K) / 2)
+        parity_bits = int((config.N - config.K) / 2)
         fig_ber, axs_ber = plt.subplots(1, 2)
         axs_ber[0].set_title('BER vs Q at '+str(np.round(np.rad2deg(elevation_angles[plot_index]),1))+'$\degree \epsilon$')
         axs_ber[0].scatter(Q[plot_index], BER[plot_index], label='Simulated, uncoded', s=4)
-        if coding == 'yes':
+        if config.coding == 'yes':
             axs_ber[0].scatter(Q[plot_index], BER_coded[plot_index], label='Simulated, coded (255,223)')
             axs_ber[1].scatter(Q[plot_index], BER_interleaved[plot_index], label='Interleaved')
             axs_ber[1].scatter(Q[plot_index], BER_coded_interleaved[plot_index], label='Interleaved + (255,223) RS coded')
 
         else:
             axs_ber[1].set_title('BER vs $P_{RX}$ at ' + str(np.round(np.rad2deg(elevation_angles[plot_index]), 1))+'$\degree \epsilon$')
-            axs_ber[1].scatter(W2dBm(P_r[plot_index]), BER[plot_index], label='Numerical: Uncoded BER, ' + str(modulation),s=2)
+            axs_ber[1].scatter(W2dBm(P_r[plot_index]), BER[plot_index], label='Numerical: Uncoded BER, ' + str(config.modulation),s=2)
 
         axs_ber[0].set_ylabel('Bit Error Rate (BER)', fontsize=10)
         axs_ber[0].set_yscale('log')
@@ -117,23 +171,23 @@ def bit_level(LCT,
 
         Q1 = np.linspace(0.0, 30.0, 100)
         BER1 = 1 / 2 * erfc(Q1 / np.sqrt(2) )
-        SER1 = 1 - (1 - BER1) ** symbol_length
+        SER1 = 1 - (1 - BER1) ** config.symbol_length
         axs_ber[0].plot(Q1, BER1, label='Theory, uncoded', color='orange')
 
-        if coding == 'yes':
+        if config.coding == 'yes':
             Q_interleaved1 = Q[plot_index,::10]
             BER_interleaved1 = BER_interleaved[plot_index, ::10]
-            SER_interleaved1 = 1 - (1 - BER_interleaved1) ** symbol_length
+            SER_interleaved1 = 1 - (1 - BER_interleaved1) ** config.symbol_length
             SER1_coded = np.zeros(np.shape(SER1))
             SER1_coded_interleaved = np.zeros(np.shape(SER_interleaved1))
             for i in range(len(SER1)):
-                SER1_coded[i]             = SER1[i] * sum(binom(N - 1, k) * SER1[i] ** k * (1 - SER1[i]) ** (N - k - 1) for k in range(parity_bits, N - 1))
+                SER1_coded[i]             = SER1[i] * sum(binom(config.N - 1, k) * SER1[i] ** k * (1 - SER1[i]) ** (config.N - k - 1) for k in range(parity_bits, config.N - 1))
 
             for i in range(len(SER_interleaved1)):
-                SER1_coded_interleaved[i] = SER_interleaved1[i] * sum(binom(N - 1, k) * SER_interleaved1[i] ** k * (1 - SER_interleaved1[i]) ** (N - k - 1) for k in range(parity_bits, N - 1))
+                SER1_coded_interleaved[i] = SER_interleaved1[i] * sum(binom(config.N - 1, k) * SER_interleaved1[i] ** k * (1 - SER_interleaved1[i]) ** (config.N - k - 1) for k in range(parity_bits, config.N - 1))
 
-            BER_coded1             = 2 ** (symbol_length - 1) / N * SER1_coded
-            BER_coded_interleaved1 = 2 ** (symbol_length - 1) / N * SER1_coded_interleaved
+            BER_coded1             = 2 ** (config.symbol_length - 1) / config.N * SER1_coded
+            BER_coded_interleaved1 = 2 ** (config.symbol_length - 1) / config.N * SER1_coded_interleaved
             axs_ber[0].plot(Q1, BER_coded1, label='Theory: coded (255,223)', color='green')
 
 
@@ -173,10 +227,10 @@ def bit_level(LCT,
 
         ax_output_t[0].plot(t * 1.0E3, np.ones(t.shape) * W2dBm(LCT.P_r_thres[1]), label='thres', c='black',
                             linewidth=2)
-        ax_output_t[1].plot(t * 1.0E3, np.ones(t.shape) * BER_thres[1], label='thres', c='black',
+        ax_output_t[1].plot(t * 1.0E3, np.ones(t.shape) * config.BER_thres[1], label='thres', c='black',
                             linewidth=2)
 
-        if coding == 'yes':
+        if config.coding == 'yes':
             for i in plot_indices:
                 ax_output_t[1].plot(t * 1.0E3, BER_coded[i],
                                     label='$\epsilon$=' + str(
@@ -212,18 +266,18 @@ def bit_level(LCT,
         plt.show()
     def plot_coding_errors():
 
-        if coding == 'yes':
+        if config.coding == 'yes':
             fig_coding, ax_coding = plt.subplots(1, 2)
             ax_coding[0].set_title('Bit-level error performance for $\epsilon$ = ' + str(
                 np.round(np.rad2deg(elevation_angles[plot_index]), 2)) + '$\degree$ \n'
                                                                          'Interleaver latency = ' + str(
-                latency_interleaving) + 's')
+                config.latency_interleaving) + 's')
 
             ax_coding[0].plot(t*1e3, BER[plot_index], label='Uncoded')
             # ax_coding[0].plot(t*1e3, np.ones(len(t)) * BER[plot_index].mean(), color='blue')
 
 
-            ax_coding[0].plot(t*1e3, BER_coded[plot_index], label='RS ('+str(N)+', '+str(K)+') coded only')
+            ax_coding[0].plot(t*1e3, BER_coded[plot_index], label='RS ('+str(config.N)+', '+str(config.K)+') coded only')
             # ax_coding[0].plot(t*1e3, np.ones(len(t)) * BER_coded[plot_index].mean(), color='orange')
 
             ax_coding[1].plot(t*1e3, BER_interleaved[plot_index], label='Uncoded, interleaved')
@@ -256,15 +310,15 @@ def bit_level(LCT,
 
             ax[0].set_ylabel('Pr (dBm)')
             ax[0].plot(t, W2dBm(P_r[plot_index]), label='Uncoded')
-            ax[0].plot(t, W2dBm(P_r_coded[plot_index]), label='RS coded + interleaved')
+            ax[0].plot(t, np.ones(len(t)) * W2dBm(P_r_coded[plot_index]), label='RS coded + interleaved')
             ax[0].plot(t, np.ones(len(t)) * W2dBm(P_r[plot_index].mean()), color='blue', label='Uncoded')
             ax[0].plot(t, np.ones(len(t)) * W2dBm(P_r_coded[plot_index].mean()), color='orange', label='RS coded + interleaved')
 
             ax[1].set_ylabel('Coding gain (dB)')
-            ax[1].plot(t, W2dB(G_coding[plot_index]), label='RS coded')
-            ax[1].plot(t, W2dB(G_coding1[plot_index]), label='RS coded + interleaved')
+            ax[1].plot(t, np.ones(len(t)) * W2dB(G_coding[plot_index]), label='RS coded')
+            ax[1].plot(t, W2dB(G_coding1), label='RS coded + interleaved')
             ax[1].plot(t, np.ones(len(t)) * W2dB(G_coding[plot_index].mean()), color='blue', label='RS coded')
-            ax[1].plot(t, np.ones(len(t)) * W2dB(G_coding1[plot_index].mean()), color='orange',
+            ax[1].plot(t, np.ones(len(t)) * W2dB(G_coding1.mean()), color='orange',
                        label='RS coded + interleaved')
 
             ax[0].legend()
@@ -274,12 +328,23 @@ def bit_level(LCT,
 
     # waterfall_plot()
     # plot_bit_level_time_series()
-    plot_coding_errors()
+    if micro_scale == 'yes':
+        plot_coding_errors()
 
 
 
 
-    if coding == 'yes':
-        return SNR, BER, throughput, BER_coded_interleaved, throughput_coded, P_r_coded, G_coding
+    if config.coding == 'yes':
+        # With coding_gain='mean', the coded Pr and coding gain are already one value for each macro step
+        output = (SNR, BER, throughput, BER_coded_interleaved, throughput_coded, P_r_coded, G_coding)
+        if config.error_frame_length is not None:
+            output += (errors_frames, errors_coded_frames)
+        if config.BER_domain == 'log':
+            output += (log_BER, log_BER_coded_interleaved)
     else:
-        return SNR, BER, throughput
+        output = (SNR, BER, throughput)
+        if config.error_frame_length is not None:
+            output += (errors_frames,)
+        if config.BER_domain == 'log':
+            output += (log_BER,)
+    return output
@@ -1,5 +1,6 @@
 
 from helper_functions import *
+from PDF import distributions
 
 def channel_level(LCT,
                   turb,
@@ -11,7 +12,11 @@ def channel_level(LCT,
                   P_r_0: np.array,
                   elevation_angles: np.array,
                   samples,
-                  turb_cutoff_frequency=1.0E4):
+                  turb_cutoff_frequency=1.0E4,
+                  micro_scale='yes',
+                  seed=None,
+                  macro_steps=None,
+                  config=config):
     # print('')
     # print('-----------------------------------CHANNEL-LEVEL-----------------------------------------')
     # print('')
@@ -21,62 +26,80 @@ def channel_level(LCT,
     # ------------------------INITIALIZING-ALL-VECTORS------------------------
     # ----------------------START-MONTE-CARLO-SIMULATIONS---------------------
     # ------------------------------------------------------------------------
-    # Seed is randomized
-    np.random.seed(seed=random.randint(0,1000))
+    # Seed of this run (see PDF.distributions). With seed=None, a new seed is drawn.
+    # 'macro_steps' are the indices of the macro-scale steps in the mission, such that a chunk of the mission draws the same vectors
+    dist = distributions(config=config, seed=seed)
+    if macro_steps is None:
+        macro_steps = np.arange(len(P_r_0))
+
+    # With precision='mixed', the noise generation, filtering, redistribution and projections are done in float32 (see input.py)
+    # P_r is computed in float64 from P_r_0 (float64)
+    dtype = np.float32 if config.precision == 'mixed' else np.float64
 
     # For each fluctuating variable, a vector is initialized with a standard normal distribution (std=1, mean=0)
     # For all jitter related vectors (beam wander, angle-of-arrival, mechanical TX jitter, mechanical RX jitter), two variables are initialized for both X- and Y-components
     # And stored in a 1D array
 
-    angle_pj_t_X = norm.rvs(scale=1, loc=0, size=samples)
-    angle_pj_t_Y = norm.rvs(scale=1, loc=0, size=samples)
-    angle_pj_r_X = norm.rvs(scale=1, loc=0, size=samples)
-    angle_pj_r_Y = norm.rvs(scale=1, loc=0, size=samples)
+    angle_pj_t_X = dist.standard_normal(effect='TX jitter X', out=np.empty(samples, dtype=dtype))
+    angle_pj_t_Y = dist.standard_normal(effect='TX jitter Y', out=np.empty(samples, dtype=dtype))
+    angle_pj_r_X = dist.standard_normal(effect='RX jitter X', out=np.empty(samples, dtype=dtype))
+    angle_pj_r_Y = dist.standard_normal(effect='RX jitter Y', out=np.empty(samples, dtype=dtype))
 
     # The turbulence vectors (beam wander and angle-of-arrival) are range-dependent and must be evaluated for each macro time step
-    # And stored in a 2D array.
+    # And stored in a 2D array with size ( len of P_r_0 list, # of samples ). All five 2D arrays are part of one 3D array.
+    turbulence_vectors = np.empty((5, len(P_r_0), samples), dtype=dtype)
+    h_scint, angle_bw_X, angle_bw_Y, angle_aoa_X, angle_aoa_Y = turbulence_vectors
 
-    h_scint     = np.empty((len(P_r_0), samples))                            # Should have 2D with size ( len of P_r_0 list, # of samples )
-    angle_bw_X  = np.empty((len(P_r_0), samples))                            # Should have 2D with size ( len of P_r_0 list, # of samples )
-    angle_bw_Y  = np.empty((len(P_r_0), samples))                            # Should have 2D with size ( len of P_r_0 list, # of samples )
-    angle_aoa_X = np.empty((len(P_r_0), samples))                            # Should have 2D with size ( len of P_r_0 list, # of samples )
-    angle_aoa_Y = np.empty((len(P_r_0), samples))                            # Should have 2D with size ( len of P_r_0 list, # of samples )
-    for i in range(len(P_r_0)):
-        h_scint[i]     = norm.rvs(scale=1, loc=0, size=samples)
-        angle_bw_X[i]  = norm.rvs(scale=1, loc=0, size=samples)
-        angle_bw_Y[i]  = norm.rvs(scale=1, loc=0, size=samples)
-        angle_aoa_X[i] = norm.rvs(scale=1, loc=0, size=samples)
-        angle_aoa_Y[i] = norm.rvs(scale=1, loc=0, size=samples)
+    dist.standard_normal(effect='scintillation',      out=h_scint,     macro_steps=macro_steps)
+    dist.standard_normal(effect='beam wander X',      out=angle_bw_X,  macro_steps=macro_steps)
+    dist.standard_normal(effect='beam wander Y',      out=angle_bw_Y,  macro_steps=macro_steps)
+    dist.standard_normal(effect='angle of arrival X', out=angle_aoa_X, macro_steps=macro_steps)
+    dist.standard_normal(effect='angle of arrival Y', out=angle_aoa_Y, macro_steps=macro_steps)
 
 
     # -----------------------------------------------------------------------------------------------
     # ------------------FREQUENCY-FILTERING-&-NORMALIZATION-OF-FLUCTUATION-VECTORS-------------------
     # -----------------------------------------------------------------------------------------------
-    sampling_frequency = 1 / step_size_channel_level  # 0.1 ms
+    sampling_frequency = 1 / config.step_size_channel_level  # 0.1 ms
     nyquist = sampling_frequency / 2
 
     # The frequency of all vectors is filtered and normalized, such that we end up with a standard normal distribution again, but now with a defined spectrum.
     # The turbulence vectors are filtered with a low-pass filter with a default cut-off frequency of 1 kHz.
     # The turbulence vectors are filtered with a band-pass filter with a default cut-off frequency ranges of [0.1- 0.2] Hz, [1.0- 1.1] Hz.
-    h_scint     = filtering(effect='scintillation', order=frequency_filter_order, data=h_scint, f_cutoff_low=turb.freq,
-                        filter_type='lowpass', f_sampling=sampling_frequency, plot='no')
-    angle_bw_X  = filtering(effect='beam wander', order=frequency_filter_order, data=angle_bw_X, f_cutoff_low=turb.freq,
-                        filter_type='lowpass', f_sampling=sampling_frequency, plot='no')
-    angle_bw_Y  = filtering(effect='beam wander', order=frequency_filter_order, data=angle_bw_Y, f_cutoff_low=turb.freq,
-                        filter_type='lowpass', f_sampling=sampling_frequency, plot='no')
-    angle_aoa_X = filtering(effect='angle of arrival', order=frequency_filter_order, data=angle_aoa_X, f_cutoff_low=turb.freq,
-                            filter_type='lowpass', f_sampling=sampling_frequency, plot='no')
-    angle_aoa_Y = filtering(effect='angle of arrival', order=frequency_filter_order, data=angle_aoa_Y, f_cutoff_low=turb.freq,
-                            filter_type='lowpass', f_sampling=sampling_frequency, plot='no')
-
-    angle_pj_t_X = filtering(effect='TX jitter', order=frequency_filter_order, data=angle_pj_t_X, f_cutoff_low=jitter_freq_lowpass, f_cutoff_band=jitter_freq1, f_cutoff_band1=jitter_freq2,
-                        filter_type='multi', f_sampling=sampling_frequency, plot='no')
-    angle_pj_t_Y = filtering(effect='TX jitter', order=frequency_filter_order, data=angle_pj_t_Y, f_cutoff_low=jitter_freq_lowpass, f_cutoff_band=jitter_freq1, f_cutoff_band1=jitter_freq2,
-                        filter_type='multi', f_sampling=sampling_frequency, plot='no')
-    angle_pj_r_X = filtering(effect='RX jitter', order=frequency_filter_order, data=angle_pj_r_X, f_cutoff_low=jitter_freq_lowpass, f_cutoff_band=jitter_freq1, f_cutoff_band1=jitter_freq2,
-                        filter_type='multi', f_sampling=sampling_frequency, plot='no')
-    angle_pj_r_Y = filtering(effect='RX jitter', order=frequency_filter_order, data=angle_pj_r_Y, f_cutoff_low=jitter_freq_lowpass, f_cutoff_band=jitter_freq1, f_cutoff_band1=jitter_freq2,
-                        filter_type='multi', f_sampling=sampling_frequency, plot='no')
+    if config.filter_engine == 'fft':
+        # With spectral synthesis, all turbulence vectors are filtered at once, since these have the same cut-off frequencies
+        h_scint, angle_bw_X, angle_bw_Y, angle_aoa_X, angle_aoa_Y = \
+            filtering(effect='turbulence', order=config.frequency_filter_order, data=turbulence_vectors, f_cutoff_low=turb.freq,
+                      filter_type='lowpass', f_sampling=sampling_frequency, plot='no', engine=config.filter_engine)
+    else:
+        h_scint     = filtering(effect='scintillation', order=config.frequency_filter_order, data=h_scint, f_cutoff_low=turb.freq,
+                            filter_type='lowpass', f_sampling=sampling_frequency, plot='no',
+                            engine=config.filter_engine, f_resolution=config.filter_frequency_resolution)
+        angle_bw_X  = filtering(effect='beam wander', order=config.frequency_filter_order, data=angle_bw_X, f_cutoff_low=turb.freq,
+                            filter_type='lowpass', f_sampling=sampling_frequency, plot='no',
+                            engine=config.filter_engine, f_resolution=config.filter_frequency_resolution)
+        angle_bw_Y  = filtering(effect='beam wander', order=config.frequency_filter_order, data=angle_bw_Y, f_cutoff_low=turb.freq,
+                            filter_type='lowpass', f_sampling=sampling_frequency, plot='no',
+                            engine=config.filter_engine, f_resolution=config.filter_frequency_resolution)
+        angle_aoa_X = filtering(effect='angle of arrival', order=config.frequency_filter_order, data=angle_aoa_X, f_cutoff_low=turb.freq,
+                                filter_type='lowpass', f_sampling=sampling_frequency, plot='no',
+                                engine=config.filter_engine, f_resolution=config.filter_frequency_resolution)
+        angle_aoa_Y = filtering(effect='angle of arrival', order=config.frequency_filter_order, data=angle_aoa_Y, f_cutoff_low=turb.freq,
+                                filter_type='lowpass', f_sampling=sampling_frequency, plot='no',
+                                engine=config.filter_engine, f_resolution=config.filter_frequency_resolution)
+
+    angle_pj_t_X = filtering(effect='TX jitter', order=config.frequency_filter_order, data=angle_pj_t_X, f_cutoff_low=config.jitter_freq_lowpass, f_cutoff_band=config.jitter_freq1, f_cutoff_band1=config.jitter_freq2,
+                        filter_type='multi', f_sampling=sampling_frequency, plot='no',
+                        engine=config.filter_engine, f_resolution=config.filter_frequency_resolution)
+    angle_pj_t_Y = filtering(effect='TX jitter', order=config.frequency_filter_order, data=angle_pj_t_Y, f_cutoff_low=config.jitter_freq_lowpass, f_cutoff_band=config.jitter_freq1, f_cutoff_band1=config.jitter_freq2,
+                        filter_type='multi', f_sampling=sampling_frequency, plot='no',
+                        engine=config.filter_engine, f_resolution=config.filter_frequency_resolution)
+    angle_pj_r_X = filtering(effect='RX jitter', order=config.frequency_filter_order, data=angle_pj_r_X, f_cutoff_low=config.jitter_freq_lowpass, f_cutoff_band=config.jitter_freq1, f_cutoff_band1=config.jitter_freq2,
+                        filter_type='multi', f_sampling=sampling_frequency, plot='no',
+                        engine=config.filter_engine, f_resolution=config.filter_frequency_resolution)
+    angle_pj_r_Y = filtering(effect='RX jitter', order=config.frequency_filter_order, data=angle_pj_r_Y, f_cutoff_low=config.jitter_freq_lowpass, f_cutoff_band=config.jitter_freq1, f_cutoff_band1=config.jitter_freq2,
+                        filter_type='multi', f_sampling=sampling_frequency, plot='no',
+                        engine=config.filter_engine, f_resolution=config.filter_frequency_resolution)
 
 
     # -----------------------------------------------------------------------------------------------
@@ -119,7 +142,7 @@ def channel_level(LCT,
     # The super-positioned vectors for TX are projected over a Gaussian beam profile to obtain the loss fraction h_TX(t)
     # The super-positioned vectors for RX are projected over a Airy disk profile to obtain the loss fraction h_RX(t)
     h_TX = h_p_gaussian(angle_TX, angle_div)
-    h_RX = h_p_airy(angle_RX, D_r, focal_length)
+    h_RX = h_p_airy(angle_RX, config.D_r, config.focal_length, config)
 
     # The combined power vector is obtained by multiplying all three power vectors with each other (under the assumption of statistical independence between the three vectors)
     # REF: REFERENCE POWER VECTORS FOR OPTICAL LEO DOWNLINK CHANNEL, D. GIGGENBACH ET AL. Fig.1.
@@ -129,8 +152,8 @@ def channel_level(LCT,
     # For each jitter related vector, the power vector is also computed separately for analysis of the separate contributions
     h_bw = h_p_gaussian(angle_bw_R, angle_div)
     h_pj_t = h_p_gaussian(angle_pj_t_R, angle_div)
-    h_pj_r = h_p_airy(angle_pj_r_R, D_r, focal_length)
-    h_aoa = h_p_airy(angle_aoa_R, D_r, focal_length)
+    h_pj_r = h_p_airy(angle_pj_r_R, config.D_r, config.focal_length, config)
+    h_aoa = h_p_airy(angle_aoa_R, config.D_r, config.focal_length, config)
 
     # This is the case of perfect pointing (no platform jitter effects)
     h_tot_no_pointing_errors = h_scint * h_bw * h_aoa
@@ -139,11 +162,14 @@ def channel_level(LCT,
     losses = [h_tot, h_scint, h_RX, h_TX, h_bw, h_aoa, h_pj_t, h_pj_r, h_tot_no_pointing_errors]
 
 
-    print('BEAM PROPAGATION MODEL')
-    print('------------------------------------------------')
-    print('Signal through channel: Gaussian beam profile')
-    print('Signal at RX fiber coupling: Airy disk')
-    print('------------------------------------------------')
+    if micro_scale == 'yes':
+        print('BEAM PROPAGATION MODEL')
+        print('------------------------------------------------')
+        print('Signal through channel: Gaussian beam profile')
+        print('Signal at RX fiber coupling: Airy disk')
+        if config.pointing_engine == 'table':
+            print('Airy disk projection: lookup table, max. error ' + str(airy_table(config.D_r, config.k_number, config.pointing_tolerance)[-1]))
+        print('------------------------------------------------')
     #------------------------------------------------------------------------
     #------------------------------COMPUTING-P_r-----------------------------
     #------------------------------------------------------------------------
@@ -151,21 +177,23 @@ def channel_level(LCT,
     # The PPB is computed with P_r and data_rate, according to (A.MAJUMDAR, 2008, EQ.3.29, H.HEMMATI, 2004, EQ.4.1-1)
     P_r = (h_tot.transpose() * P_r_0).transpose()
     P_r_no_pointing_errors = (h_tot_no_pointing_errors.transpose() * P_r_0).transpose()
-    PPB = PPB_func(P_r, data_rate)
+    PPB = PPB_func(P_r, config.data_rate, config)
     pdf_P_r, cdf_P_r, x_P_r, std_P_r, mean_P_r = distribution_function(W2dBm(P_r), len(P_r_0), min=-60.0, max=-10.0, steps=100)
 
 
-    print('MONTE CARLO  POWER VECTOR TOOL')
-    print('------------------------------------------------')
-    print('3 Dynamic turbulence effects used  : Scintillation, Beam wander, Angle of arrival (AoA)')
-    print('2 Platform jitter effects used     : TX platform & RX platform microvibrations')
-    print('Population size sampling           : ' + str(samples))
-    print('Low-pass frequency turbulence (at '+str(np.round(np.rad2deg(elevation_angles[plot_index]),0))+') : ' + str(turb.freq[plot_index])+' Hz')
-    print('Low-pass frequency jitter          : ' + str(jitter_freq_lowpass)+' Hz')
-    print('Band-pass frequencies jitter       : ' + str(jitter_freq1)+' Hz, '+str(jitter_freq2)+' Hz')
-    print('Distribution for scintillation     : ' + dist_scintillation)
-    print('Distribution for beam wander & AoA : ' + dist_beam_wander)
-    print('Distribution for platform jitter   : ' + dist_pointing)
+    if micro_scale == 'yes':
+        print('MONTE CARLO  POWER VECTOR TOOL')
+        print('------------------------------------------------')
+        print('3 Dynamic turbulence effects used  : Scintillation, Beam wander, Angle of arrival (AoA)')
+        print('2 Platform jitter effects used     : TX platform & RX platform microvibrations')
+        print('Population size sampling           : ' + str(samples))
+        print('Seed                               : ' + str(dist.seed))
+        print('Low-pass frequency turbulence (at '+str(np.round(np.rad2deg(elevation_angles[plot_index]),0))+') : ' + str(turb.freq[plot_index])+' Hz')
+        print('Low-pass frequency jitter          : ' + str(config.jitter_freq_lowpass)+' Hz')
+        print('Band-pass frequencies jitter       : ' + str(config.jitter_freq1)+' Hz, '+str(config.jitter_freq2)+' Hz')
+        print('Distribution for scintillation     : ' + config.dist_scintillation)
+        print('Distribution for beam wander & AoA : ' + config.dist_beam_wander)
+        print('Distribution for platform jitter   : ' + config.dist_pointing)
 
     #------------------------------------------------------------------------
     #-------------------------PLOT-RESULTS-(OPTIONAL)------------------------
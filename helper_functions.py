@@ -2,13 +2,15 @@ import sqlite3
 
 import numpy as np
 import scipy.signal
+from matplotlib import pyplot as plt
 from input import *
 
 import random
-from scipy.special import j0, j1, binom
+from scipy.special import j0, j1, binom, gammaln, logsumexp, log_ndtr
 from scipy.stats import rv_histogram, norm
-from scipy.signal import butter, filtfilt, welch
-from scipy.fft import rfft, rfftfreq
+from scipy.signal import butter, filtfilt, sosfiltfilt, sosfreqz, welch
+from functools import lru_cache
+from scipy.fft import rfft, irfft, rfftfreq
 from scipy.special import erfc, erf, erfinv, erfcinv
 from scipy.special import erfc, erfcinv
 from tudatpy.kernel.math import interpolators
@@ -57,34 +59,105 @@ def cross_section(elevation_cross_section, elevation, time_links):
         time_cross_section.append(t)
     return indices, time_cross_section
 
-def h_p_airy(angle, D_r, focal_length):
+def as_dtype(x, like):
+    # Converts x to the precision of 'like' (float32 if 'like' is float32, otherwise float64), masked arrays keep their mask
+    dtype = np.float32 if getattr(like, 'dtype', None) == np.float32 else np.float64
+    if isinstance(x, np.ndarray):
+        return x.astype(dtype, copy=False)
+    return np.asarray(x, dtype=dtype)
+
+def h_p_airy(angle, D_r, focal_length, config=config):
     # REF: Wikipedia Airy Disk
-    # Fraunhofer diffraction pattern
-    I_norm = (2 * j1(k_number * D_r/2 * np.sin(angle)) /
-                    (k_number * D_r/2 * np.sin(angle)))**2
+    # Fraunhofer diffraction pattern (fraction of power within the first ring, P_norm = j0(x)^2 + j1(x)^2)
+    # With pointing_engine='table', arrays are projected with the lookup table of airy_table (scalars are always exact)
+    if config.pointing_engine == 'table' and np.ndim(angle) > 0:
+        return airy_interp(angle, D_r, config.k_number, config.pointing_tolerance)
+
+    # The projection is computed in the precision of angle (float64 or float32)
+    x = as_dtype(config.k_number * D_r/2, angle) * np.sin(angle)
+    P_norm = (j0(x) )**2 + (j1(x) )**2
+    return P_norm
 
-    P_norm = (j0(k_number * D_r/2 * np.sin(angle)) )**2 + (j1(k_number * D_r/2 * np.sin(angle)) )**2
+@lru_cache(maxsize=None)
+def airy_table(D_r, k_number, tolerance=1.0E-6, x_max=200.0):
+    # Table of the Airy projection h(angle) = j0(a sin(angle))^2 + j1(a sin(angle))^2, with a = k_number * D_r / 2,
+    # on a uniform angle grid from 0 to the angle where a sin(angle) = x_max. Cached for each (D_r, k_number, tolerance).
+    # Error bound of linear interpolation: |error| <= step^2 / 8 * max|h''|. With P(x) = j0^2 + j1^2:
+    #   P'(x)  = -2 j1^2 / x
+    #   P''(x) = -4 j0 j1 / x + 6 (j1 / x)^2,  hence |P''| <= 4 * 1/2 + 6 * 1/4 = 3.5  (|j0| <= 1, |j1 / x| <= 1/2)
+    #   h''    = P''(x) a^2 cos^2(angle) - P'(x) x,   hence |h''| <= 3.5 a^2 + 1  (|x P'| = 2 j1^2 <= 1)
+    # The step is chosen such that the bound is below 'tolerance'. The bound is returned with the table.
+    a = k_number * D_r / 2
+    angle_max = np.arcsin(min(x_max / a, 1.0))
+    h2_max = 3.5 * a**2 + 1
+    steps = int(np.ceil(angle_max / np.sqrt(8 * tolerance / h2_max)))
+    angles = np.linspace(0.0, angle_max, steps + 1)
+    x = a * np.sin(angles)
+    h = j0(x)**2 + j1(x)**2
+    step = angle_max / steps
+    error_bound = step**2 / 8 * h2_max
+    return h, np.diff(h), 1 / step, steps, error_bound
+
+def airy_interp(angle, D_r, k_number, tolerance=1.0E-6):
+    # Airy projection of an array of angles with the table of airy_table (linear interpolation on the uniform grid, no Bessel functions)
+    # Angles outside the table (negative or beyond x_max) are computed exactly. The output has the precision of angle.
+    h, dh, inv_step, steps, error_bound = airy_table(D_r, k_number, tolerance)
+    data = np.ma.getdata(angle)
+    index = np.multiply(data, inv_step, dtype=np.float64)
+    inside = None
+    if index.size and (index.min() < 0.0 or not index.max() < steps):
+        inside = (index >= 0.0) & (index < steps)
+        index[~inside] = 0.0
+    i = index.astype(np.intp)
+    index -= i
+    P_norm = dh[i]
+    P_norm *= index
+    P_norm += h[i]
+    if inside is not None:
+        x = k_number * D_r / 2 * np.sin(np.asarray(data[~inside], dtype=np.float64))
+        P_norm[~inside] = j0(x)**2 + j1(x)**2
+    P_norm = P_norm.astype(data.dtype, copy=False) if data.dtype == np.float32 else P_norm
+    if isinstance(angle, np.ma.MaskedArray):
+        return np.ma.array(P_norm, mask=np.ma.getmask(angle))
     return P_norm
 
 def h_p_gaussian(angles, angle_div):
-    h_p_intensity = np.exp(-2*angles ** 2 / angle_div ** 2)
+    # The projection is computed in the precision of angles (float64 or float32)
+    h_p_intensity = np.exp(-2*angles ** 2 / as_dtype(angle_div, angles) ** 2)
     return h_p_intensity
 
+@lru_cache(maxsize=None)
+def gauss_legendre_nodes(nodes):
+    # Gauss-Legendre nodes and weights on [0, 1]
+    x, w = np.polynomial.legendre.leggauss(nodes)
+    return (x + 1) / 2, w / 2
+
+def gauss_legendre_grid(a, b, edges, nodes):
+    # Composite Gauss-Legendre quadrature on [a, b] for each row (a and b are 1D arrays).
+    # 'edges' are the panel edges as fractions of [a, b] (from 0 to 1), each panel has 'nodes' nodes.
+    # Returns the nodes and weights (rows x panels * nodes), such that the integral of f is np.sum(f(x) * w, axis=1)
+    x_panel, w_panel = gauss_legendre_nodes(nodes)
+    edges = np.asarray(edges, dtype=np.float64)
+    fractions = (edges[:-1, None] + np.diff(edges)[:, None] * x_panel).ravel()
+    weights = (np.diff(edges)[:, None] * w_panel).ravel()
+    length = (b - a)[:, None]
+    return a[:, None] + length * fractions, length * weights
+
 def I_to_P(I, r, w_z):
     return I * np.trapz(np.exp(-2 * r ** 2 / w_z ** 2), x=r)
 
 def P_to_I(P, r, w_z):
     return P / np.trapz(np.exp(-2 * r ** 2 / w_z ** 2), x=r)
 
-def acquisition(current_index, current_acquisition_time, step_size):
+def acquisition(current_index, current_acquisition_time, step_size, config=config):
     # Add latency due to acquisition process (a reference value of 50 seconds is taken, found in input.py)
     # A more detailed method can be added here for analysis of the acquisition phase
-    total_acquisition_time = current_acquisition_time + acquisition_time
-    index = current_index + int(acquisition_time / step_size)
+    total_acquisition_time = current_acquisition_time + config.acquisition_time
+    index = current_index + int(config.acquisition_time / step_size)
     return total_acquisition_time, index
 
-def radius_of_curvature(ranges):
-    z_r = np.pi * w0 ** 2 * n_index / wavelength
+def radius_of_curvature(ranges, config=config):
+    z_r = np.pi * config.w0 ** 2 * config.n_index / config.wavelength
     R = ranges * (1 + (z_r / ranges)**2)
     return R
 
@@ -97,32 +170,30 @@ def beam_spread_turbulence_ST(Lambda0, Lambda, var, w_r):
     W_ST = w_r * np.sqrt(1 + 1.33 * var * Lambda**(5/6) * (1 - 0.66 * (Lambda0**2 / (1 + Lambda0**2))**(1/6)))
     return W_ST
 
-def beam_spread_turbulence_LT(r0, w_r):
+def beam_spread_turbulence_LT(r0, w_r, config=config):
     # REF: LASER BEAM PROPAGATION THROUGH RANDOM MEDIA, L.ANDREWS, 2005, EQ.12.48
-    w_LT = np.zeros(len(r0))
-    D_0 = D_t
+    D_0 = config.D_t
     # D_0 = 2**(3/2)
-    for i in range(len(r0)):
-        if D_0/r0[i] < 1.0:
-            w_LT[i] = w_r[i] * (1 + (D_0 / r0[i])**(5/3))**(1/2)
-        elif D_0/r0[i] > 1.0:
-            w_LT[i] = w_r[i] * (1 + (D_0 / r0[i])**(5/3))**(3/5)
+    ratio = D_0 / np.asarray(r0)
+    # Zero where D_0/r0 == 1 (or NaN), as neither regime applies
+    w_LT = np.select([ratio < 1.0, ratio > 1.0],
+                     [w_r * (1 + ratio**(5/3))**(1/2), w_r * (1 + ratio**(5/3))**(3/5)], default=0.0)
     return w_LT
 
-def PPB_func(P_r, data_rate):
+def PPB_func(P_r, data_rate, config=config):
     # REF: FREE-SPACE LASER COMMUNICATIONS, PRINCIPLES AND ADVANCES, A.MAJUMDAR, 2008, CH.3 EQ.29
     # REF: DEEP SPACE OPTICAL COMMUNICATIONS, H.HEMMATI, 2004, EQ.4.1-1
-    return P_r / (h * v * data_rate)
+    return P_r / (h * config.v * data_rate)
 
-def Np_func(P_r, BW):
+def Np_func(P_r, BW, config=config):
     # REF: BASICS OF INCOHERENT AND COHERENT DIGITAL OPTICAL COMMUNICATIONS, P.GALLION, 2016, PAR. 3.4.3.3
-    return P_r / (h * v * BW)
+    return P_r / (h * config.v * BW)
 
-def data_rate_func(P_r, PPB):
+def data_rate_func(P_r, PPB, config=config):
     # REF: FREE-SPACE LASER COMMUNICATIONS, PRINCIPLES AND ADVANCES, A.MAJUMDAR, 2008, CH.3 EQ.29
     # REF: DEEP SPACE OPTICAL COMMUNICATIONS, H.HEMMATI, 2004, EQ.4.1-1
     # data_rate = P_r / (Ep * N_p) / eff_quantum
-    return P_r / (h * v * PPB)
+    return P_r / (h * config.v * PPB)
 
 def save_to_file(data):
     data_merge = (data[0]).copy()
@@ -140,6 +211,38 @@ def save_to_file(data):
 
 
 
+@lru_cache(maxsize=None)
+def butter_sos(order, f_cutoff, filter_type, f_sampling, eps=1.0E-9):
+    # Digital Butterworth filter in second-order sections, cached for each (order, cut-off frequency, type, sampling frequency)
+    # Also returns the approximate impulse length, which is used as padding length (same as 'irlen' of the 'gust' method)
+    sos = butter(N=order, Wn=f_cutoff, btype=filter_type, analog=False, fs=f_sampling, output='sos')
+    z, p, k = scipy.signal.sos2zpk(sos)
+    r = np.max(np.abs(p))
+    approx_impulse_len = int(np.ceil(np.log(eps) / np.log(r)))
+    return sos, approx_impulse_len
+
+@lru_cache(maxsize=None)
+def butter_power_response(order, f_cutoff, filter_type, f_sampling, samples):
+    # Power response |H(f)|^2 of a digital Butterworth filter at the frequencies of rfft(samples), cached for each filter.
+    # This is the amplitude response of the forward-backward filter (filtfilt) of the same filter.
+    sos, approx_impulse_len = butter_sos(order, f_cutoff, filter_type, f_sampling)
+    f, h = sosfreqz(sos, worN=rfftfreq(samples, 1 / f_sampling), fs=f_sampling)
+    return np.abs(h)**2
+
+def butter_lowpass_power_response(order, f_cutoff, f_sampling, samples):
+    # Power response |H(f)|^2 of a digital Butterworth lowpass filter (bilinear transform) for an array of cut-off frequencies.
+    # Output has size ( len of f_cutoff, len of rfft(samples) )
+    f = rfftfreq(samples, 1 / f_sampling)
+    ratio = np.tan(np.pi * f / f_sampling) / np.tan(np.pi * np.asarray(f_cutoff, dtype=float) / f_sampling)[..., None]
+    return 1 / (1 + ratio**(2 * order))
+
+def sosfiltfilt_padded(sos_padlen, data):
+    # Forward-backward filter along the last axis. The signal is padded with its even extension over the impulse length,
+    # such that no transients are introduced at the edges of the (white noise) signal.
+    # The filter is applied in the precision of data (float64 or float32)
+    sos, padlen = sos_padlen
+    return sosfiltfilt(sos.astype(data.dtype, copy=False), data, axis=-1, padtype='even', padlen=min(padlen, data.shape[-1] - 1))
+
 def filtering(effect: str,                  # Effect is eiter turbulence (scintillation, beam wander, angle of arrival) or jitter (TX jitter, RX jitter)
               order,                        # Order of the filter
               data: np.ndarray,             # Input dataset u (In this model this will be scintillation, beam wander jitter etc.)
@@ -149,6 +252,8 @@ def filtering(effect: str,                  # Effect is eiter turbulence (scinti
               f_cutoff_band1=False,         # [900, 1050] is taken as the standard bandpass range, used for mechanical jitter
               f_sampling=10E3,              # 10 kHz is taken as the standard sampling frequency for all temporal fluctuations
               plot='no',                  # Option to plot the frequency domain of the sampled data and input data
+              engine='sos',                 # 'sos': batched sosfiltfilt, 'fft': spectral synthesis, 'gust': filtfilt (Gustafsson's method) for each row
+              f_resolution=0.0,             # Cut-off frequencies are rounded to this resolution (Hz), such that rows can share one filter
               ):
 
     # Applying a lowpass filter in order to obtain the frequency response of the turbulence (~1000 Hz) and jitter (~ 1000 Hz)
@@ -157,7 +262,42 @@ def filtering(effect: str,                  # Effect is eiter turbulence (scinti
 
     eps = 1.0E-9
 
-    if effect == 'scintillation' or effect == 'beam wander' or effect == 'angle of arrival':
+    if engine == 'sos':
+        # Filters are designed once in second-order sections and cached (see butter_sos)
+        # Rows with the same (rounded) cut-off frequency are filtered together with sosfiltfilt along axis=1
+        if effect == 'scintillation' or effect == 'beam wander' or effect == 'angle of arrival':
+            f_cutoff = np.ma.getdata(f_cutoff_low).astype(float)
+            if f_resolution > 0.0:
+                f_cutoff = np.round(f_cutoff / f_resolution) * f_resolution
+            data_filt = np.empty(np.shape(data), dtype=data.dtype)
+            for f in np.unique(f_cutoff):
+                rows = f_cutoff == f
+                data_filt[rows] = sosfiltfilt_padded(butter_sos(order, f, filter_type, f_sampling), data[rows])
+
+        elif effect == 'TX jitter' or effect == 'RX jitter':
+            data_filt_low = sosfiltfilt_padded(butter_sos(order, f_cutoff_low, 'lowpass', f_sampling), data)
+            data_filt     = sosfiltfilt_padded(butter_sos(order, tuple(f_cutoff_band), 'bandpass', f_sampling), data_filt_low)
+            if f_cutoff_band1:
+                data_filt = data_filt + sosfiltfilt_padded(butter_sos(order, tuple(f_cutoff_band1), 'bandpass', f_sampling), data_filt_low)
+            data_filt = data_filt + data_filt_low
+
+    elif engine == 'fft':
+        # The (white noise) data is shaped directly in the frequency domain with the power response |H(f)|^2 of the filters,
+        # which is the same spectrum as obtained with the forward-backward filters above. The data can have any number of dimensions,
+        # e.g. all turbulence vectors (effect='turbulence') with size ( # of vectors, len of f_cutoff_low, # of samples ).
+        samples = data.shape[-1]
+        if effect == 'scintillation' or effect == 'beam wander' or effect == 'angle of arrival' or effect == 'turbulence':
+            H2 = butter_lowpass_power_response(order, np.ma.getdata(f_cutoff_low), f_sampling, samples)
+
+        elif effect == 'TX jitter' or effect == 'RX jitter':
+            H2 = 1 + butter_power_response(order, tuple(f_cutoff_band), 'bandpass', f_sampling, samples)
+            if f_cutoff_band1:
+                H2 = H2 + butter_power_response(order, tuple(f_cutoff_band1), 'bandpass', f_sampling, samples)
+            H2 = H2 * butter_lowpass_power_response(order, f_cutoff_low, f_sampling, samples)
+
+        data_filt = irfft(rfft(data, axis=-1) * H2.astype(data.dtype, copy=False), n=samples, axis=-1)
+
+    elif effect == 'scintillation' or effect == 'beam wander' or effect == 'angle of arrival':
         data_filt = np.empty(np.shape(data))
         for i in range(len(data)):
             # Digital filter settings
@@ -238,11 +378,9 @@ def filtering(effect: str,                  # Effect is eiter turbulence (scinti
         plt.show()
 
     # Normalize data
-    sums = data_filt.std(axis=data_filt.ndim-1)
-    if data_filt.ndim > 1:
-        data_filt = data_filt / sums[:, None]
-    elif data_filt.ndim == 1:
-        data_filt = data_filt / sums
+    # The standard deviation is accumulated in float64, also for float32 data
+    sums = data_filt.std(axis=data_filt.ndim-1, keepdims=True, dtype=np.float64).astype(data_filt.dtype, copy=False)
+    data_filt = data_filt / sums
 
     return data_filt
 
@@ -285,15 +423,15 @@ def autocorr(x):
         result_tot.append(auto_corr)
     return np.array(result_tot)
 
-def autocovariance(x, scale='micro'):
+def autocovariance(x, scale='micro', config=config):
     x -= x.mean()
     auto_cor = scipy.signal.correlate(x, x)
     auto_cor = auto_cor / np.max(auto_cor)
     lags = scipy.signal.correlation_lags(len(x), len(x))
     if scale == 'micro':
-        lags = lags * step_size_channel_level * 1000
+        lags = lags * config.step_size_channel_level * 1000
     elif scale == 'macro':
-        lags = lags * step_size_link / 60
+        lags = lags * config.step_size_link / 60
 
     return auto_cor, lags
 
@@ -307,9 +445,93 @@ def data_to_time(data, data_list, time):
         time_list.append(t)
     return time_list
 
-def distribution_function(data, length, min, max, steps):
-    x = np.linspace(min, max, steps)
+def histogram_rows(data, steps):
+    # Row-wise equivalent of np.histogram(data[i], bins=steps) for a 2D array, binning all rows in one pass.
+    # Each row gets its own equal-width edges between its min and max. The bin index of every sample is offset by
+    # row * steps, such that a single np.bincount over the flattened indices gives the counts of all rows.
+    data = np.asarray(data, dtype=float)
+    rows = data.shape[0]
+    first_edge = data.min(axis=1)
+    last_edge  = data.max(axis=1)
+    if not (np.isfinite(first_edge).all() and np.isfinite(last_edge).all()):
+        raise ValueError('autodetected range of data is not finite')
+    equal = first_edge == last_edge
+    first_edge = np.where(equal, first_edge - 0.5, first_edge)
+    last_edge  = np.where(equal, last_edge + 0.5, last_edge)
+    edges = np.linspace(first_edge, last_edge, steps + 1, axis=1)
+
+    # Bin index from the uniform bin width, corrected with the edges themselves (same as np.histogram)
+    indices = ((data - first_edge[:, None]) / (last_edge - first_edge)[:, None] * steps).astype(np.intp)
+    indices[indices == steps] -= 1
+    indices[data < np.take_along_axis(edges, indices, axis=1)] -= 1
+    indices[(data >= np.take_along_axis(edges, indices + 1, axis=1)) & (indices != steps - 1)] += 1
+
+    indices += np.arange(rows)[:, None] * steps
+    counts = np.bincount(indices.ravel(), minlength=rows * steps).reshape(rows, steps)
+    return counts, edges
+
+def histogram_statistics(counts, edges, x):
+    # PDF, CDF, standard deviation and mean of each row of a histogram, directly from the counts.
+    # These follow the definitions of scipy.stats.rv_histogram: a piecewise constant PDF, a piecewise linear CDF
+    # and moments that are integrated over each bin.
+    rows, steps = counts.shape
+    widths = np.diff(edges, axis=1)
+    density = counts / np.sum(counts * widths, axis=1, keepdims=True)
+    cumulative = np.zeros((rows, steps + 1))
+    np.cumsum(density * widths, axis=1, out=cumulative[:, 1:])
+
+    # Position of x inside the edges of each row, same as np.searchsorted(edges[i], x, side='right').
+    # It is estimated from the uniform bin width and corrected with the edges themselves, padded with -inf and inf.
+    # All lookups are done on the flattened arrays with a row offset.
+    first_edge, last_edge = edges[:, :1], edges[:, -1:]
+    j = (x - first_edge) * (steps / (last_edge - first_edge))
+    np.floor(j, out=j)
+    np.clip(j + 1, 0, steps + 1, out=j)
+    j = j.astype(np.intp)
+    edges_padded = np.empty((rows, steps + 3))
+    edges_padded[:, 0]    = -np.inf
+    edges_padded[:, 1:-1] = edges
+    edges_padded[:, -1]   = np.inf
+    offset = np.arange(rows)[:, None] * (steps + 3)
+    j -= x < edges_padded.ravel()[j + offset]
+    j += x >= edges_padded.ravel()[j + offset + 1]
+
+    density_padded = np.zeros((rows, steps + 2))
+    density_padded[:, 1:-1] = density
+    pdf = density_padded.ravel()[j + np.arange(rows)[:, None] * (steps + 2)]
+
+    k = np.clip(j - 1, 0, steps - 1) + np.arange(rows)[:, None] * (steps + 1)
+    edges_left, edges_right = edges.ravel()[k], edges.ravel()[k + 1]
+    cdf_left, cdf_right = cumulative.ravel()[k], cumulative.ravel()[k + 1]
+    cdf = (cdf_right - cdf_left) / (edges_right - edges_left) * (x - edges_left) + cdf_left
+    cdf[x <= first_edge] = 0.0
+    cdf[x >= last_edge]  = 1.0
+
+    edges_left, edges_right = edges[:, :-1], edges[:, 1:]
+    moment_1 = np.sum(density * (edges_right * edges_right - edges_left * edges_left) / 2, axis=1)
+    moment_2 = np.sum(density * (edges_right * edges_right * edges_right - edges_left * edges_left * edges_left) / 3, axis=1)
+    std  = np.sqrt(moment_2 - moment_1**2)
+    mean = moment_1
+    return pdf, cdf, std, mean
+
+def histogram_function(data, length, steps):
+    # Counts and edges of all rows. With length=1 the data is flattened, as np.histogram does
     if length == 1:
+        data = np.reshape(data, (1, -1))
+    else:
+        data = np.reshape(data, (length, -1))
+    return histogram_rows(data, steps)
+
+def distribution_function(data, length, min, max, steps, engine='bincount'):
+    # Engine is 'bincount' (all rows binned in one pass) or 'scipy' (one np.histogram and rv_histogram per row)
+    x = np.linspace(min, max, steps)
+    if engine == 'bincount':
+        counts, edges = histogram_function(data, length, steps)
+        pdf, cdf, std, mean = histogram_statistics(counts, edges, x)
+        if length == 1:
+            pdf, cdf, std, mean = pdf[0], cdf[0], std[0], mean[0]
+
+    elif length == 1:
         hist = np.histogram(data, bins=steps)
         dist = rv_histogram(hist, density=True)
         pdf = dist.pdf(x)
@@ -332,9 +554,11 @@ def distribution_function(data, length, min, max, steps):
 
     return pdf, cdf, x, std, mean
 
-def pdf_function(data, length, min, max, steps):
+def pdf_function(data, length, min, max, steps, engine='bincount'):
     x = np.linspace(min, max, steps)
-    if length == 1:
+    if engine == 'bincount':
+        pdf = distribution_function(data, length, min, max, steps, engine=engine)[0]
+    elif length == 1:
         hist = np.histogram(data, bins=steps*1)
         rv = rv_histogram(hist, density=True)
         pdf = rv.pdf(x)
@@ -346,9 +570,11 @@ def pdf_function(data, length, min, max, steps):
             pdf[i] = rv.pdf(x)
     return pdf, x
 
-def cdf_function(data, length, min, max, steps):
+def cdf_function(data, length, min, max, steps, engine='bincount'):
     x = np.linspace(min, max, steps)
-    if length == 1:
+    if engine == 'bincount':
+        cdf = distribution_function(data, length, min, max, int(steps), engine=engine)[1]
+    elif length == 1:
         hist = np.histogram(data, bins=int(steps*1))
         dist = rv_histogram(hist, density=True)
         cdf = dist.cdf(x)
@@ -360,6 +586,110 @@ def cdf_function(data, length, min, max, steps):
             cdf[i] = dist.cdf(x)
     return cdf, x
 
+def interleave(data, spread, interleaver='circular'):
+    # Spreads every element of each row of data evenly over 'spread' elements, without shifting copies of the array.
+    # 'circular': element t becomes the mean of elements t-spread+1 ... t, wrapping around the end of the row
+    #             (equal to the mean of np.roll(data, i, axis=1) for i in range(spread))
+    # 'block'   : element t becomes the mean of its block of 'spread' consecutive elements (the last block can be shorter)
+    data = np.asarray(data, dtype=float)
+    samples = data.shape[-1]
+
+    if interleaver == 'block':
+        blocks = -(-samples // spread)
+        padded = np.zeros(data.shape[:-1] + (blocks * spread,))
+        padded[..., :samples] = data
+        block_sum = padded.reshape(data.shape[:-1] + (blocks, spread)).sum(axis=-1)
+        block_length = np.full(blocks, spread)
+        block_length[-1] = samples - (blocks - 1) * spread
+        return np.repeat(block_sum / block_length, spread, axis=-1)[..., :samples]
+
+    elif interleaver == 'circular':
+        # A window longer than the row contains every element (spread // samples) times, plus a shorter window
+        wraps, window = divmod(spread, samples)
+        total = wraps * data.sum(axis=-1, keepdims=True)
+        if window == 0:
+            return np.broadcast_to(total / spread, data.shape).copy()
+
+        # Window sums with block prefix and suffix sums (van Herk/Gil-Werman): the data (preceded by its last window-1
+        # elements) is cut in blocks of the window length, each window then covers the end of one block and the start
+        # of the next. Only additions are used, so small values next to large values keep their relative accuracy.
+        extended = samples + window - 1
+        blocks = -(-extended // window)
+        padded = np.zeros(data.shape[:-1] + (blocks * window,))
+        padded[..., :window - 1] = data[..., samples - window + 1:]
+        padded[..., window - 1:extended] = data
+        padded = padded.reshape(data.shape[:-1] + (blocks, window))
+        prefix = np.cumsum(padded, axis=-1).reshape(data.shape[:-1] + (-1,))
+        suffix = np.cumsum(padded[..., ::-1], axis=-1)[..., ::-1].reshape(data.shape[:-1] + (-1,))
+
+        start = np.arange(samples)
+        window_sum = suffix[..., start]
+        partial = start % window != 0
+        window_sum[..., partial] += prefix[..., start[partial] + window - 1]
+        return (total + window_sum) / spread
+
+    else:
+        raise ValueError("interleaver must be 'circular' or 'block'")
+
+def RS_coded_BER_log(BER, N, K, symbol_length):
+    # Natural logarithm of the Reed-Solomon coded BER (CCSDS Historical Document, 2006, CH.5.5, EQ.3-4), same sum as
+    # LCT.coding. Every binomial term is computed in the log domain (gammaln, log1p) and summed with logsumexp,
+    # such that BER values where the coded BER underflows (< 1e-308) still give a finite result.
+    BER = np.asarray(BER, dtype=float)
+    parity_bits = int((N - K) / 2)
+    k_values = np.arange(parity_bits, N - 1)
+    log_binom = gammaln(N) - gammaln(k_values + 1) - gammaln(N - k_values)
+
+    log_1_SER = symbol_length * np.log1p(-BER)                                                                          # log(1 - SER)
+    log_SER = np.log(-np.expm1(log_1_SER))                                                                              # log(SER)
+    log_terms = log_binom + np.multiply.outer(log_SER, k_values) + np.multiply.outer(log_1_SER, N - k_values - 1)
+    return (symbol_length - 1) * np.log(2) - np.log(N) + log_SER + logsumexp(log_terms, axis=-1)
+
+@lru_cache
+def RS_coding_table(N, K, symbol_length, BER_min=1.0E-60, steps=20000):
+    # Log-log table of BER --> coded BER for one code (N, K, symbol_length), built once and reused for every call.
+    # The grid runs from BER_min to 0.5, the maximum BER of the modulation schemes. Below BER=1e-6 the coded BER is
+    # close to a power law (a straight line in log-log), so most grid points are placed between 1e-6 and 0.5.
+    log_BER = np.concatenate((np.linspace(np.log10(BER_min), -6.0, steps // 4, endpoint=False),
+                              np.linspace(-6.0, np.log10(0.5), steps)))
+    log_BER_coded = RS_coded_BER_log(10**log_BER, N, K, symbol_length) / np.log(10)
+    return log_BER, log_BER_coded
+
+def RS_coding_interp(BER, N, K, symbol_length):
+    # Coded BER from the table of (N, K, symbol_length), interpolated linearly in log-log space.
+    # Below the table, the coded BER is extrapolated with the slope of the first segment (the coded BER follows a power law
+    # of the BER there). Above the table (BER > 0.5), the last value is used.
+    with np.errstate(divide='ignore'):
+        x = np.log10(BER)
+    return 10**RS_coding_interp_log(x, N, K, symbol_length)
+
+def RS_coding_interp_log(x, N, K, symbol_length):
+    # Same as RS_coding_interp, with log10(BER) as input and log10(coded BER) as output
+    x = np.asarray(x, dtype=float)
+    log_BER, log_BER_coded = RS_coding_table(N, K, symbol_length)
+    y = np.interp(x, log_BER, log_BER_coded)
+    below = x < log_BER[0]
+    slope = (log_BER_coded[1] - log_BER_coded[0]) / (log_BER[1] - log_BER[0])
+    return np.where(below, log_BER_coded[0] + slope * (x - log_BER[0]), y)
+
+def log_erfc(x):
+    # Natural log of erfc(x), without underflow for large x: log(erfc(x)) = log(2) + log(ndtr(-sqrt(2) * x))
+    return np.log(2) + log_ndtr(-np.sqrt(2) * x)
+
+def log_BER_func(Q, M_PPM=32, modulation="OOK-NRZ"):
+    # log10 of the BER of terminal_properties.BER_func, computed in log space (no underflow and no limit at 1e-50)
+    if modulation == "OOK-NRZ" or modulation == "DPSK":
+        log_BER = np.log(1/2) + log_erfc(Q / np.sqrt(2))
+    elif modulation == "2-PPM" or modulation == "2PolSK":
+        log_BER = np.log(1/2) - 1/2 * Q**2
+    elif modulation == "M-PPM":
+        log_BER = np.log(M_PPM/4) + log_erfc(1/2 * Q**2 * np.sqrt(M_PPM*np.log2(M_PPM)))
+    elif modulation == "BPSK":
+        log_BER = np.log(1/2) + log_erfc(Q)
+    elif modulation == "QPSK":
+        log_BER = log_erfc(Q)
+    return log_BER / np.log(10)
+
 def shot_noise(Sn, R, P, Be, eff_quantum):
     noise_sh = 4 * Sn * R ** 2 * P * Be / eff_quantum
     return noise_sh
@@ -375,12 +705,12 @@ def background_noise(Sn, R, I, D, delta_wavelength, FOV, Be):
 def BER_avg_func(pdf_x, pdf_y, LCT, total=False):
     # Pr = P_r_0[:, None] * pdf_h_x
     Pr = dBm2W(pdf_x)
-    noise_sh, noise_th, noise_bg, noise_beat = LCT.noise(P_r=Pr, I_sun=I_sun)
+    noise_sh, noise_th, noise_bg, noise_beat = LCT.noise(P_r=Pr, I_sun=LCT.config.I_sun)
     SNR, Q = LCT.SNR_func(P_r=Pr,
-                          detection=detection,
+                          detection=LCT.config.detection,
                           noise_sh=noise_sh, noise_th=noise_th,
                           noise_bg=noise_bg,noise_beat=noise_beat)
-    BER = LCT.BER_func(Q=Q, modulation=modulation)
+    BER = LCT.BER_func(Q=Q, modulation=LCT.config.modulation)
 
     if total == False:
         BER_avg = np.trapz(pdf_y * BER, x=pdf_x, axis=1)
@@ -389,34 +719,39 @@ def BER_avg_func(pdf_x, pdf_y, LCT, total=False):
 
     return BER_avg
 
-def penalty(P_r, desired_frac_fade_time):
+def penalty(P_r, desired_frac_fade_time, method='quantile'):
     # This functions computes a power penalty, based on the method of Giggenbach.
+    # The power threshold P_min is the power below which the signal is for a fraction 'desired_frac_fade_time' of the time.
+    # Options for P_min are:
+    #   (1) method='quantile': Sample quantile of P_r (with np.partition), computed for all macro-scale steps at once
+    #   (2) method='grid'    : Value on a grid with the closest fractional fade time (legacy method).
+    #                          Grid is -100 to -10 dBm with steps of 0.1 dB for a 2D P_r and 1000 steps between min and max for a 1D P_r
+    P_r_2D = np.atleast_2d(P_r)
+    samples = P_r_2D.shape[1]
+
+    if method == 'quantile':
+        k = min(int(np.round(desired_frac_fade_time * samples)), samples - 1)
+        closest_P_min = np.partition(P_r_2D, k, axis=1)[:, k]
+
+    elif method == 'grid':
+        # The fractional fade time for each grid value is counted with a binary search in the sorted P_r
+        P_r_sorted = np.sort(P_r_2D, axis=1)
+        closest_P_min = np.empty(len(P_r_2D))
+        if P_r.ndim > 1:
+            # Converted value by value (as the legacy loop did), such that the grid is identical to the last bit
+            P_min_range = np.array([dBm2W(P_min) for P_min in np.arange(-100.0, -10.0, 0.1)])
+        else:
+            P_min_range = np.linspace((P_r).min(), (P_r).max(), 1000)
+        for i in range(len(P_r_2D)):
+            frac_fade_time = np.searchsorted(P_r_sorted[i], P_min_range, side='left') / samples
+            # The first grid value with the closest fractional fade time to the desired value
+            closest_P_min[i] = P_min_range[np.argmin(abs(frac_fade_time - desired_frac_fade_time))]
 
+    h_penalty = (closest_P_min / P_r_2D.mean(axis=1)).clip(min=0.0, max=1.0)
     if P_r.ndim > 1:
-        closest_P_min = np.empty(len(P_r))
-        for i in range(len(P_r)):
-            closest_frac_fade_time = np.inf
-            # P_min_range = np.arange(W2dBm(P_r[i].min()), W2dBm(P_r[i].max()), 0.5)
-            P_min_range = np.arange(-100.0, -10.0, 0.1)
-            for P_min in P_min_range:
-                P_min = dBm2W(P_min)
-                frac_fade_time = np.count_nonzero(P_r[i] < P_min) / len(P_r[i])
-                # Check if the current fractional fade time is closer to the desired value than the previous closest value
-                if abs(frac_fade_time - desired_frac_fade_time) < abs(closest_frac_fade_time - desired_frac_fade_time):
-                    closest_frac_fade_time = frac_fade_time
-                    closest_P_min[i] = P_min
+        return h_penalty
     else:
-        closest_frac_fade_time = np.inf
-        P_min_range = np.linspace((P_r).min(), (P_r).max(), 1000)
-        for P_min in P_min_range:
-            frac_fade_time = np.count_nonzero(P_r < P_min) / len(P_r)
-            # Check if the current fractional fade time is closer to the desired value than the previous closest value
-            if abs(frac_fade_time - desired_frac_fade_time) < abs(closest_frac_fade_time - desired_frac_fade_time):
-                closest_frac_fade_time = frac_fade_time
-                closest_P_min = P_min
-
-    h_penalty = (closest_P_min / P_r.mean(axis=1)).clip(min=0.0, max=1.0)
-    return h_penalty
+        return h_penalty[0]
 
 
 def get_difference_wrt_kepler_orbit(
@@ -3,11 +3,17 @@ import numpy as np
 from datetime import datetime
 import time
 import warnings
+from dataclasses import dataclass, fields, replace
+from typing import Optional, Union
 from matplotlib import pyplot as plt
 
 import warnings
 warnings.filterwarnings("ignore")
 
+# Other modules only import the physical constants and the configuration object from this file (see CONFIGURATION)
+__all__ = ['R_earth', 'speed_of_light', 'q', 'h', 'k', 'mu_earth', 't_day', 'Omega_t', 'omega_earth',
+           'link_parameters', 'MissionConfig', 'config']
+
 
 #----------------------------------------------------------------------------------------------------
 #-------------------------------------------------CONSTANTS------------------------------------------
@@ -36,12 +42,27 @@ step_size_link = 5.0                              # Step size at which the macro
 step_size_SC = 7.0                                # Numerical propagation time step of all SPACECRAFT in the constellation
 step_size_AC = step_size_link                     # Numerical propagation time step of the AIRCRAFT
 integrator = "Runge Kutta 4"
+geometry_engine = 'batched'                       # 'batched' (all satellites in one broadcast pass) or 'loop' (one satellite at a time)
+geometry_block_size = 64                          # Number of satellites per broadcast pass of the batched geometry engine ('all' or integer)
+visibility_filter = 'yes'                         # 'yes': the batched geometry engine only computes the geometry of the samples near visible passes (NaN otherwise)
+visibility_margin = np.deg2rad(5.0)               # Margin below elevation_min of the visibility filter (in rad)
+visibility_dilation = 2                           # Number of time steps added on both sides of each pass (in addition to the acquisition steps)
 
 # Set-up of Micro-scale model
 #----------------------------
 step_size_channel_level = 1.0E-4                  # Sample size for the Monte Carlo time simulation of the micro-scale effects. Default is 0.1ms resolution
 interval_channel_level = 5.0                      # Interval of the Monte Carlo time simulation. Default is 10s (verified for stability)
 frequency_filter_order = 2
+filter_engine = 'sos'                             # 'sos' (batched second-order sections), 'fft' (spectral synthesis) or 'gust' (filtfilt with Gustafsson's method for each macro-scale step)
+filter_frequency_resolution = 1.0                 # Turbulence cut-off frequencies are rounded to this resolution (Hz), such that macro-scale steps can share one filter
+precision = 'double'                              # 'double' (float64) or 'mixed' (noise generation, filtering, redistribution and loss projections in float32, P_r and BER in float64)
+noise_precision = 'float32'                       # With precision='mixed': 'float32' (noise drawn in float32) or 'float64' (drawn in float64 and rounded, same random stream as 'double')
+pointing_engine = 'table'                         # 'table' (Airy projection with a lookup table per D_r and k_number) or 'exact' (Bessel functions for each sample)
+pointing_tolerance = 1.0E-6                       # Guaranteed maximum error of the Airy projection table (absolute, in the loss fraction)
+chunk_size = 'all'                                # Number of macro-scale steps that are simulated at once in the micro-scale model ('all' or integer)
+                                                  # With an integer, the micro-scale model is streamed in chunks and memory is bounded by the chunk size
+workers = 1                                       # Number of processes that simulate the chunks of the micro-scale model (only with an integer chunk_size)
+seed = None                                       # Seed of all Monte Carlo simulations (integer). None gives a different seed for each run
 
 
 analysis    = 'total' # 'total' or 'time step specific'
@@ -178,6 +199,8 @@ elevation_min = np.deg2rad(0.0)                 # minimum elevation angle betwee
 elevation_thres = np.deg2rad(5.0)              # maximum elevation angle between aircraft and spacecraft for start of an active link (in rad)
 zenith_max = np.pi/2 - elevation_min            # minimum zenith angle between aircraft and spacecraft for start of an active link (in rad)
 acquisition_time = 50.0  # seconds
+routing_engine = 'events'                       # 'events' (event-driven routing over the handovers) or 'loop' (evaluates all satellites at each time step)
+routing_policy = 'max elevation'                # Link selection of the 'events' engine: 'max elevation', 'longest pass', 'min handovers' or 'least slew' (see Routing_network)
 
 
 
@@ -200,18 +223,34 @@ n_index = 1.002                                 # Refractive index of atmosphere
 #----------------------------
 margin_buffer = 3.0 # dB
 desired_frac_fade_time = 0.01
+penalty_method = 'quantile'                      # 'quantile' (sample quantile of P_r) or 'grid' (legacy: closest value on a 0.1 dB grid)
 BER_thres = [1.0E-9, 1.0E-6, 1.0E-3]            # Minimum required Bit Error Rate, defined for an acceptable link
+error_frame_length = None                       # Frame length (in seconds) of the optional error count time series of each macro step (None: no time series)
+bit_engine = 'fused'                            # 'fused' (noise, SNR and BER in one pass, with numexpr if installed) or 'separate' (noise, SNR and BER as separate steps)
+BER_domain = 'log'                              # 'log' (log10 BER from log-erfc, no underflow below 1e-50) or 'linear' (BER from erfc, log10 taken for the distributions)
 coding = 'no' # 'yes' or 'no'
 # if coding = 'yes'
 latency_interleaving = 1.0E-1                   # Interleaver length of coded bitframes (in seconds)
+interleaver = 'circular'                        # 'circular' (sliding window that wraps around the micro-scale interval) or 'block' (consecutive frames of one interleaver length)
 N, K = 255, 223                                 # N is the total number of symbols per RS codeword, K is the total number of information bits per RS codeword
 symbol_length = 8                               # Symbol length is the total number of bits within one symbol. The default is set to 8 bits (1 byte)
+coding_engine = 'table'                         # 'table' (log-log interpolation table of BER --> coded BER) or 'binomial' (binomial sum for each sample)
+sensitivity_engine = 'table'                    # 'table' (interpolation table of coded BER --> Pr) or 'exact' (sensitivity equations for each sample)
+coding_gain = 'samples'                         # 'samples' (coding gain and coded Pr for each micro-scale sample) or 'mean' (only their mean for each macro step)
 
 
 # Turbulence model choices
 #----------------------------
 turbulence_model="Hufnagel-Valley"
 wind_model_type = "Bufton"
+turbulence_integration = 'gauss'                 # 'gauss' (composite Gauss-Legendre over the turbulent layer, h_AC to turbulence_height_max) or 'trapz' (10,000-point grid from h_AC to h_SC)
+turbulence_quadrature_nodes = 14                 # Number of Gauss-Legendre nodes per panel (7 panels). More nodes give a more accurate integral
+turbulence_height_max = 60.0E3                   # Top of the turbulent layer (m) for turbulence_integration='gauss'
+turbulence_moments = 'fused'                     # 'fused' (Cn^2 once, all weighted integrals of the link direction in one sweep) or 'separate' (one integral per method)
+turbulence_cache = 'no'                          # 'yes' (turbulence parameters of each macro step from an LRU cache, keyed by the quantised geometry) or 'no'
+turbulence_cache_size = 100000                   # Maximum number of cached geometries (the least recently used are evicted)
+turbulence_cache_resolution = [1.0, 100.0, 1.0E-5, 10.0, 1.0E-6, 0.1]   # Quantisation of h_AC (m), h_SC (m), zenith (rad), range (m), slew rate (rad/s), speed AC (m/s)
+turbulence_cache_file = None                     # Pickle file from which the cache is loaded and to which it is saved, such that it persists across runs (None: memory only)
 turbulence_freq_lowpass = 1000.0                 # Defined cut-off frequency of refractive index fluctuations, estimated at 1 ms intervals. REF: Giggenbach 2018, PVGeT
 jitter_freq_lowpass = 100.0                      # Defined cut-off frequency of platform microvibrations. REF: Zephyr technical note
 jitter_freq2 = [100.0, 300.0]                    # Defined frequency peak of platform microvibrations. REF: Zephyr technical note
@@ -239,84 +278,286 @@ dist_pointing = "rayleigh"                        # Distribution of the Monte Ca
 # Here, the link parameters are sorted in uplink parameters and downlink parameters.
 # These will be used in the simulation of dimension 1 and dimension 2
 
-if link == "up":
-    P_t                     = P_ac
-    wavelength              = wavelength_ac
-    data_rate               = data_rate_ac
-    clipping_ratio          = clipping_ratio_ac
-    obscuration_ratio       = obscuration_ratio_ac
-    eff_transmission_t      = eff_transmission_ac
-    eff_transmission_r      = eff_transmission_sc
-    WFE_static_t            = WFE_static_ac
-    WFE_static_r            = WFE_static_sc
-    M2_defocus              = M2_defocus_ac
-    M2_defocus_acq          = M2_defocus_acquisition_ac
-    h_splitting             = h_splitting_sc
-    D_t                     = D_ac
-    D_r                     = D_sc
-    angle_pe_t              = angle_pe_ac
-    angle_pe_r              = angle_pe_sc
-    std_pj_t                = std_pj_ac
-    std_pj_r                = std_pj_sc
-    eff_quantum             = eff_quantum_sc
-    T_s                     = T_s_sc
-    FOV_t                   = FOV_ac
-    FOV_r                   = FOV_sc
-    detection               = detection_sc
-    modulation              = mod_sc
-    M                       = M_sc
-    noise_factor            = F_sc
-    BW                      = BW_sc
-    Be                      = Be_sc
-    delta_wavelength        = delta_wavelength_sc
-    R_L                     = R_L_sc
-    sensitivity_acquisition = sensitivity_acquisition_sc
-    focal_length            = focal_length_sc
-
-elif link == "down":
-    P_t                     = P_sc
-    data_rate               = data_rate_sc
-    wavelength              = wavelength_sc
-    clipping_ratio          = clipping_ratio_sc
-    obscuration_ratio       = obscuration_ratio_sc
-    eff_transmission_t      = eff_transmission_sc
-    eff_transmission_r      = eff_transmission_ac
-    WFE_static_t            = WFE_static_sc
-    WFE_static_r            = WFE_static_ac
-    M2_defocus              = M2_defocus_sc
-    M2_defocus_acq          = M2_defocus_acquisition_sc
-    h_splitting             = h_splitting_ac
-    D_t                     = D_sc
-    D_r                     = D_ac
-    angle_pe_t              = angle_pe_sc
-    angle_pe_r              = angle_pe_ac
-    std_pj_t                = std_pj_sc
-    std_pj_r                = std_pj_ac
-    eff_quantum             = eff_quantum_ac
-    T_s                     = T_s_ac
-    FOV_t                   = FOV_sc
-    FOV_r                   = FOV_ac
-    detection               = detection_ac
-    modulation              = mod_ac
-    M                       = M_ac
-    noise_factor            = F_ac
-    BW                      = BW_ac
-    Be                      = Be_ac
-    delta_wavelength        = delta_wavelength_ac
-    R_L                     = R_L_sc
-    sensitivity_acquisition = sensitivity_acquisition_ac
-    focal_length            = focal_length_ac
+def link_parameters(link):
+    if link == "up":
+        return dict(
+            P_t                     = P_ac,
+            wavelength              = wavelength_ac,
+            data_rate               = data_rate_ac,
+            clipping_ratio          = clipping_ratio_ac,
+            obscuration_ratio       = obscuration_ratio_ac,
+            eff_transmission_t      = eff_transmission_ac,
+            eff_transmission_r      = eff_transmission_sc,
+            WFE_static_t            = WFE_static_ac,
+            WFE_static_r            = WFE_static_sc,
+            M2_defocus              = M2_defocus_ac,
+            M2_defocus_acq          = M2_defocus_acquisition_ac,
+            h_splitting             = h_splitting_sc,
+            D_t                     = D_ac,
+            D_r                     = D_sc,
+            angle_pe_t              = angle_pe_ac,
+            angle_pe_r              = angle_pe_sc,
+            std_pj_t                = std_pj_ac,
+            std_pj_r                = std_pj_sc,
+            eff_quantum             = eff_quantum_sc,
+            T_s                     = T_s_sc,
+            FOV_t                   = FOV_ac,
+            FOV_r                   = FOV_sc,
+            detection               = detection_sc,
+            modulation              = mod_sc,
+            M                       = M_sc,
+            noise_factor            = F_sc,
+            BW                      = BW_sc,
+            Be                      = Be_sc,
+            delta_wavelength        = delta_wavelength_sc,
+            R_L                     = R_L_sc,
+            sensitivity_acquisition = sensitivity_acquisition_sc,
+            focal_length            = focal_length_sc,
+        )
+
+    elif link == "down":
+        return dict(
+            P_t                     = P_sc,
+            data_rate               = data_rate_sc,
+            wavelength              = wavelength_sc,
+            clipping_ratio          = clipping_ratio_sc,
+            obscuration_ratio       = obscuration_ratio_sc,
+            eff_transmission_t      = eff_transmission_sc,
+            eff_transmission_r      = eff_transmission_ac,
+            WFE_static_t            = WFE_static_sc,
+            WFE_static_r            = WFE_static_ac,
+            M2_defocus              = M2_defocus_sc,
+            M2_defocus_acq          = M2_defocus_acquisition_sc,
+            h_splitting             = h_splitting_ac,
+            D_t                     = D_sc,
+            D_r                     = D_ac,
+            angle_pe_t              = angle_pe_sc,
+            angle_pe_r              = angle_pe_ac,
+            std_pj_t                = std_pj_sc,
+            std_pj_r                = std_pj_ac,
+            eff_quantum             = eff_quantum_ac,
+            T_s                     = T_s_ac,
+            FOV_t                   = FOV_sc,
+            FOV_r                   = FOV_ac,
+            detection               = detection_ac,
+            modulation              = mod_ac,
+            M                       = M_ac,
+            noise_factor            = F_ac,
+            BW                      = BW_ac,
+            Be                      = Be_ac,
+            delta_wavelength        = delta_wavelength_ac,
+            R_L                     = R_L_sc,
+            sensitivity_acquisition = sensitivity_acquisition_ac,
+            focal_length            = focal_length_ac,
+        )
 
 
 #------------------------------------------------------------------------
-#----------------------------DEPENDENT-PARAMETERS------------------------
+#-----------------------------CONFIGURATION------------------------------
 #------------------------------------------------------------------------
 
-v           = speed_of_light / wavelength         # frequency of laser (in Hz)                                                  REF: Wikipedia
-k_number  = 2 * np.pi / wavelength                # wave number of laser (in rad/m)                                             REF: Wikipedia
-w0        = D_t / clipping_ratio / 2              # Beam waist (1/e^2)                                                          REF: R.Saathof AE4880 slides I, P.19
-angle_div = wavelength / ( np.pi * w0)            # Diffraction limited divergence angle during communication                   REF: R.Saathof AE4880 slides I, P.19
-R         = eff_quantum * q / (h * v)             # Responsivity of the detector (conversion from power to electrica current)   REF: Wikipedia
-orbital_period = 2 * np.pi * np.sqrt((R_earth+h_SC)**3 / mu_earth)
-v_zenith  = 2 * np.pi * (R_earth+h_SC) / orbital_period
-slew_rate_zenith = np.rad2deg(v_zenith / (h_SC - h_AC))
+# All parameters above are collected in one immutable (and hashable) configuration object.
+# This object is passed to all classes and functions of the model, instead of reading the parameters of this file.
+# A configuration for the other link direction, or with different parameters, is created with
+#   MissionConfig.from_input(link='down', D_r=0.1)   or   config.replace(data_rate=10.0E9)
+
+@dataclass(frozen=True)
+class MissionConfig:
+    # Set-up of Macro-scale model
+    start_time: float
+    end_time: float
+    step_size_link: float
+    step_size_SC: float
+    step_size_AC: float
+    integrator: str
+    geometry_engine: str
+    geometry_block_size: Union[int, str]
+    visibility_filter: str
+    visibility_margin: float
+    visibility_dilation: int
+    # Set-up of Micro-scale model
+    step_size_channel_level: float
+    interval_channel_level: float
+    frequency_filter_order: int
+    filter_engine: str
+    filter_frequency_resolution: float
+    precision: str
+    noise_precision: str
+    pointing_engine: str
+    pointing_tolerance: float
+    chunk_size: Union[int, str]
+    workers: int
+    seed: Optional[int]
+    analysis: str
+    link_number: str
+    ac_LCT: str
+    link: str
+
+    # Uplink/downlink LCT & laser parameters (see link_parameters)
+    P_t: float
+    wavelength: float
+    data_rate: float
+    clipping_ratio: float
+    obscuration_ratio: float
+    eff_transmission_t: float
+    eff_transmission_r: float
+    WFE_static_t: float
+    WFE_static_r: float
+    M2_defocus: float
+    M2_defocus_acq: float
+    h_splitting: float
+    D_t: float
+    D_r: float
+    angle_pe_t: float
+    angle_pe_r: float
+    std_pj_t: float
+    std_pj_r: float
+    eff_quantum: float
+    T_s: float
+    FOV_t: float
+    FOV_r: float
+    detection: str
+    modulation: str
+    M: float
+    noise_factor: float
+    BW: float
+    Be: float
+    delta_wavelength: float
+    R_L: float
+    sensitivity_acquisition: float
+    focal_length: float
+
+    # Aircraft parameters
+    method_AC: str
+    h_AC: float
+    vel_AC: tuple
+    lat_init_AC: float
+    lon_init_AC: float
+    aircraft_filename_load: str
+    aircraft_filename_save: str
+
+    # Constellation parameters
+    constellation_data: str
+    method_SC: str
+    SC_filename_load: str
+    SC_filename_save: str
+    constellation_type: str
+    h_SC: float
+    inc_SC: float
+    number_of_planes: int
+    number_sats_per_plane: int
+    TLE_filename_load: str
+
+    # Link selection parameters
+    elevation_min: float
+    elevation_thres: float
+    acquisition_time: float
+    routing_engine: str
+    routing_policy: str
+
+    # Atmospheric parameters
+    scale_height: float
+    att_coeff: float
+    I_sun: float
+    I_sky: float
+    n_index: float
+
+    # LCT model choices
+    margin_buffer: float
+    desired_frac_fade_time: float
+    penalty_method: str
+    BER_thres: tuple
+    error_frame_length: Optional[float]
+    bit_engine: str
+    BER_domain: str
+    coding: str
+    latency_interleaving: float
+    interleaver: str
+    N: int
+    K: int
+    symbol_length: int
+    coding_engine: str
+    sensitivity_engine: str
+    coding_gain: str
+
+    # Turbulence model choices
+    turbulence_model: str
+    wind_model_type: str
+    turbulence_integration: str
+    turbulence_quadrature_nodes: int
+    turbulence_height_max: float
+    turbulence_moments: str
+    turbulence_cache: str
+    turbulence_cache_size: int
+    turbulence_cache_resolution: tuple
+    turbulence_cache_file: Optional[str]
+    turbulence_freq_lowpass: float
+    jitter_freq_lowpass: float
+    jitter_freq2: tuple
+    jitter_freq1: tuple
+
+    # Atmospheric model choices
+    method_att: str
+    method_clouds: str
+
+    # Distributions
+    dist_scintillation: str
+    dist_beam_wander: str
+    dist_AoA: str
+    dist_pointing: str
+
+    @classmethod
+    def from_input(cls, link=link, **changes):
+        # Collects the parameters of this file, with the LCT parameters of the selected link ('up' or 'down')
+        parameters = {f.name: globals()[f.name] for f in fields(cls) if f.name in globals()}
+        parameters.update(link_parameters(link))
+        parameters.update(link=link, **changes)
+        # Lists and arrays are stored as tuples, such that the configuration is hashable
+        parameters = {key: tuple(value) if isinstance(value, (list, np.ndarray)) else value
+                      for key, value in parameters.items()}
+        return cls(**parameters)
+
+    def replace(self, **changes):
+        # Returns a copy with changed parameters. Changing 'link' also selects the LCT parameters of the other link
+        if 'link' in changes and changes['link'] != self.link:
+            changes = {**link_parameters(changes['link']), **changes}
+        return replace(self, **changes)
+
+    #------------------------------------------------------------------------
+    #----------------------------DEPENDENT-PARAMETERS------------------------
+    #------------------------------------------------------------------------
+    @property
+    def v(self):
+        return speed_of_light / self.wavelength                     # frequency of laser (in Hz)                                                  REF: Wikipedia
+    @property
+    def k_number(self):
+        return 2 * np.pi / self.wavelength                          # wave number of laser (in rad/m)                                             REF: Wikipedia
+    @property
+    def w0(self):
+        return self.D_t / self.clipping_ratio / 2                   # Beam waist (1/e^2)                                                          REF: R.Saathof AE4880 slides I, P.19
+    @property
+    def angle_div(self):
+        return self.wavelength / ( np.pi * self.w0)                 # Diffraction limited divergence angle during communication                   REF: R.Saathof AE4880 slides I, P.19
+    @property
+    def R(self):
+        return self.eff_quantum * q / (h * self.v)                  # Responsivity of the detector (conversion from power to electrica current)   REF: Wikipedia
+    @property
+    def speed_AC(self):
+        return np.sqrt(self.vel_AC[0]**2 +
+                       self.vel_AC[1]**2 +
+                       self.vel_AC[2]**2)                           # speed magnitude of aircraft (in m/sec)
+    @property
+    def zenith_max(self):
+        return np.pi/2 - self.elevation_min                         # minimum zenith angle between aircraft and spacecraft for start of an active link (in rad)
+    @property
+    def orbital_period(self):
+        return 2 * np.pi * np.sqrt((R_earth+self.h_SC)**3 / mu_earth)
+    @property
+    def v_zenith(self):
+        return 2 * np.pi * (R_earth+self.h_SC) / self.orbital_period
+    @property
+    def slew_rate_zenith(self):
+        return np.rad2deg(self.v_zenith / (self.h_SC - self.h_AC))
+
+
+config = MissionConfig.from_input()
@@ -0,0 +1,425 @@
+import numpy as np
+import copy
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from scipy.stats import rv_histogram
+
+# Import input parameters and helper functions
+from input import *
+from helper_functions import *
+
+# Import micro-scale models
+from channel_level import channel_level
+from bit_level import bit_level
+
+
+#------------------------------------------------------------------------
+#---------------------------MICRO-SCALE-MODEL----------------------------
+#------------------------------------------------------------------------
+# The micro-scale model consists of the channel level and the bit level, simulated for each macro-scale time step.
+# All micro-scale outputs are arrays of size (macro-scale steps x micro-scale samples).
+# With 'chunk_size' (see input.py), the micro-scale model is simulated for a chunk of macro-scale steps at once.
+# Each chunk is directly reduced to the statistics that are used at mission level:
+#   (1) Averages over the micro-scale interval
+#   (2) Fade statistics
+#   (3) Local distributions (mean and std for all steps, pdf and cdf only for the plot indices)
+#   (4) Global distributions, which are accumulated in a histogram
+# Full micro-scale time series are only kept for the plot indices.
+
+def channel_stage(config, t_micro, link, indices, LCT, turb, P_r_0, links, micro_scale='yes', seed=None, macro_steps=None):
+    # Here, the channel level is simulated, losses and Pr as output
+    P_r, P_r_perfect_pointing, PPB, elevation_angles, losses, angles = \
+        channel_level(t=t_micro,
+                      link_budget=link,
+                      plot_indices=indices,
+                      LCT=LCT, turb=turb,
+                      P_r_0=P_r_0,
+                      ranges=links['ranges'],
+                      angle_div=link.angle_div,
+                      elevation_angles=links['elevation'],
+                      samples=len(t_micro),
+                      turb_cutoff_frequency=config.turbulence_freq_lowpass,
+                      micro_scale=micro_scale,
+                      seed=seed,
+                      macro_steps=macro_steps,
+                      config=config)
+    channel = {
+        'P_r': P_r,
+        'P_r perfect pointing': P_r_perfect_pointing,
+        'PPB': PPB,
+        'h_tot': losses[0],
+        'h_scint': losses[1],
+        'h_RX': losses[2],
+        'h_TX': losses[3],
+        'h_bw': losses[4],
+        'h_aoa': losses[5],
+        'h_pj_t': losses[6],
+        'h_pj_r': losses[7],
+        'h_tot no pointing errors': losses[-1],
+        'r_TX': angles[0] * links['ranges'][:, None],
+        'r_RX': angles[1] * links['ranges'][:, None],
+    }
+    return channel
+
+def bit_stage(config, t_micro, indices, LCT, P_r_0, channel, links, micro_scale='yes'):
+    # Here, the bit level is simulated, SNR, BER and throughput as output
+    output = bit_level(LCT=LCT,
+                       t=t_micro,
+                       plot_indices=indices,
+                       samples=len(t_micro),
+                       P_r_0=P_r_0,
+                       P_r=channel['P_r'],
+                       elevation_angles=links['elevation'],
+                       h_tot=channel['h_tot'],
+                       micro_scale=micro_scale,
+                       config=config)
+    # The optional outputs follow the fixed outputs, in the order of bit_level
+    if config.coding == 'yes':
+        keys = ['SNR', 'BER', 'throughput', 'BER coded', 'throughput coded', 'P_r coded', 'G coding']
+        if config.error_frame_length is not None:
+            keys += ['errors per frame', 'coded errors per frame']
+        if config.BER_domain == 'log':
+            keys += ['log BER', 'log BER coded']
+    else:
+        keys = ['SNR', 'BER', 'throughput']
+        if config.error_frame_length is not None:
+            keys += ['errors per frame']
+        if config.BER_domain == 'log':
+            keys += ['log BER']
+    bit = dict(zip(keys, output))
+    return bit
+
+#------------------------------------------------------------------------
+#----------------------------FADE-STATISTICS-----------------------------
+#------------------------------------------------------------------------
+def fade_statistics_stage(config, LCT, channel, samples):
+    P_r = channel['P_r']
+    P_r_perfect_pointing = channel['P_r perfect pointing']
+
+    number_of_fades = np.sum((P_r[:, 1:] < LCT.P_r_thres[1]) & (P_r[:, :-1] > LCT.P_r_thres[1]), axis=1)
+    fractional_fade_time = np.count_nonzero((P_r < LCT.P_r_thres[1]), axis=1) / samples
+    mean_fade_time = fractional_fade_time / number_of_fades * config.interval_channel_level
+
+    # Power penalty in order to include a required fade fraction.
+    # REF: Giggenbach (2008), Fading-loss assessment
+    h_penalty   = penalty(P_r=P_r, desired_frac_fade_time=config.desired_frac_fade_time, method=config.penalty_method)
+    h_penalty_perfect_pointing   = penalty(P_r=P_r_perfect_pointing, desired_frac_fade_time=config.desired_frac_fade_time, method=config.penalty_method)
+    P_r_penalty_perfect_pointing = P_r_perfect_pointing.mean(axis=1) * h_penalty_perfect_pointing
+
+    return {'number of fades': number_of_fades,
+            'fractional fade time': fractional_fade_time,
+            'mean fade time': mean_fade_time,
+            'h penalty': h_penalty,
+            'h penalty perfect pointing': h_penalty_perfect_pointing,
+            'P_r penalty perfect pointing': P_r_penalty_perfect_pointing}
+
+#------------------------------------------------------------------------
+#------------------------------DISTRIBUTIONS-----------------------------
+#------------------------------------------------------------------------
+def log_BER(bit, key):
+    # log10 of bit[key] ('BER' or 'BER coded'). With BER_domain='log', the log10 BER of the bit level is used (no extra log10 pass).
+    # The distributions keep the lower limit of 1e-50 of the linear BER.
+    if 'log ' + key in bit:
+        return np.maximum(bit['log ' + key], -50.0)
+    return np.log10(bit[key])
+
+def local_distributions_stage(config, channel, bit, rows):
+    # Local distributions for each macro-scale time step (over micro-scale interval)
+    distributions = {}
+    distributions['P_r'] = distribution_function(W2dBm(channel['P_r']),rows,min=-60.0,max=-20.0,steps=1000)
+    distributions['BER'] = distribution_function(log_BER(bit, 'BER'),rows,min=-30.0,max=0.0,steps=10000)
+    if config.coding == 'yes':
+        distributions['BER coded'] = distribution_function(log_BER(bit, 'BER coded'),rows,min=-30.0,max=0.0,steps=10000)
+    return distributions
+
+def distributions_stage(config, channel, bit, rows):
+    distributions = local_distributions_stage(config, channel, bit, rows)
+    # Global distributions over macro-scale interval
+    distributions.update(total_distributions(config, total_histograms(config, channel, bit)))
+    return distributions
+
+def total_histograms(config, channel, bit):
+    # Fixed-edge histograms of the global distributions. With a chunk_size, these are accumulated over the chunks,
+    # such that the global distributions do not depend on chunk_size
+    totals = {'P_r total': histogram(min=-150.0, max=50.0, bins=20000),
+              'BER total': histogram(min=-50.0, max=0.0, bins=5000)}
+    totals['P_r total'].add(W2dBm(channel['P_r']))
+    totals['BER total'].add(log_BER(bit, 'BER'))
+    if config.coding == 'yes':
+        totals['BER coded total'] = histogram(min=-50.0, max=0.0, bins=5000)
+        totals['BER coded total'].add(log_BER(bit, 'BER coded'))
+    return totals
+
+def total_distributions(config, totals):
+    distributions = {}
+    distributions['P_r total'] = totals['P_r total'].distribution(min=-60.0, max=0.0, steps=1000)
+    distributions['BER total'] = totals['BER total'].distribution(min=totals['BER total'].data_min,
+                                                                  max=totals['BER total'].data_max, steps=1000)
+    if config.coding == 'yes':
+        distributions['BER coded total'] = totals['BER coded total'].distribution(min=-30.0, max=0.0, steps=100)
+    return distributions
+
+class histogram:
+    # Histogram with fixed bin edges between 'min' and 'max', that is accumulated over chunks of data.
+    # Data outside of these edges is counted in an underflow and an overflow bin, bounded by the smallest and largest value.
+    def __init__(self, min, max, bins):
+        self.edges = np.linspace(min, max, bins + 1)
+        self.counts = np.zeros(bins + 2, dtype=np.int64)
+        self.data_min = np.inf
+        self.data_max = -np.inf
+
+    def add(self, data):
+        data = data[np.isfinite(data)]
+        if data.size == 0:
+            return
+        self.data_min = min(self.data_min, data.min())
+        self.data_max = max(self.data_max, data.max())
+        # Index 0 is the underflow bin, index 'bins + 1' is the overflow bin
+        index = np.searchsorted(self.edges, data, side='right')
+        index[data == self.edges[-1]] = len(self.edges) - 1
+        self.counts += np.bincount(index, minlength=len(self.counts))
+
+    def merge(self, other):
+        # Adds the counts of another histogram with the same bin edges
+        self.counts += other.counts
+        self.data_min = min(self.data_min, other.data_min)
+        self.data_max = max(self.data_max, other.data_max)
+
+    def distribution(self, min, max, steps):
+        # Same output as 'distribution_function': pdf, cdf, x, std, mean
+        edges = self.edges
+        counts = self.counts[1:-1]
+        if self.counts[0] > 0:
+            edges = np.concatenate(([self.data_min], edges))
+            counts = np.concatenate(([self.counts[0]], counts))
+        if self.counts[-1] > 0:
+            edges = np.concatenate((edges, [self.data_max]))
+            counts = np.concatenate((counts, [self.counts[-1]]))
+        # Empty bins outside of the data are removed, such that the distribution is bounded by the data (as with np.histogram)
+        filled = np.nonzero(counts)[0]
+        counts = counts[filled[0]:filled[-1] + 1]
+        edges = edges[filled[0]:filled[-1] + 2]
+
+        x = np.linspace(min, max, steps)
+        # The underflow and overflow bins are wider, hence the counts are converted to densities
+        dist = rv_histogram((counts / np.diff(edges), edges), density=True)
+        return dist.pdf(x), dist.cdf(x), x, dist.std(), dist.mean()
+
+#------------------------------------------------------------------------
+#-------------------------------AVERAGING--------------------------------
+#------------------------------------------------------------------------
+def averages_stage(config, channel, bit):
+    # All micro-scale outputs that are used at mission level, averaged over the micro-scale interval
+    averages = {'P_r': channel['P_r'].mean(axis=1),
+                'P_r perfect pointing': channel['P_r perfect pointing'].mean(axis=1),
+                'PPB': channel['PPB'].mean(axis=1),
+                'h_tot': channel['h_tot'].mean(axis=1),
+                'h_scint': channel['h_scint'].mean(axis=1),
+                'h_TX': channel['h_TX'].mean(axis=1),
+                'h_RX': channel['h_RX'].mean(axis=1),
+                'BER': bit['BER'].mean(axis=1)}
+    if config.coding == 'yes':
+        averages['BER coded'] = bit['BER coded'].mean(axis=1)
+        # With coding_gain='mean', these are already averaged at bit level
+        averages['G coding'] = bit['G coding'].mean(axis=1) if bit['G coding'].ndim > 1 else bit['G coding']
+        averages['P_r coded'] = bit['P_r coded'].mean(axis=1) if bit['P_r coded'].ndim > 1 else bit['P_r coded']
+    return averages
+
+#------------------------------------------------------------------------
+#------------------------------STREAMING---------------------------------
+#------------------------------------------------------------------------
+# Error counts per frame (macro steps x frames) are small and kept for all macro steps
+frame_keys = ['errors per frame', 'coded errors per frame']
+
+def concatenate_chunks(arrays):
+    # Masked macro-scale vectors (for example averages of a masked P_r) keep their mask
+    if any(isinstance(array, np.ma.MaskedArray) for array in arrays):
+        return np.ma.concatenate(arrays)
+    return np.concatenate(arrays)
+
+def micro_scale_chunk(config, t_micro, link, indices, LCT, turb, P_r_0, links, chunk, seed, micro_scale='no'):
+    # Simulates the micro-scale model for one chunk of macro-scale steps and reduces it to macro-scale vectors.
+    # All random vectors are seeded per macro-scale step (see PDF.distributions), such that the output does not depend on
+    # the chunk size, or the order (or process) in which the chunks are simulated.
+    start = chunk.start
+    chunk_rows = chunk.stop - chunk.start
+    chunk_indices = [i for i in indices if chunk.start <= i < chunk.stop]
+    chunk_plot_indices = [i - start for i in chunk_indices] or [0]
+    chunk_links = {key: value[chunk] for key, value in links.items()}
+
+    channel = channel_stage(config, t_micro, link, chunk_plot_indices, LCT, turb.select(chunk), P_r_0[chunk],
+                            chunk_links, micro_scale, seed=seed, macro_steps=np.arange(chunk.start, chunk.stop))
+    bit = bit_stage(config, t_micro, chunk_plot_indices, LCT, P_r_0[chunk], channel, chunk_links, micro_scale)
+
+    output = {'fades': fade_statistics_stage(config, LCT, channel, len(t_micro)),
+              'averages': averages_stage(config, channel, bit),
+              'bit': {key: value for key, value in bit.items() if value.ndim == 1 or key in frame_keys},
+              'local': {},
+              'totals': total_histograms(config, channel, bit),
+              'series': {'channel': {}, 'bit': {}}}
+
+    for key, (pdf, cdf, x, std, mean) in local_distributions_stage(config, channel, bit, chunk_rows).items():
+        pdf, cdf = pdf.reshape(chunk_rows, len(x)), cdf.reshape(chunk_rows, len(x))
+        output['local'][key] = ({i: pdf[i - start] for i in chunk_indices}, {i: cdf[i - start] for i in chunk_indices},
+                                x, np.atleast_1d(std), np.atleast_1d(mean))
+
+    # Micro-scale time series are only kept for the plot indices
+    for name, series in [('channel', channel), ('bit', bit)]:
+        for key, value in series.items():
+            if name == 'bit' and (value.ndim == 1 or key in frame_keys):
+                continue
+            output['series'][name][key] = {i: value[i - start] if value.ndim > 1 else value for i in chunk_indices}
+    return output
+
+def micro_scale_stage(config, t_micro, link, indices, LCT, turb, P_r_0, links, seed=None):
+    # Returns channel, bit, fades, distributions and averages.
+    # With chunk_size='all', channel and bit contain the full micro-scale arrays (macro-scale steps x micro-scale samples).
+    # Otherwise, channel and bit contain the micro-scale time series only for the plot indices (dictionaries with the index as key),
+    # except for the macro-scale vectors of bit (throughput, and with coding_gain='mean' the coded Pr and coding gain)
+    # and the error counts per frame.
+    rows = len(P_r_0)
+    # One seed for this run, from which the seeds of all random vectors are derived (by default resolved in run_mission)
+    seed = np.random.SeedSequence(config.seed if seed is None else seed).entropy
+    if config.precision == 'mixed':
+        precision_report(config, t_micro, link, indices, LCT, turb, P_r_0, links, seed)
+    if config.chunk_size == 'all' or config.chunk_size >= rows:
+        channel = channel_stage(config, t_micro, link, indices, LCT, turb, P_r_0, links, seed=seed)
+        bit = bit_stage(config, t_micro, indices, LCT, P_r_0, channel, links)
+        fades = fade_statistics_stage(config, LCT, channel, len(t_micro))
+        distributions = distributions_stage(config, channel, bit, rows)
+        averages = averages_stage(config, channel, bit)
+        return channel, bit, fades, distributions, averages
+
+    chunks = [slice(start, min(start + config.chunk_size, rows)) for start in range(0, rows, config.chunk_size)]
+    # Print and plot output of the micro-scale model only once, for the chunk with the first plot index
+    plot_chunk = indices[0] // config.chunk_size
+
+    print('Micro-scale model is streamed in', len(chunks), 'chunks of', config.chunk_size, 'macro-scale steps, with', config.workers, 'worker(s)')
+    if config.workers > 1:
+        outputs = micro_scale_parallel(config, t_micro, link, indices, LCT, turb, P_r_0, links, chunks, seed, plot_chunk)
+    else:
+        outputs = [micro_scale_chunk(config, t_micro, link, indices, LCT, turb, P_r_0, links, chunk, seed,
+                                     micro_scale='yes' if c == plot_chunk else 'no')
+                   for c, chunk in enumerate(chunks)]
+
+    # Merge the reduced output of all chunks
+    channel, bit, fades, averages = {}, {}, {}, {}
+    for key in outputs[0]['fades']:
+        fades[key] = concatenate_chunks([output['fades'][key] for output in outputs])
+    for key in outputs[0]['averages']:
+        averages[key] = concatenate_chunks([output['averages'][key] for output in outputs])
+    for key in outputs[0]['bit']:
+        bit[key] = concatenate_chunks([output['bit'][key] for output in outputs])
+    for output in outputs:
+        for name, series in [('channel', channel), ('bit', bit)]:
+            for key, value in output['series'][name].items():
+                series.setdefault(key, {}).update(value)
+
+    distributions = {}
+    for key, (pdf, cdf, x, std, mean) in outputs[0]['local'].items():
+        distributions[key] = ({i: p for output in outputs for i, p in output['local'][key][0].items()},
+                              {i: c for output in outputs for i, c in output['local'][key][1].items()},
+                              x,
+                              np.concatenate([output['local'][key][3] for output in outputs]),
+                              np.concatenate([output['local'][key][4] for output in outputs]))
+
+    totals = outputs[0]['totals']
+    for output in outputs[1:]:
+        for key, total in output['totals'].items():
+            totals[key].merge(total)
+    distributions.update(total_distributions(config, totals))
+    return channel, bit, fades, distributions, averages
+
+#------------------------------------------------------------------------
+#-------------------------------PRECISION--------------------------------
+#------------------------------------------------------------------------
+def precision_report(config, t_micro, link, indices, LCT, turb, P_r_0, links, seed, rows=8):
+    # Simulates a few macro-scale steps (starting at the first plot index) in double and in mixed precision, and prints the drift
+    # of mixed precision in the outputs that are used at mission level.
+    # Both runs draw the noise in float64 from the same random stream (noise_precision='float64'), such that the drift only
+    # contains the rounding error of float32 and not the Monte Carlo difference between two random streams.
+    start = max(min(indices[0], len(P_r_0) - rows), 0)
+    chunk = slice(start, min(start + rows, len(P_r_0)))
+    output = {precision: micro_scale_chunk(config.replace(precision=precision, noise_precision='float64'), t_micro, link,
+                                           indices, LCT, turb, P_r_0, links, chunk, seed)
+              for precision in ['double', 'mixed']}
+    double, mixed = output['double'], output['mixed']
+
+    P_r_drift = np.max(np.abs(mixed['averages']['P_r'] / double['averages']['P_r'] - 1))
+    fade_drift = np.max(np.abs(mixed['fades']['fractional fade time'] - double['fades']['fractional fade time']))
+    penalty_drift = np.max(np.abs(W2dB(mixed['fades']['h penalty']) - W2dB(double['fades']['h penalty'])))
+
+    print('MIXED PRECISION (float32) VALIDATION')
+    print('------------------------------------------------')
+    print('Macro-scale steps                   : ' + str(chunk.start) + ' to ' + str(chunk.stop - 1))
+    print('Max. relative drift of mean Pr      : ' + str(P_r_drift))
+    print('Max. drift of fractional fade time  : ' + str(fade_drift))
+    print('Max. drift of h_penalty             : ' + str(penalty_drift) + ' dB')
+    print('------------------------------------------------')
+    return P_r_drift, fade_drift, penalty_drift
+
+#------------------------------------------------------------------------
+#-------------------------------PARALLEL---------------------------------
+#------------------------------------------------------------------------
+# The chunks are distributed over 'workers' processes.
+# All macro-scale input vectors (P_r_0, link geometry, turbulence frequencies and variances) are stored once in shared memory.
+# The 2D turbulence profiles are not shared, since these are not used by the micro-scale model.
+# Each worker returns the reduced output of its chunks, which is small compared to the micro-scale arrays.
+_worker = {}
+
+def share_arrays(arrays):
+    # Stores a dictionary of (masked) 1D arrays of equal length in one block of shared memory
+    keys = list(arrays)
+    length = len(arrays[keys[0]])
+    memory = shared_memory.SharedMemory(create=True, size=2 * len(keys) * length * 8)
+    block = np.ndarray((2, len(keys), length), dtype=np.float64, buffer=memory.buf)
+    for i, key in enumerate(keys):
+        block[0, i] = np.ma.getdata(arrays[key])
+        block[1, i] = np.ma.getmaskarray(arrays[key])
+    masked = [isinstance(arrays[key], np.ma.MaskedArray) for key in keys]
+    return memory, (memory.name, keys, masked, length)
+
+def attach_arrays(name, keys, masked, length):
+    memory = shared_memory.SharedMemory(name=name)
+    block = np.ndarray((2, len(keys), length), dtype=np.float64, buffer=memory.buf)
+    arrays = {key: np.ma.array(block[0, i], mask=block[1, i] > 0) if masked[i] else block[0, i]
+              for i, key in enumerate(keys)}
+    return memory, arrays
+
+def init_worker(config, t_micro, link, indices, LCT, turb, shared):
+    memory, arrays = attach_arrays(*shared)
+    for key, value in arrays.items():
+        if key.startswith('turb '):
+            setattr(turb, key[5:], value)
+    _worker.update(memory=memory, config=config, t_micro=t_micro, link=link, indices=indices, LCT=LCT, turb=turb,
+                   P_r_0=arrays['P_r_0'], links={key[6:]: value for key, value in arrays.items() if key.startswith('links ')})
+
+def run_worker(chunk, seed):
+    return micro_scale_chunk(_worker['config'], _worker['t_micro'], _worker['link'], _worker['indices'], _worker['LCT'],
+                             _worker['turb'], _worker['P_r_0'], _worker['links'], chunk, seed)
+
+def micro_scale_parallel(config, t_micro, link, indices, LCT, turb, P_r_0, links, chunks, seed, plot_chunk):
+    arrays = {'P_r_0': P_r_0}
+    arrays.update({'links ' + key: value for key, value in links.items()})
+    # Only the macro-scale vectors of the turbulence object are sent to the workers
+    turb_worker = copy.copy(turb)
+    for key, value in vars(turb).items():
+        if isinstance(value, np.ndarray) and value.ndim > 0 and len(value) == len(turb.ranges):
+            setattr(turb_worker, key, None)
+            if value.ndim == 1:
+                arrays['turb ' + key] = value
+
+    memory, shared = share_arrays(arrays)
+    try:
+        with ProcessPoolExecutor(max_workers=config.workers, initializer=init_worker,
+                                 initargs=(config, t_micro, link, indices, LCT, turb_worker, shared)) as executor:
+            futures = [executor.submit(run_worker, chunk, seed) if c != plot_chunk else None
+                       for c, chunk in enumerate(chunks)]
+            # The chunk with the first plot index is simulated in this process, such that it can print and plot
+            output_plot_chunk = micro_scale_chunk(config, t_micro, link, indices, LCT, turb, P_r_0, links,
+                                                  chunks[plot_chunk], seed, micro_scale='yes')
+            outputs = [future.result() if c != plot_chunk else output_plot_chunk for c, future in enumerate(futures)]
+    finally:
+        memory.close()
+        memory.unlink()
+    return outputs
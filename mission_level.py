@@ -1,4 +1,5 @@
 import numpy as np
+from dataclasses import dataclass, field
 from matplotlib import pyplot as plt
 
 # Import input parameters and helper functions
@@ -8,404 +9,451 @@ from helper_functions import *
 # Import classes from other files
 from Link_geometry import link_geometry
 from Routing_network import routing_network
-from Atmosphere import attenuation, turbulence
+from Atmosphere import attenuation, turbulence, turbulence_cache, turbulence_caches
 from LCT import terminal_properties
 from Link_budget import link_budget
-from bit_level import bit_level
-from channel_level import channel_level
+from micro_scale import micro_scale_stage
+
+
+#------------------------------------------------------------------------
+#-----------------------------MISSION-RESULT-----------------------------
+#------------------------------------------------------------------------
+# Container of all outputs of one end-to-end run of the model.
+# Every stage below fills in its own part, such that 'run_mission' can be called repeatedly in one process.
+@dataclass
+class MissionResult:
+    config: MissionConfig = None
+    # Entropy of all Monte Carlo simulations of this run (config.replace(seed=seed) reproduces the run)
+    seed: int = None
+    # Time vectors
+    t_macro: np.ndarray = None
+    t_micro: np.ndarray = None
+    time: np.ndarray = None
+    mission_duration: float = None
+    # Mission level
+    LCT: object = None
+    PPB_thres: np.ndarray = None
+    geometry: object = None
+    routing: object = None
+    routing_output: dict = None
+    routing_total_output: dict = None
+    mask: np.ndarray = None
+    links: dict = field(default_factory=dict)
+    indices: list = None
+    # Link level
+    att: object = None
+    h_ext: np.ndarray = None
+    turb: object = None
+    link: object = None
+    P_r_0: np.ndarray = None
+    P_r_0_acq: np.ndarray = None
+    BER_0: np.ndarray = None
+    # Channel level and bit level
+    channel: dict = field(default_factory=dict)
+    bit: dict = field(default_factory=dict)
+    # Fade statistics, distributions and performance metrics
+    fades: dict = field(default_factory=dict)
+    distributions: dict = field(default_factory=dict)
+    averages: dict = field(default_factory=dict)
+    performance: dict = field(default_factory=dict)
+    performance_output: dict = None
 
 
-print('')
-print('------------------END-TO-END-LASER-SATCOM-MODEL-------------------------')
 #------------------------------------------------------------------------
 #------------------------------TIME-VECTORS------------------------------
 #------------------------------------------------------------------------
-# Macro-scale time vector is generated with time step 'step_size_link'
-# Micro-scale time vector is generated with time step 'step_size_channel_level'
-
-t_macro = np.arange(0.0, (end_time - start_time), step_size_link)
-samples_mission_level = len(t_macro)
-t_micro = np.arange(0.0, interval_channel_level, step_size_channel_level)
-samples_channel_level = len(t_micro)
-print('Macro-scale: Interval=', (end_time - start_time)/60, 'min, step size=', step_size_link, 'sec,  macro-scale steps=', samples_mission_level)
-print('Micro-scale: Interval=', interval_channel_level    , '  sec, step size=', step_size_channel_level*1000, 'msec, micro-scale steps=', samples_channel_level)
-
-print('----------------------------------------------------------------------------------MACRO-LEVEL-----------------------------------------------------------------------------------------')
-print('')
-print('-----------------------------------MISSION-LEVEL-----------------------------------------')
+def time_vectors_stage(config):
+    # Macro-scale time vector is generated with time step 'step_size_link'
+    # Micro-scale time vector is generated with time step 'step_size_channel_level'
+    t_macro = np.arange(0.0, (config.end_time - config.start_time), config.step_size_link)
+    t_micro = np.arange(0.0, config.interval_channel_level, config.step_size_channel_level)
+    print('Macro-scale: Interval=', (config.end_time - config.start_time)/60, 'min, step size=', config.step_size_link, 'sec,  macro-scale steps=', len(t_macro))
+    print('Micro-scale: Interval=', config.interval_channel_level    , '  sec, step size=', config.step_size_channel_level*1000, 'msec, micro-scale steps=', len(t_micro))
+    return t_macro, t_micro
+
 #------------------------------------------------------------------------
 #------------------------------------LCT---------------------------------
 #------------------------------------------------------------------------
-# Compute the sensitivity and compute the threshold
-LCT = terminal_properties()
-LCT.BER_to_P_r(BER = BER_thres,
-               modulation = modulation,
-               detection = detection,
-               threshold = True)
-PPB_thres = PPB_func(LCT.P_r_thres, data_rate)
+def terminal_stage(config):
+    # Compute the sensitivity and compute the threshold
+    LCT = terminal_properties(config)
+    LCT.BER_to_P_r(BER = config.BER_thres,
+                   modulation = config.modulation,
+                   detection = config.detection,
+                   threshold = True)
+    PPB_thres = PPB_func(LCT.P_r_thres, config.data_rate, config)
+    return LCT, PPB_thres
 
 #------------------------------------------------------------------------
 #-----------------------------LINK-GEOMETRY------------------------------
 #------------------------------------------------------------------------
-# Initiate LINK GEOMETRY class, with inheritance of AIRCRAFT class and CONSTELLATION class
-# First both AIRCRAFT and SATELLITES are propagated with 'link_geometry.propagate'
-# Then, the relative geometrical state is computed with 'link_geometry.geometrical_outputs'
-# Here, all links are generated between the AIRCRAFT and each SATELLITE in the constellation
-link_geometry = link_geometry()
-link_geometry.propagate(time=t_macro, step_size_AC=step_size_AC, step_size_SC=step_size_SC,
-                        aircraft_filename=aircraft_filename_load, step_size_analysis=False, verification_cons=False)
-link_geometry.geometrical_outputs()
-# Initiate time vector at mission level. This is the same as the propagated AIRCRAFT time vector
-time = link_geometry.time
-mission_duration = time[-1] - time[0]
-# Update the samples/steps at mission level
-samples_mission_level = number_sats_per_plane * number_of_planes * len(link_geometry.geometrical_output['elevation'])
+def geometry_stage(config, t_macro):
+    # Initiate LINK GEOMETRY class, with inheritance of AIRCRAFT class and CONSTELLATION class
+    # First both AIRCRAFT and SATELLITES are propagated with 'link_geometry.propagate'
+    # Then, the relative geometrical state is computed with 'link_geometry.geometrical_outputs'
+    # Here, all links are generated between the AIRCRAFT and each SATELLITE in the constellation
+    geometry = link_geometry(config)
+    geometry.propagate(time=t_macro, step_size_AC=config.step_size_AC, step_size_SC=config.step_size_SC,
+                       aircraft_filename=config.aircraft_filename_load, step_size_analysis=False, verification_cons=False)
+    geometry.geometrical_outputs()
+    return geometry
 
 #------------------------------------------------------------------------
 #---------------------------ROUTING-OF-LINKS-----------------------------
 #------------------------------------------------------------------------
-# The routing_network class takes the relative geometrical state between AIRCRAFT and all SATELLITES and
-# Performs optimization to select a number of links, with 'routing_network.routing'
-# Cost variables are:
-#   (1) Maximum link time
-#   (2) maximum elevation during one link
-# Constraints are:
-#   (1) Minimum elevation angle: 10 degrees
-#   (2) Positive elevation rate at start of link
-routing_network = routing_network(time=time)
-routing_output, routing_total_output, mask = routing_network.routing(link_geometry.geometrical_output, time, step_size_link)
-
-total_time = len(time)*step_size_link
-comm_time = len(flatten(routing_output['time']))*step_size_link
-acq_time = routing_network.total_acquisition_time
-
-
-
-# Options are to analyse 1 link or analyse 'all' links
-#   (1) link_number == 'all'   : Creates 1 vector for each geometric variable for each selected link & creates a flat vector
-#   (2) link_number == 1 number: Creates 1 vector for each geometric variable
-if link_number == 'all':
-    time_links  = flatten(routing_output['time'     ])
-    time_links_hrs = time_links / 3600.0
-    ranges     = flatten(routing_output['ranges'    ])
-    elevation  = flatten(routing_output['elevation' ])
-    zenith     = flatten(routing_output['zenith'    ])
-    slew_rates = flatten(routing_output['slew rates'])
-    heights_SC = flatten(routing_output['heights SC'])
-    heights_AC = flatten(routing_output['heights AC'])
-    speeds_AC  = flatten(routing_output['speeds AC'])
-
-    time_per_link       = routing_output['time'      ]
-    time_per_link_hrs   = time_links / 3600.0
-    ranges_per_link     = routing_output['ranges'    ]
-    elevation_per_link  = routing_output['elevation' ]
-    zenith_per_link     = routing_output['zenith'    ]
-    slew_rates_per_link = routing_output['slew rates']
-    heights_SC_per_link = routing_output['heights SC']
-    heights_AC_per_link = routing_output['heights AC']
-    speeds_AC_per_link  = routing_output['speeds AC' ]
-
-else:
-    time_links     = routing_output['time'      ][link_number]
-    time_links_hrs = time_links / 3600.0
-    ranges         = routing_output['ranges'    ][link_number]
-    elevation      = routing_output['elevation' ][link_number]
-    zenith         = routing_output['zenith'    ][link_number]
-    slew_rates     = routing_output['slew rates'][link_number]
-    heights_SC     = routing_output['heights SC'][link_number]
-    heights_AC     = routing_output['heights AC'][link_number]
-    speeds_AC      = routing_output['speeds AC' ][link_number]
-
-
-# Define cross-section of macro-scale simulation based on the elevation angles.
-# These cross-sections are used for micro-scale plots.
-elevation_cross_section = [2.0, 20.0, 40.0]
-index_elevation = 1
-indices, time_cross_section = cross_section(elevation_cross_section, elevation, time_links)
-
-print('')
-print('-------------------------------------LINK-LEVEL------------------------------------------')
-print('')
+def routing_stage(config, geometrical_output, time):
+    # The routing_network class takes the relative geometrical state between AIRCRAFT and all SATELLITES and
+    # Performs optimization to select a number of links, with 'routing_network.routing'
+    # Cost variables are:
+    #   (1) Maximum link time
+    #   (2) maximum elevation during one link
+    # Constraints are:
+    #   (1) Minimum elevation angle: 10 degrees
+    #   (2) Positive elevation rate at start of link
+    routing = routing_network(time=time, config=config)
+    routing_output, routing_total_output, mask = routing.routing(geometrical_output, time, config.step_size_link)
+    return routing, routing_output, routing_total_output, mask
+
+def select_links_stage(config, routing_output):
+    # Options are to analyse 1 link or analyse 'all' links
+    #   (1) link_number == 'all'   : Creates 1 vector for each geometric variable for each selected link & creates a flat vector
+    #   (2) link_number == 1 number: Creates 1 vector for each geometric variable
+    keys = ['time', 'ranges', 'elevation', 'zenith', 'slew rates', 'heights SC', 'heights AC', 'speeds AC']
+    if config.link_number == 'all':
+        links = {key: flatten(routing_output[key]) for key in keys}
+    else:
+        links = {key: routing_output[key][config.link_number] for key in keys}
+    return links
+
 #------------------------------------------------------------------------
 #-------------------------------ATTENUATION------------------------------
+#------------------------------------------------------------------------
+def attenuation_stage(config, links, seed=None):
+    seed = config.seed if seed is None else seed
+    att = attenuation(att_coeff=config.att_coeff, H_scale=config.scale_height, seed=seed, config=config)
+    att.h_ext_func(range_link=links['ranges'], zenith_angles=links['zenith'], method=config.method_att)
+    att.h_clouds_func(method=config.method_clouds)
+    h_ext = att.h_ext * att.h_clouds
+    # Print attenuation parameters
+    att.print()
+    return att, h_ext
 
-att = attenuation(att_coeff=att_coeff, H_scale=scale_height)
-att.h_ext_func(range_link=ranges, zenith_angles=zenith, method=method_att)
-att.h_clouds_func(method=method_clouds)
-h_ext = att.h_ext * att.h_clouds
-# Print attenuation parameters
-att.print()
 #------------------------------------------------------------------------
 #-------------------------------TURBULENCE-------------------------------
-# The turbulence class is initiated here. Inside the turbulence class, there are multiple methods that are run directly.
-# Firstly, a windspeed profile is calculated, which is used for the Cn^2 model. This will then be used for the r0 profile.
-# With Cn^2 and r0, the variances for scintillation and beam wander are computed
-
-
-turb = turbulence(ranges=ranges,
-                  h_AC=heights_AC,
-                  h_SC=heights_SC,
-                  zenith_angles=zenith,
-                  angle_div=angle_div)
-turb.windspeed_func(slew=slew_rates,
-                    Vg=speeds_AC,
-                    wind_model_type=wind_model_type)
-turb.Cn_func()
-turb.frequencies()
-r0 = turb.r0_func()
-turb.var_rytov_func()
-turb.var_scint_func()
-turb.WFE(tip_tilt="YES")
-turb.beam_spread()
-turb.var_bw_func()
-turb.var_aoa_func()
-
-print('')
-print('----------------------------------------------------------------------------------MACRO-LEVEL-----------------------------------------------------------------------------------------')
-print('')
-print('-----------------------------------CHANNEL-LEVEL-----------------------------------------')
-print('')
-for i in indices:
-    turb.print(index=i, elevation=np.rad2deg(elevation), ranges=ranges, Vg=link_geometry.speed_AC.mean(),slew=slew_rates)
-# ------------------------------------------------------------------------
-# -----------------------------LINK-BUDGET--------------------------------
-# The link budget class computes the static link budget (without any micro-scale effects)
-# Then it generates a link margin, based on the sensitivity
-link = link_budget(angle_div=angle_div, w0=w0, ranges=ranges, h_WFE=turb.h_WFE, w_ST=turb.w_ST, h_beamspread=turb.h_beamspread, h_ext=h_ext)
-link.sensitivity(LCT.P_r_thres, PPB_thres)
-
-# Pr0 (for COMMUNICATION and ACQUISITION phase) is computed with the link budget
-P_r_0, P_r_0_acq = link.P_r_0_func()
-# link.print(index=indices[index_elevation], elevation=elevation, static=True)
-
-# ------------------------------------------------------------------------
-# -------------------------MACRO-SCALE-SOLVER-----------------------------
-noise_sh, noise_th, noise_bg, noise_beat = LCT.noise(P_r=P_r_0, I_sun=I_sun, index=indices[index_elevation])
-SNR_0, Q_0 = LCT.SNR_func(P_r=P_r_0, detection=detection,
-                                  noise_sh=noise_sh, noise_th=noise_th, noise_bg=noise_bg, noise_beat=noise_beat)
-BER_0 = LCT.BER_func(Q=Q_0, modulation=modulation)
-
-# ------------------------------------------------------------------------
-# ----------------------------MICRO-SCALE-MODEL---------------------------
-# Here, the channel level is simulated, losses and Pr as output
-P_r, P_r_perfect_pointing, PPB, elevation_angles, losses, angles = \
-    channel_level(t=t_micro,
-                  link_budget=link,
-                  plot_indices=indices,
-                  LCT=LCT, turb=turb,
-                  P_r_0=P_r_0,
-                  ranges=ranges,
-                  angle_div=link.angle_div,
-                  elevation_angles=elevation,
-                  samples=samples_channel_level,
-                  turb_cutoff_frequency=turbulence_freq_lowpass)
-h_tot = losses[0]
-h_scint = losses[1]
-h_RX    = losses[2]
-h_TX    = losses[3]
-h_bw    = losses[4]
-h_aoa   = losses[5]
-h_pj_t  = losses[6]
-h_pj_r  = losses[7]
-h_tot_no_pointing_errors = losses[-1]
-r_TX = angles[0] * ranges[:, None]
-r_RX = angles[1] * ranges[:, None]
-
-# Here, the bit level is simulated, SNR, BER and throughput as output
-if coding == 'yes':
-    SNR, BER, throughput, BER_coded, throughput_coded, P_r_coded, G_coding = \
-        bit_level(LCT=LCT,
-                  t=t_micro,
-                  plot_indices=indices,
-                  samples=samples_channel_level,
-                  P_r_0=P_r_0,
-                  P_r=P_r,
-                  elevation_angles=elevation,
-                  h_tot=h_tot)
-
-else:
-    SNR, BER, throughput = \
-        bit_level(LCT=LCT,
-                  t=t_micro,
-                  plot_indices=indices,
-                  samples=samples_channel_level,
-                  P_r_0=P_r_0,
-                  P_r=P_r,
-                  elevation_angles=elevation,
-                  h_tot=h_tot)
-
-
-# ----------------------------FADE-STATISTICS-----------------------------
-
-number_of_fades = np.sum((P_r[:, 1:] < LCT.P_r_thres[1]) & (P_r[:, :-1] > LCT.P_r_thres[1]), axis=1)
-fractional_fade_time = np.count_nonzero((P_r < LCT.P_r_thres[1]), axis=1) / samples_channel_level
-mean_fade_time = fractional_fade_time / number_of_fades * interval_channel_level
-
-# Power penalty in order to include a required fade fraction.
-# REF: Giggenbach (2008), Fading-loss assessment
-h_penalty   = penalty(P_r=P_r, desired_frac_fade_time=desired_frac_fade_time)                                           
-h_penalty_perfect_pointing   = penalty(P_r=P_r_perfect_pointing, desired_frac_fade_time=desired_frac_fade_time)
-P_r_penalty_perfect_pointing = P_r_perfect_pointing.mean(axis=1) * h_penalty_perfect_pointing
-
-# ---------------------------------LINK-MARGIN--------------------------------
-margin     = P_r / LCT.P_r_thres[1]
-
-# -------------------------------DISTRIBUTIONS----------------------------
-# Local distributions for each macro-scale time step (over micro-scale interval)
-pdf_P_r, cdf_P_r, x_P_r, std_P_r, mean_P_r = distribution_function(W2dBm(P_r),len(P_r_0),min=-60.0,max=-20.0,steps=1000)
-pdf_BER, cdf_BER, x_BER, std_BER, mean_BER = distribution_function(np.log10(BER),len(P_r_0),min=-30.0,max=0.0,steps=10000)
-if coding == 'yes':
-    pdf_BER_coded, cdf_BER_coded, x_BER_coded, std_BER_coded, mean_BER_coded = \
-        distribution_function(np.log10(BER_coded),len(P_r_0),min=-30.0,max=0.0,steps=10000)
-
-# Global distributions over macro-scale interval
-P_r_total = P_r.flatten()
-BER_total = BER.flatten()
-P_r_pdf_total, P_r_cdf_total, x_P_r_total, std_P_r_total, mean_P_r_total = distribution_function(data=W2dBm(P_r_total), length=1, min=-60.0, max=0.0, steps=1000)
-BER_pdf_total, BER_cdf_total, x_BER_total, std_BER_total, mean_BER_total = distribution_function(data=np.log10(BER_total), length=1, min=np.log10(BER_total.min()), max=np.log10(BER_total.max()), steps=1000)
-
-if coding == 'yes':
-    BER_coded_total = BER_coded.flatten()
-    BER_coded_pdf_total, BER_coded_cdf_total, x_BER_coded_total, std_BER_coded_total, mean_BER_coded_total = \
-        distribution_function(data=np.log10(BER_coded_total), length=1, min=-30.0, max=0.0, steps=100)
-
-
-# ------------------------------------------------------------------------
-# -------------------------------AVERAGING--------------------------------
-# ------------------------------------------------------------------------
-
-# ---------------------------UPDATE-LINK-BUDGET---------------------------
-# All micro-scale losses are averaged and added to the link budget
-# Also adds a penalty term to the link budget as a requirement for the desired fade time, defined in input.py
-link.dynamic_contributions(PPB=PPB.mean(axis=1),
-                           T_dyn_tot=h_tot.mean(axis=1),
-                           T_scint=h_scint.mean(axis=1),
-                           T_TX=h_TX.mean(axis=1),
-                           T_RX=h_RX.mean(axis=1),
-                           h_penalty=h_penalty,
-                           P_r=P_r.mean(axis=1),
-                           BER=BER.mean(axis=1))
-
-
-if coding == 'yes':
-    link.coding(G_coding=G_coding.mean(axis=1),
-                BER_coded=BER_coded.mean(axis=1))
-    P_r = P_r_coded
-# A fraction (0.9) of the light is subtracted from communication budget and used for tracking budget
-link.tracking()
-link.link_margin()
-
-
-# ------------------------------------------------------------------------
-# --------------------------PERFORMANCE-METRICS---------------------------
-# ------------------------------------------------------------------------
-
-# Availability
-# No availability is assumed below link margin threshold
-availability_vector = mask.astype(int)
-find_lm = np.where(link.LM_comm_BER6 < 1.0)[0]
-time_link_fail = time_links[find_lm]
-find_time = np.where(np.in1d(time, time_link_fail))[0]
-availability_vector[find_time] = 0.0
-
-# Reliability
-# No reliability is assumed below link margin threshold
-reliability_BER = BER.mean(axis=1)
-reliability_BER[find_lm] = 0.0
-
-# Actual throughput
-# No throughput is assumed below link margin threshold
-throughput[find_lm] = 0.0
-# Potential throughput with the Shannon-Hartley theorem
-noise_sh, noise_th, noise_bg, noise_beat = LCT.noise(P_r=link.P_r, I_sun=I_sun, index=indices[index_elevation])
-SNR_penalty, Q_penalty = LCT.SNR_func(link.P_r, detection=detection,
-                                  noise_sh=noise_sh, noise_th=noise_th, noise_bg=noise_bg, noise_beat=noise_beat)
-C = BW * np.log2(1 + SNR_penalty)
-
-# Latency is computed as a macro-scale time-series
-# The only assumed contributions are geometrical latency and interleaving latency.
-# Latency due to coding/detection/modulation/data processing can be optionally added.
-latency_propagation = ranges / speed_of_light
-latency_transmission = 1 / data_rate
-latency_qeue = 5.0e-3
-latency_processing = 3.0e-3
-latency = latency_propagation + latency_transmission + latency_qeue + latency_processing
-
-
-# ------------------------------------------------------------------------
-# ---------------------------------OUTPUT---------------------------------
-
-performance_output = {
-        'time'                : [],
-        'throughput'          : [],
-        'link number'         : [],
-        'Pr 0'                : [],
-        'Pr mean'             : [],
-        'Pr penalty'          : [],
-        'BER mean'            : [],
-        'fractional fade time': [],
-        'mean fade time'      : [],
-        'number of fades'     : [],
-        'link margin'         : [],
-        'latency'             : [],
-        'Pr mean (perfect pointing)'   : [],
-        'Pr penalty (perfect pointing)': [],
-        'Pr coded'            : [],
-        'BER coded'           : [],
-        'throughput coded'    : [],
-
-    }
-
-if link_number == 'all':
-    performance_output['link number'] = routing_output['link number']
-
-    for i in range(len(routing_output['link number'])):
-        condition_1 = time[mask] >= routing_output['time'][i][0]
-        condition_2 = time[mask] <= routing_output['time'][i][-1]
-        conditions = [condition_1, condition_2]
-        full_condition = [all(condition) for condition in zip(*conditions)]
-
-        performance_output['time'].append(time_links[full_condition])
-        performance_output['throughput'].append(throughput[full_condition])
-        performance_output['Pr 0'].append(P_r_0[full_condition])
-        performance_output['Pr mean'].append(P_r.mean(axis=1)[full_condition])
-        performance_output['Pr penalty'].append(link.P_r[full_condition])
-        performance_output['fractional fade time'].append(fractional_fade_time[full_condition])
-        performance_output['mean fade time'].append(mean_fade_time[full_condition])
-        performance_output['number of fades'].append(number_of_fades[full_condition])
-        performance_output['BER mean'].append(BER.mean(axis=1)[full_condition])
-        performance_output['link margin'].append(link.LM_comm_BER6[full_condition])
-        performance_output['latency'].append(latency[full_condition])
-        performance_output['Pr mean (perfect pointing)'   ].append(P_r_perfect_pointing.mean(axis=1)[full_condition])
-        performance_output['Pr penalty (perfect pointing)'].append(P_r_penalty_perfect_pointing[full_condition])
+#------------------------------------------------------------------------
+def turbulence_stage(config, links):
+    # The turbulence class is initiated here. Inside the turbulence class, there are multiple methods that are run directly.
+    # Firstly, a windspeed profile is calculated, which is used for the Cn^2 model. This will then be used for the r0 profile.
+    # With Cn^2 and r0, the variances for scintillation and beam wander are computed
+    # With turbulence_cache='yes', the parameters are taken from the turbulence cache (see cached_turbulence_stage)
+    if config.turbulence_cache == 'yes':
+        return cached_turbulence_stage(config, links)
+    turb = turbulence(ranges=links['ranges'],
+                      h_AC=links['heights AC'],
+                      h_SC=links['heights SC'],
+                      zenith_angles=links['zenith'],
+                      angle_div=config.angle_div,
+                      config=config)
+    turb.windspeed_func(slew=links['slew rates'],
+                        Vg=links['speeds AC'],
+                        wind_model_type=config.wind_model_type)
+    turb.Cn_func()
+    turb.frequencies()
+    turb.r0_func()
+    turb.var_rytov_func()
+    turb.var_scint_func()
+    turb.WFE(tip_tilt="YES")
+    turb.beam_spread()
+    turb.var_bw_func()
+    turb.var_aoa_func()
+    return turb
+
+# Geometry of the key of the turbulence cache, in the order of config.turbulence_cache_resolution
+turbulence_cache_keys = ['heights AC', 'heights SC', 'zenith', 'ranges', 'slew rates', 'speeds AC']
+
+def turbulence_cache_signature(config):
+    # Model parameters of the cached turbulence parameters (the cache is only reused with the same parameters)
+    return (config.link, config.wavelength, config.D_t, config.D_r, config.clipping_ratio, config.h_AC, config.h_SC,
+            config.turbulence_model, config.wind_model_type, config.turbulence_integration, config.turbulence_quadrature_nodes,
+            config.turbulence_height_max, config.angle_div, config.w0)
+
+def cached_turbulence_stage(config, links):
+    # Turbulence parameters of each macro-scale step from the LRU cache of the quantised geometry.
+    # Only the distinct geometries that are not in the cache are computed (with turbulence_stage, at the quantised geometry).
+    signature = turbulence_cache_signature(config)
+    cache_id = (signature, config.turbulence_cache_resolution, config.turbulence_cache_file)
+    if cache_id not in turbulence_caches:
+        turbulence_caches[cache_id] = turbulence_cache.load(config.turbulence_cache_file, config.turbulence_cache_resolution,
+                                                            config.turbulence_cache_size, signature)
+    cache = turbulence_caches[cache_id]
+
+    geometry = np.stack([np.asarray(links[key], dtype=np.float64) for key in turbulence_cache_keys], axis=1)
+    keys, geometry_quantised = cache.quantise(geometry)
+
+    values = {}
+    missing, missing_rows = [], []
+    for row, key in enumerate(keys):
+        if key in values:
+            continue
+        values[key] = cache.get(key)
+        if values[key] is None:
+            missing.append(key)
+            missing_rows.append(row)
+    cache.misses += len(missing)
+    cache.hits += len(keys) - len(missing)
+
+    if missing:
+        links_missing = {key: geometry_quantised[missing_rows, i] for i, key in enumerate(turbulence_cache_keys)}
+        turb_missing = turbulence_stage(config.replace(turbulence_cache='no'), links_missing)
+        cache.names = turb_missing.parameters()
+        table = np.stack([getattr(turb_missing, name) for name in cache.names], axis=1)
+        for key, value in zip(missing, table):
+            values[key] = value
+            cache.put(key, value)
+
+    table = np.stack([values[key] for key in keys])
+    parameters = {name: table[:, i] for i, name in enumerate(cache.names)}
+    turb = turbulence.from_parameters(ranges=links['ranges'], zenith_angles=links['zenith'], h_AC=links['heights AC'],
+                                      h_SC=links['heights SC'], angle_div=config.angle_div, parameters=parameters, config=config)
+    if config.turbulence_cache_file is not None:
+        cache.save(config.turbulence_cache_file)
+    cache.print()
+    return turb
 
-        if coding == 'yes':
-            performance_output['Pr coded'].append(P_r_coded[full_condition])
-            performance_output['BER coded'].append(BER_coded.mean(axis=1)[full_condition])
-            performance_output['throughput coded'].append(throughput_coded[full_condition])
-
-else:
-    performance_output['time']                 = time_links
-    performance_output['throughput']           = throughput
-    performance_output['Pr 0']                 = P_r_0
-    performance_output['Pr mean']              = P_r.mean(axis=1)
-    performance_output['Pr penalty']           = link.P_r
-    performance_output['fractional fade time'] = fractional_fade_time
-    performance_output['mean fade time']       = mean_fade_time
-    performance_output['number of fades']      = number_of_fades
-    performance_output['BER mean']             = BER.mean(axis=1)
-    performance_output['link margin']          = margin
-    performance_output['latency']              = latency
-    performance_output['Pr mean (perfect pointing)'] = P_r_perfect_pointing.mean(axis=1)
-    performance_output['Pr penalty (perfect pointing)'] = P_r_penalty_perfect_pointing
-    if coding == 'yes':
-        performance_output['Pr coded'].append(P_r_coded)
-        performance_output['BER coded'].append(BER_coded.mean(axis=1))
-        performance_output['throughput coded'].append(throughput_coded)
+#------------------------------------------------------------------------
+#------------------------------LINK-BUDGET-------------------------------
+#------------------------------------------------------------------------
+def link_budget_stage(config, links, turb, h_ext, LCT, PPB_thres):
+    # The link budget class computes the static link budget (without any micro-scale effects)
+    # Then it generates a link margin, based on the sensitivity
+    link = link_budget(angle_div=config.angle_div, w0=config.w0, ranges=links['ranges'], h_WFE=turb.h_WFE, w_ST=turb.w_ST, h_beamspread=turb.h_beamspread, h_ext=h_ext, config=config)
+    link.sensitivity(LCT.P_r_thres, PPB_thres)
+
+    # Pr0 (for COMMUNICATION and ACQUISITION phase) is computed with the link budget
+    P_r_0, P_r_0_acq = link.P_r_0_func()
+    return link, P_r_0, P_r_0_acq
+
+def macro_scale_stage(config, LCT, P_r_0, index):
+    # BER at the static (macro-scale) received power
+    noise_sh, noise_th, noise_bg, noise_beat = LCT.noise(P_r=P_r_0, I_sun=config.I_sun, index=index)
+    SNR_0, Q_0 = LCT.SNR_func(P_r=P_r_0, detection=config.detection,
+                              noise_sh=noise_sh, noise_th=noise_th, noise_bg=noise_bg, noise_beat=noise_beat)
+    BER_0 = LCT.BER_func(Q=Q_0, modulation=config.modulation)
+    return BER_0
+
+#------------------------------------------------------------------------
+#-------------------------------AVERAGING--------------------------------
+#------------------------------------------------------------------------
+def update_link_budget_stage(config, link, averages, fades):
+    # All micro-scale losses are averaged and added to the link budget
+    # Also adds a penalty term to the link budget as a requirement for the desired fade time, defined in input.py
+    link.dynamic_contributions(PPB=averages['PPB'],
+                               T_dyn_tot=averages['h_tot'],
+                               T_scint=averages['h_scint'],
+                               T_TX=averages['h_TX'],
+                               T_RX=averages['h_RX'],
+                               h_penalty=fades['h penalty'],
+                               P_r=averages['P_r'],
+                               BER=averages['BER'])
+
+    if config.coding == 'yes':
+        link.coding(G_coding=averages['G coding'],
+                    BER_coded=averages['BER coded'])
+    # A fraction (0.9) of the light is subtracted from communication budget and used for tracking budget
+    link.tracking()
+    link.link_margin()
+
+#------------------------------------------------------------------------
+#--------------------------PERFORMANCE-METRICS---------------------------
+#------------------------------------------------------------------------
+def performance_metrics_stage(config, LCT, link, bit, averages, mask, time, links, index):
+    time_links = links['time']
+    # Availability
+    # No availability is assumed below link margin threshold
+    availability_vector = mask.astype(int)
+    find_lm = np.where(link.LM_comm_BER6 < 1.0)[0]
+    time_link_fail = time_links[find_lm]
+    find_time = np.where(np.in1d(time, time_link_fail))[0]
+    availability_vector[find_time] = 0.0
+
+    # Reliability
+    # No reliability is assumed below link margin threshold
+    reliability_BER = averages['BER'].copy()
+    reliability_BER[find_lm] = 0.0
+
+    # Actual throughput
+    # No throughput is assumed below link margin threshold
+    bit['throughput'][find_lm] = 0.0
+    # Potential throughput with the Shannon-Hartley theorem
+    noise_sh, noise_th, noise_bg, noise_beat = LCT.noise(P_r=link.P_r, I_sun=config.I_sun, index=index)
+    SNR_penalty, Q_penalty = LCT.SNR_func(link.P_r, detection=config.detection,
+                                      noise_sh=noise_sh, noise_th=noise_th, noise_bg=noise_bg, noise_beat=noise_beat)
+    C = config.BW * np.log2(1 + SNR_penalty)
+
+    # Latency is computed as a macro-scale time-series
+    # The only assumed contributions are geometrical latency and interleaving latency.
+    # Latency due to coding/detection/modulation/data processing can be optionally added.
+    latency_propagation = links['ranges'] / speed_of_light
+    latency_transmission = 1 / config.data_rate
+    latency_qeue = 5.0e-3
+    latency_processing = 3.0e-3
+    latency = latency_propagation + latency_transmission + latency_qeue + latency_processing
+
+    return {'availability': availability_vector,
+            'reliability BER': reliability_BER,
+            'capacity': C,
+            'latency': latency}
 
+#------------------------------------------------------------------------
+#---------------------------------OUTPUT---------------------------------
+#------------------------------------------------------------------------
+def performance_output_stage(config, routing_output, mask, time, links, link, bit, averages, fades, performance, P_r_0):
+    P_r = averages['P_r']
+    P_r_perfect_pointing = averages['P_r perfect pointing']
+    BER = averages['BER']
+    time_links = links['time']
+    margin = P_r / link.P_r_thres_BER6
+    if config.coding == 'yes':
+        P_r = averages['P_r coded']
+    performance_output = {
+            'time'                : [],
+            'throughput'          : [],
+            'link number'         : [],
+            'Pr 0'                : [],
+            'Pr mean'             : [],
+            'Pr penalty'          : [],
+            'BER mean'            : [],
+            'fractional fade time': [],
+            'mean fade time'      : [],
+            'number of fades'     : [],
+            'link margin'         : [],
+            'latency'             : [],
+            'Pr mean (perfect pointing)'   : [],
+            'Pr penalty (perfect pointing)': [],
+            'Pr coded'            : [],
+            'BER coded'           : [],
+            'throughput coded'    : [],
+
+        }
+
+    if config.link_number == 'all':
+        performance_output['link number'] = routing_output['link number']
+
+        for i in range(len(routing_output['link number'])):
+            condition_1 = time[mask] >= routing_output['time'][i][0]
+            condition_2 = time[mask] <= routing_output['time'][i][-1]
+            conditions = [condition_1, condition_2]
+            full_condition = [all(condition) for condition in zip(*conditions)]
+
+            performance_output['time'].append(time_links[full_condition])
+            performance_output['throughput'].append(bit['throughput'][full_condition])
+            performance_output['Pr 0'].append(P_r_0[full_condition])
+            performance_output['Pr mean'].append(P_r[full_condition])
+            performance_output['Pr penalty'].append(link.P_r[full_condition])
+            performance_output['fractional fade time'].append(fades['fractional fade time'][full_condition])
+            performance_output['mean fade time'].append(fades['mean fade time'][full_condition])
+            performance_output['number of fades'].append(fades['number of fades'][full_condition])
+            performance_output['BER mean'].append(BER[full_condition])
+            performance_output['link margin'].append(link.LM_comm_BER6[full_condition])
+            performance_output['latency'].append(performance['latency'][full_condition])
+            performance_output['Pr mean (perfect pointing)'   ].append(P_r_perfect_pointing[full_condition])
+            performance_output['Pr penalty (perfect pointing)'].append(fades['P_r penalty perfect pointing'][full_condition])
+
+            if config.coding == 'yes':
+                performance_output['Pr coded'].append(averages['P_r coded'][full_condition])
+                performance_output['BER coded'].append(averages['BER coded'][full_condition])
+                performance_output['throughput coded'].append(bit['throughput coded'][full_condition])
+
+    else:
+        performance_output['time']                 = time_links
+        performance_output['throughput']           = bit['throughput']
+        performance_output['Pr 0']                 = P_r_0
+        performance_output['Pr mean']              = P_r
+        performance_output['Pr penalty']           = link.P_r
+        performance_output['fractional fade time'] = fades['fractional fade time']
+        performance_output['mean fade time']       = fades['mean fade time']
+        performance_output['number of fades']      = fades['number of fades']
+        performance_output['BER mean']             = BER
+        performance_output['link margin']          = margin
+        performance_output['latency']              = performance['latency']
+        performance_output['Pr mean (perfect pointing)'] = P_r_perfect_pointing
+        performance_output['Pr penalty (perfect pointing)'] = fades['P_r penalty perfect pointing']
+        if config.coding == 'yes':
+            performance_output['Pr coded'].append(averages['P_r coded'])
+            performance_output['BER coded'].append(averages['BER coded'])
+            performance_output['throughput coded'].append(bit['throughput coded'])
+
+    return performance_output
+
+
+#------------------------------------------------------------------------
+#-------------------------------RUN-MISSION------------------------------
+#------------------------------------------------------------------------
+def run_mission(config=config):
+    # This function runs all stages of the end-to-end model and returns a MissionResult.
+    # 'config' is a MissionConfig (see input.py), by default the configuration defined in input.py.
+    # Heavy modules (Tudat, SPICE kernels, matplotlib) are only imported once, such that the model can be run repeatedly in one process.
+    result = MissionResult(config=config)
+    # One seed for all stochastic stages (clouds and micro-scale model). With config.seed=None, it is drawn once here
+    result.seed = np.random.SeedSequence(config.seed).entropy
+
+    print('')
+    print('------------------END-TO-END-LASER-SATCOM-MODEL-------------------------')
+    result.t_macro, result.t_micro = time_vectors_stage(config)
+
+    print('----------------------------------------------------------------------------------MACRO-LEVEL-----------------------------------------------------------------------------------------')
+    print('')
+    print('-----------------------------------MISSION-LEVEL-----------------------------------------')
+    result.LCT, result.PPB_thres = terminal_stage(config)
+    result.geometry = geometry_stage(config, result.t_macro)
+    # Initiate time vector at mission level. This is the same as the propagated AIRCRAFT time vector
+    result.time = result.geometry.time
+    result.mission_duration = result.time[-1] - result.time[0]
+
+    result.routing, result.routing_output, result.routing_total_output, result.mask = \
+        routing_stage(config, result.geometry.geometrical_output, result.time)
+    result.links = select_links_stage(config, result.routing_output)
+
+    # Define cross-section of macro-scale simulation based on the elevation angles.
+    # These cross-sections are used for micro-scale plots.
+    elevation_cross_section = [2.0, 20.0, 40.0]
+    index_elevation = 1
+    result.indices, time_cross_section = cross_section(elevation_cross_section, result.links['elevation'], result.links['time'])
+
+    print('')
+    print('-------------------------------------LINK-LEVEL------------------------------------------')
+    print('')
+    result.att, result.h_ext = attenuation_stage(config, result.links, result.seed)
+    result.turb = turbulence_stage(config, result.links)
+
+    print('')
+    print('----------------------------------------------------------------------------------MACRO-LEVEL-----------------------------------------------------------------------------------------')
+    print('')
+    print('-----------------------------------CHANNEL-LEVEL-----------------------------------------')
+    print('')
+    for i in result.indices:
+        result.turb.print(index=i, elevation=np.rad2deg(result.links['elevation']), ranges=result.links['ranges'],
+                          Vg=result.geometry.speed_AC.mean(), slew=result.links['slew rates'])
+
+    result.link, result.P_r_0, result.P_r_0_acq = link_budget_stage(config, result.links, result.turb, result.h_ext,
+                                                                     result.LCT, result.PPB_thres)
+    result.BER_0 = macro_scale_stage(config, result.LCT, result.P_r_0, result.indices[index_elevation])
+
+    # The micro-scale model is simulated for all macro-scale steps at once, or streamed in chunks (see 'chunk_size' in input.py)
+    result.channel, result.bit, result.fades, result.distributions, result.averages = \
+        micro_scale_stage(config, result.t_micro, result.link, result.indices, result.LCT, result.turb,
+                          result.P_r_0, result.links, result.seed)
+
+    update_link_budget_stage(config, result.link, result.averages, result.fades)
+    result.performance = performance_metrics_stage(config, result.LCT, result.link, result.bit, result.averages,
+                                                   result.mask, result.time, result.links, result.indices[index_elevation])
+    result.performance_output = performance_output_stage(config, result.routing_output, result.mask, result.time,
+                                                         result.links, result.link, result.bit, result.averages,
+                                                         result.fades, result.performance, result.P_r_0)
+    # Save all data to csv file: First merge geometrical output and performance output dictionaries. Then save to csv file.
+    # save_to_file([geometrical_output, performance_output])
+    return result
 
-# Save all data to csv file: First merge geometrical output and performance output dictionaries. Then save to csv file.
-# save_to_file([geometrical_output, performance_output])
 
 #------------------------------------------------------------------------
 #-------------------------PLOT-RESULTS-(OPTIONAL)------------------------
@@ -421,7 +469,18 @@ else:
 
 
 
-def plot_performance_metrics():
+def plot_performance_metrics(result):
+    time = result.time
+    time_links = result.links['time']
+    availability_vector = result.performance['availability']
+    reliability_BER = result.performance['reliability BER']
+    C = result.performance['capacity']
+    BER = result.averages['BER']
+    throughput = result.bit['throughput']
+    fractional_fade_time = result.fades['fractional fade time']
+    data_rate = result.config.data_rate
+    step_size_link = result.config.step_size_link
+    mission_duration = result.mission_duration
     # Plotting performance metrics:
     # 1) Availability
     # 2) Reliability
@@ -446,7 +505,7 @@ def plot_performance_metrics():
 
     # Print reliability
     fig0, ax = plt.subplots(1,1)
-    ax.plot(time_links/3600,BER.mean(axis=1), label='BER')
+    ax.plot(time_links/3600,BER, label='BER')
     ax.set_yscale('log')
     ax.plot(time_links/3600,fractional_fade_time, label='fractional fade time')
     ax.set_yscale('log')
@@ -483,7 +542,22 @@ def plot_performance_metrics():
     ax1.legend()
     plt.show()
 
-def plot_distribution_Pr_BER():
+def plot_distribution_Pr_BER(result):
+    analysis = result.config.analysis
+    coding = result.config.coding
+    BER_thres = result.config.BER_thres
+    LCT = result.LCT
+    indices = result.indices
+    elevation = result.links['elevation']
+    fractional_fade_time = result.fades['fractional fade time']
+    P_r = result.averages['P_r coded'] if coding == 'yes' else result.averages['P_r']
+    pdf_P_r, cdf_P_r, x_P_r, std_P_r, mean_P_r = result.distributions['P_r']
+    pdf_BER, cdf_BER, x_BER, std_BER, mean_BER = result.distributions['BER']
+    P_r_pdf_total, P_r_cdf_total, x_P_r_total, std_P_r_total, mean_P_r_total = result.distributions['P_r total']
+    BER_pdf_total, BER_cdf_total, x_BER_total, std_BER_total, mean_BER_total = result.distributions['BER total']
+    if coding == 'yes':
+        pdf_BER_coded, cdf_BER_coded, x_BER_coded, std_BER_coded, mean_BER_coded = result.distributions['BER coded']
+        BER_coded_pdf_total, BER_coded_cdf_total, x_BER_coded_total, std_BER_coded_total, mean_BER_coded_total = result.distributions['BER coded total']
     # Pr and BER output (distribution domain)
     # Output can be:
         # 1) Distribution over total mission interval, where all microscopic evaluations are averaged
@@ -492,7 +566,7 @@ def plot_distribution_Pr_BER():
 
     if analysis == 'total':
         P_r_pdf_total1, P_r_cdf_total1, x_P_r_total1, std_P_r_total1, mean_P_r_total1 = \
-    distribution_function(data=W2dBm(P_r.mean(axis=1)), length=1, min=-60.0, max=0.0, steps=1000)
+    distribution_function(data=W2dBm(P_r), length=1, min=-60.0, max=0.0, steps=1000)
 
         ax_output[0].plot(x_P_r_total, P_r_cdf_total)
         ax_output[0].plot(np.ones(2) * W2dBm(LCT.P_r_thres[1]), [0, 1], c='black',
@@ -537,7 +611,14 @@ def plot_distribution_Pr_BER():
 
     plt.show()
 
-def plot_mission_performance_pointing():
+def plot_mission_performance_pointing(result):
+    link_number = result.config.link_number
+    desired_frac_fade_time = result.config.desired_frac_fade_time
+    routing_output = result.routing_output
+    performance_output = result.performance_output
+    LCT = result.LCT
+    elevation = result.links['elevation']
+    elevation_per_link = routing_output['elevation']
     fig, ax = plt.subplots(1, 1)
     fig.suptitle('Averaged $P_{RX}$ vs elevation')
 
@@ -566,7 +647,14 @@ def plot_mission_performance_pointing():
     ax.legend(fontsize=10)
     plt.show()
 
-def plot_fades():
+def plot_fades(result):
+    link_number = result.config.link_number
+    routing_output = result.routing_output
+    performance_output = result.performance_output
+    elevation = result.links['elevation']
+    elevation_per_link = routing_output['elevation']
+    turb = result.turb
+    h_penalty = result.fades['h penalty']
     # Fade statistics output (distribution domain)
     # The variables are computed for each microscopic evaluation and plotted over the total mission interval
     # Elevation angles are also plotted to see the relation between elevation and fading.
@@ -611,9 +699,14 @@ def plot_fades():
 
     plt.show()
 
-def plot_temporal_behaviour(data_TX_jitter, data_bw, data_TX, data_RX, data_scint, data_h_total, f_sampling,
+def plot_temporal_behaviour(result, data_TX_jitter, data_bw, data_TX, data_RX, data_scint, data_h_total, f_sampling,
              effect0='$h_{pj,TX}$ (platform)', effect1='$h_{bw}$', effect2='$h_{pj,TX}$ (combined)',
              effect3='$h_{pj,RX}$ (combined)', effect4='$h_{scint}$', effect_tot='$h_{total}$'):
+    indices = result.indices
+    elevation = result.links['elevation']
+    turb = result.turb
+    step_size_channel_level = result.config.step_size_channel_level
+    P_r = result.bit['P_r coded'] if result.config.coding == 'yes' else result.channel['P_r']
     fig_psd,  ax      = plt.subplots(1, 2)
     fig_auto, ax_auto = plt.subplots(1, 2)
 
@@ -654,7 +747,7 @@ def plot_temporal_behaviour(data_TX_jitter, data_bw, data_TX, data_RX, data_scin
 
     # Plot auto-correlation function over time shift
     for index in indices:
-        auto_corr, lags = autocovariance(x=P_r[index], scale='micro')
+        auto_corr, lags = autocovariance(x=P_r[index], scale='micro', config=result.config)
         ax_auto[0].plot(lags[int(len(lags) / 2):int(len(lags) / 2)+int(0.02/step_size_channel_level)], auto_corr[int(len(lags) / 2):int(len(lags) / 2)+int(0.02/step_size_channel_level)],
                         label='$\epsilon$='+str(np.round(np.rad2deg(elevation[index]),0))+'$\degree$')
 
@@ -686,7 +779,10 @@ def plot_temporal_behaviour(data_TX_jitter, data_bw, data_TX, data_RX, data_scin
 
     plt.show()
 
-def plot_mission_geometrical_output_coverage():
+def plot_mission_geometrical_output_coverage(result):
+    link_number = result.config.link_number
+    routing_output = result.routing_output
+    elevation = result.links['elevation']
     if link_number == 'all':
         pdf_elev, cdf_elev, x_elev, std_elev, mean_elev = distribution_function(data=elevation, length=1, min=elevation.min(), max=elevation.max(), steps=1000)
 
@@ -724,7 +820,10 @@ def plot_mission_geometrical_output_coverage():
         ax.legend(fontsize=15)
     plt.show()
 
-def plot_mission_geometrical_output_slew_rates():
+def plot_mission_geometrical_output_slew_rates(result):
+    link_number = result.config.link_number
+    routing_output = result.routing_output
+    routing_total_output = result.routing_total_output
     if link_number == 'all':
         pdf_slew, cdf_slew, x_slew, std_slew, mean_slew = distribution_function(data=routing_total_output['slew rates'],
                                                                                 length=1,
@@ -751,27 +850,33 @@ def plot_mission_geometrical_output_slew_rates():
 
 
 
-#---------------------------------
-# Plot mission output
-#---------------------------------
-plot_performance_metrics()
-# plot_distribution_Pr_BER()
-# plot_mission_performance_pointing()
-# plot_fades()
-# plot_temporal_behaviour(data_TX_jitter=h_pj_t, data_bw=h_bw[indices[index_elevation]], data_TX=h_TX[indices[index_elevation]], data_RX=h_RX[indices[index_elevation]],
-#          data_scint=h_scint[indices[index_elevation]], data_h_total=h_tot[indices[index_elevation]], f_sampling=1/step_size_channel_level)
-#---------------------------------
-# Plot/print link budget
-#---------------------------------
-# link.print(index=index_elevation, elevation=elevation, static=False)
-# link.plot(P_r=P_r, displacements=None, indices=indices, elevation=elevation, type='table')
-#---------------------------------
-# Plot geometric output
-#---------------------------------
-# link_geometry.plot(type='trajectories', time=time)
-link_geometry.plot(type='AC flight profile', routing_output=routing_output)
-link_geometry.plot(type = 'satellite sequence', routing_output=routing_output)
-# link_geometry.plot(type='longitude-latitude')
-# link_geometry.plot(type='angles', routing_output=routing_output)
-plot_mission_geometrical_output_coverage()
-# plot_mission_geometrical_output_slew_rates()
\ No newline at end of file
+if __name__ == '__main__':
+    result = run_mission(config)
+    link_geometry = result.geometry
+    routing_output = result.routing_output
+    indices = result.indices
+    index_elevation = 1
+    #---------------------------------
+    # Plot mission output
+    #---------------------------------
+    plot_performance_metrics(result)
+    # plot_distribution_Pr_BER(result)
+    # plot_mission_performance_pointing(result)
+    # plot_fades(result)
+    # plot_temporal_behaviour(result, data_TX_jitter=result.channel['h_pj_t'], data_bw=result.channel['h_bw'][indices[index_elevation]], data_TX=result.channel['h_TX'][indices[index_elevation]], data_RX=result.channel['h_RX'][indices[index_elevation]],
+    #          data_scint=result.channel['h_scint'][indices[index_elevation]], data_h_total=result.channel['h_tot'][indices[index_elevation]], f_sampling=1/step_size_channel_level)
+    #---------------------------------
+    # Plot/print link budget
+    #---------------------------------
+    # result.link.print(index=index_elevation, elevation=result.links['elevation'], static=False)
+    # result.link.plot(P_r=result.channel['P_r'], displacements=None, indices=indices, elevation=result.links['elevation'], type='table')
+    #---------------------------------
+    # Plot geometric output
+    #---------------------------------
+    # link_geometry.plot(type='trajectories', time=result.time)
+    link_geometry.plot(type='AC flight profile', routing_output=routing_output)
+    link_geometry.plot(type = 'satellite sequence', routing_output=routing_output)
+    # link_geometry.plot(type='longitude-latitude')
+    # link_geometry.plot(type='angles', routing_output=routing_output)
+    plot_mission_geometrical_output_coverage(result)
+    # plot_mission_geometrical_output_slew_rates(result)
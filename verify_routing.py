@@ -0,0 +1,48 @@
+import numpy as np
+
+# Import input parameters and helper functions
+from input import *
+from helper_functions import *
+
+# Import stages from the mission level and the routing network
+import mission_level
+from Routing_network import routing_network, pass_table
+
+# Verification of the event-driven routing engine against the legacy routing loop:
+# Both engines route the same propagated constellation with the default policy ('max elevation'),
+# the selected links (satellite, start and end index of each link) must be identical.
+
+#------------------------------------------------------------------------
+#-----------------------------VERIFICATION-------------------------------
+#------------------------------------------------------------------------
+def verify_routing_engines(geometrical_output, time, step_size=1.0, config=config):
+    windows = {}
+    for engine in ['loop', 'events']:
+        routing = routing_network(time, config.replace(routing_engine=engine, routing_policy='max elevation'))
+        if engine == 'events':
+            windows[engine] = routing.routing_events(geometrical_output['elevation'], time, step_size,
+                                                     pass_table(geometrical_output, time, config))
+        else:
+            windows[engine] = routing.routing_loop(geometrical_output, time, step_size)
+    identical = [(int(a), int(b), int(c)) for a, b, c in windows['loop']] == \
+                [(int(a), int(b), int(c)) for a, b, c in windows['events']]
+
+    print('ROUTING ENGINE VERIFICATION')
+    print('------------------------------------------------')
+    print('Number of links (loop)      : ' + str(len(windows['loop'])))
+    print('Number of links (events)    : ' + str(len(windows['events'])))
+    print('Identical links             : ' + ('yes' if identical else 'no'))
+    print('------------------------------------------------')
+    if not identical:
+        raise ValueError('The event-driven routing engine does not reproduce the legacy routing loop')
+    return identical
+
+def verify_scenario(config):
+    # Routing inputs of the mission level (time vectors and geometry of the constellation)
+    t_macro, t_micro = mission_level.time_vectors_stage(config)
+    geometry = mission_level.geometry_stage(config, t_macro)
+    return verify_routing_engines(geometry.geometrical_output, t_macro, config.step_size_link, config)
+
+
+if __name__ == '__main__':
+    verify_scenario(config.replace(number_of_planes=10, number_sats_per_plane=10, start_time=0.0, end_time=6 * 3600.0))